@@ -0,0 +1,57 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Running the charms under Harness (FakeJuju, charm loading) is shared with the unit tests
+sys.path.insert(0, str(Path(__file__).parents[1] / "unit"))
+
+# Measurements of the whole session, reported once all benchmarks are done
+RESULTS = []
+
+
+@pytest.fixture(autouse=True)
+def quiet_charms():
+    """Charm logs (content dumps included) would dominate the measurements."""
+    level = logging.getLevelName(os.environ.get("BENCH_LOG_LEVEL", "WARNING"))
+    logging.disable(level - 1)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture
+def bench_results():
+    """Collect the measurements to be reported."""
+    return RESULTS
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not RESULTS:
+        return
+
+    terminalreporter.section("benchmarks")
+    terminalreporter.write_line(
+        f"{'benchmark':<40} {'dispatches':>10} {'time (s)':>10} {'ms/disp.':>9} "
+        f"{'peak KiB':>9}  hook tool calls"
+    )
+    for result in RESULTS:
+        peak = f"{result['peak-memory'] / 1024:.0f}" if "peak-memory" in result else "-"
+        calls = " ".join(f"{tool}={count}" for tool, count in result["calls"].items())
+        if "databag-bytes" in result:
+            calls += f" (databag: {result['databag-bytes']:.0f} bytes)"
+        if "stored-bytes" in result:
+            calls += f" (secret: {result['size-bytes']} bytes, {result['stored-bytes']} stored)"
+        terminalreporter.write_line(
+            f"{result['name']:<40} {result['dispatches']:>10} {result['time']:>10.3f} "
+            f"{result['time-per-dispatch'] * 1000:>9.2f} {peak:>9}  {calls}"
+        )
+
+    if output := os.environ.get("BENCH_OUTPUT"):
+        with open(output, "w") as f:
+            json.dump(RESULTS, f, indent=2)
+        terminalreporter.write_line(f"Results written to {output}")
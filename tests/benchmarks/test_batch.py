@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Setting fields on many relations at once with `DataProvides.batch()`.
+
+Credentials and endpoints of all clients are updated one relation at a time, then within a
+batch, each hook tool call taking BENCH_LATENCY seconds (0.001 by default). The rollback of
+a batch failing half-way is tested in `tests/unit/test_provides_batch.py`.
+"""
+
+import os
+import time
+
+import pytest
+from fake_juju import FakeJuju
+from ops.testing import Harness
+from relation_charms import PROVIDER_META, Client, ProviderCharm
+from utils import dispatch_scoped, env_sizes
+
+RELATIONS = env_sizes("BENCH_RELATIONS", "10,100")
+LATENCY = float(os.environ.get("BENCH_LATENCY", "0.001"))
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    fake = FakeJuju()
+    harness = Harness(ProviderCharm, meta=PROVIDER_META)
+    fake.attach(harness)
+    harness.set_leader(True)
+    harness.begin()
+    return fake, harness
+
+
+def set_fields(provides, clients, value: str) -> None:
+    for client in clients:
+        provides.set_credentials(client.provider_relation_id, f"user-{client.name}", value)
+        provides.set_relation_fields(client.provider_relation_id, {"endpoints": value})
+
+
+@pytest.mark.parametrize("relations", RELATIONS)
+def test_batch(relations, provider, bench_results):
+    fake, harness = provider
+    provides = harness.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+    clients = [Client(fake, index, harness) for index in range(relations)]
+    set_fields(provides, clients, "initial")
+    fake.latency = LATENCY
+
+    for mode, value in (("sequential", "first"), ("batch", "second")):
+        new_dispatch()
+        calls_before = fake.calls.copy()
+        start = time.perf_counter()
+        if mode == "batch":
+            with provides.batch():
+                set_fields(provides, clients, value)
+        else:
+            set_fields(provides, clients, value)
+        duration = time.perf_counter() - start
+
+        bench_results.append(
+            {
+                "name": f"batch[{relations}-{mode}]",
+                "relations": relations,
+                "dispatches": 1,
+                "time": duration,
+                "time-per-dispatch": duration,
+                "calls": dict(sorted((fake.calls - calls_before).items())),
+            }
+        )
+
+    new_dispatch()
+    for client in clients:
+        secret = provides._get_relation_secret(client.provider_relation_id, "user")
+        assert secret.get_content() == {"username": f"user-{client.name}", "password": "second"}
+        assert client.published.get("secret-endpoints")
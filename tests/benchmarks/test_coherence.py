@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Cost of keeping the secrets of non-leader cache-charm units up to date.
+
+The leader of the cache charm and a non-leader unit, under Harness, share their secrets
+through FakeJuju. The leader updates one of BENCH_LABELS secrets per round, the non-leader
+gets the peer relation change (the revisions published by the leader), then reads all secrets.
+That only the secrets updated are read again is tested in `tests/unit/test_cache_coherence.py`.
+
+BENCH_ROUNDS sets the number of rounds.
+"""
+
+import os
+import time
+
+import pytest
+from fake_juju import FakeJuju
+from utils import BackendCalls, PeerUnit, env_sizes, load_charm, new_dispatch
+
+LABELS = env_sizes("BENCH_LABELS", "1,10,100")
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", "20"))
+
+CHARM = load_charm("cache-charm")
+
+
+@pytest.mark.parametrize("labels", LABELS)
+def test_follower_refresh(labels, bench_results):
+    fake = FakeJuju()
+    leader = PeerUnit(CHARM, fake, leader=True)
+    # NOTE: both units are named unit/0 (Harness), only the leader is known to FakeJuju as such
+    follower = PeerUnit(CHARM, fake, leader=False)
+
+    def peer_relation_changed():
+        new_dispatch(leader.harness.charm)
+        new_dispatch(follower.harness.charm)
+        follower.harness.update_relation_data(
+            follower.relation_id, follower.app, dict(leader.peer_data)
+        )
+
+    for label in range(labels):
+        leader.run("set-secret", {"content": {"key": "value"}, "label": f"label{label}"})
+    peer_relation_changed()
+
+    calls = BackendCalls(follower.harness)
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        label = f"label{i % labels}"
+        leader.run("set-secret", {"content": {"key": f"value{i}"}, "label": label})
+        peer_relation_changed()
+        assert follower.harness.charm.get_secret(label) == {"key": f"value{i}"}
+
+    duration = time.perf_counter() - start
+    calls = dict(sorted(calls.items()))
+
+    # Only the secret updated was read again, the others are not read until needed
+    assert calls["secret-get"] == ROUNDS
+    for label in range(labels):
+        rounds = [i for i in range(ROUNDS) if i % labels == label]
+        expected = f"value{rounds[-1]}" if rounds else "value"
+        assert follower.harness.charm.get_secret(f"label{label}") == {"key": expected}
+
+    bench_results.append(
+        {
+            "name": f"coherence[{labels}]",
+            "labels": labels,
+            "dispatches": ROUNDS,
+            "time": duration,
+            "time-per-dispatch": duration / ROUNDS,
+            "calls": calls,
+        }
+    )
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Cost of the data_interfaces library at scale: one DatabaseProvides leader, N clients.
+
+Each client is a DatabaseRequires leader of its own application, all of them under Harness,
+with secrets served by FakeJuju. Provider operations are executed on each relation, and the
+data published transferred to the client (triggering its relation-changed: the `diff()`
+path). Reported per operation: hook tool calls, time, and size of the provider databag.
+
+BENCH_RELATIONS (comma-separated list) sets the numbers of clients.
+"""
+
+import json
+import time
+from typing import Callable, Dict, List
+
+import pytest
+from fake_juju import FakeJuju
+from ops.testing import Harness
+from relation_charms import PROVIDER_META, Client, ProviderCharm
+from utils import dispatch_scoped, env_sizes
+
+RELATIONS = env_sizes("BENCH_RELATIONS", "10,100,1000")
+
+
+class Operations:
+    """Accounting of the operations executed on all relations."""
+
+    def __init__(self, fake: FakeJuju, relations: int):
+        self.fake = fake
+        self.relations = relations
+        self.results: Dict[str, Dict] = {}
+
+    def measure(self, operation: str, clients: List[Client], call: Callable[[Client], None]):
+        calls_before = self.fake.calls.copy()
+        duration = 0.0
+        for client in clients:
+            start = time.perf_counter()
+            call(client)
+            duration += time.perf_counter() - start
+
+        calls = self.fake.calls - calls_before
+        databag = sum(len(json.dumps(client.published)) for client in clients)
+        self.results[operation] = {
+            "name": f"relations[{self.relations}-{operation}]",
+            "relations": self.relations,
+            "operation": operation,
+            "dispatches": len(clients),
+            "time": duration,
+            "time-per-dispatch": duration / len(clients),
+            "calls": dict(sorted(calls.items())),
+            "calls-per-operation": {
+                tool: count / len(clients) for tool, count in sorted(calls.items())
+            },
+            "databag-bytes": databag / len(clients),
+        }
+
+
+@pytest.mark.parametrize("relations", RELATIONS)
+def test_provider_requirer_scale(relations, bench_results):
+    fake = FakeJuju()
+    provider = Harness(ProviderCharm, meta=PROVIDER_META)
+    fake.attach(provider)
+    provider.set_leader(True)
+    provider.begin()
+    provides = provider.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+
+    clients = [Client(fake, index, provider) for index in range(relations)]
+    operations = Operations(fake, relations)
+
+    def on_provider(call: Callable[[Client], None]) -> Callable[[Client], None]:
+        def operation(client: Client) -> None:
+            new_dispatch()
+            call(client)
+
+        return operation
+
+    def on_client(call: Callable[[Client], None]) -> Callable[[Client], None]:
+        def operation(client: Client) -> None:
+            client.new_dispatch()
+            call(client)
+
+        return operation
+
+    operations.measure(
+        "set_credentials",
+        clients,
+        on_provider(
+            lambda client: provides.set_credentials(
+                client.provider_relation_id, f"user-{client.name}", "password"
+            )
+        ),
+    )
+    operations.measure(
+        "set_tls",
+        clients,
+        on_provider(lambda client: provides.set_tls(client.provider_relation_id, "enabled")),
+    )
+    operations.measure(
+        "set_relation_fields",
+        clients,
+        on_provider(
+            lambda client: provides.set_relation_fields(
+                client.provider_relation_id,
+                {"endpoints": "host:5432", "version": "14", "database": "data"},
+            )
+        ),
+    )
+    operations.measure("diff", clients, on_client(Client.receive))
+    operations.measure(
+        "fetch_relation_data",
+        clients,
+        on_client(lambda client: client.harness.charm.requires.fetch_relation_data()),
+    )
+    operations.measure(
+        "is_resource_created",
+        clients,
+        on_client(lambda client: client.harness.charm.requires.is_resource_created()),
+    )
+
+    for client in clients:
+        assert [type(event).__name__ for event in client.harness.charm.events] == [
+            "DatabaseCreatedEvent"
+        ]
+        assert client.harness.charm.requires.is_resource_created()
+        fields = client.harness.charm.requires.get_relation_fields(
+            client.relation_id, ["username", "endpoints", "tls"]
+        )
+        assert fields == {
+            "username": f"user-{client.name}",
+            "endpoints": "host:5432",
+            "tls": "enabled",
+        }
+
+    bench_results.extend(operations.results.values())
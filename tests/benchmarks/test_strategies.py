@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Comparing the secret handling strategies of the base, labels and cache charms.
+
+Sizes are configurable from the environment (comma-separated lists):
+ - BENCH_KEYS: number of keys in the secret
+ - BENCH_LABELS: number of secrets (labels) used by the charm
+ - BENCH_ROUNDS: number of set/get/delete sequences executed
+ - BENCH_ENDPOINTS: number of endpoints of the (large) value stored
+
+BENCH_LATENCY (seconds) serves secrets from FakeJuju, each hook tool call taking that long.
+"""
+
+import os
+
+import pytest
+from fake_juju import FakeJuju
+from ops.testing import Harness
+from utils import env_sizes, load_charm, new_dispatch, run_scenario
+
+KEYS = env_sizes("BENCH_KEYS", "1,10,100,1000,10000")
+LABELS = env_sizes("BENCH_LABELS", "1,10,100")
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", "20"))
+ENDPOINTS = env_sizes("BENCH_ENDPOINTS", "10,100,1000")
+LATENCY = float(os.environ.get("BENCH_LATENCY", "0"))
+
+
+def fake_juju() -> FakeJuju:
+    return FakeJuju(latency=LATENCY)
+
+
+class Strategy:
+    """Driving the actions of an example charm."""
+
+    get_action = "get-secret"
+    result_key = "secret"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.charm_cls = load_charm(f"{name}-charm")
+
+    def run(self, harness: Harness, action: str, params=None) -> dict:
+        new_dispatch(harness.charm)
+        return harness.run_action(action, params).results
+
+    def set(self, harness: Harness, content: dict, label=None) -> None:
+        params = {"content": content}
+        if label:
+            params["label"] = label
+        self.run(harness, "set-secret", params)
+
+    def get(self, harness: Harness) -> dict:
+        return self.run(harness, self.get_action).get(self.result_key, {})
+
+    def delete(self, harness: Harness, keys: list, label=None) -> None:
+        params = {"keys": keys}
+        if label:
+            params["label"] = label
+        self.run(harness, "delete-secrets", params)
+
+
+class BaseStrategy(Strategy):
+    """The base charm takes the secret content as action parameters, and a single secret."""
+
+    get_action = "get-secrets"
+    result_key = "secrets"
+
+    def set(self, harness: Harness, content: dict, label=None) -> None:
+        assert not label
+        self.run(harness, "set-secret", content)
+
+
+STRATEGIES = {
+    "base": BaseStrategy("base"),
+    "labels": Strategy("labels"),
+    "cache": Strategy("cache"),
+}
+
+
+def content(keys: int, prefix: str = "key") -> dict:
+    return {f"{prefix}{i}": f"value{i}" for i in range(keys)}
+
+
+@pytest.mark.parametrize("keys", KEYS)
+@pytest.mark.parametrize("name", STRATEGIES)
+def test_keys(name, keys, bench_results):
+    """A secret of a growing number of keys, with repeated updates/reads/deletions."""
+    strategy = STRATEGIES[name]
+    initial = content(keys)
+
+    def setup(harness: Harness):
+        strategy.set(harness, initial)
+
+    def scenario(harness: Harness) -> int:
+        for i in range(ROUNDS):
+            strategy.set(harness, {"extra": f"value{i}"})
+            assert strategy.get(harness)["extra"] == f"value{i}"
+            strategy.delete(harness, ["extra"])
+        return 3 * ROUNDS
+
+    results = run_scenario(strategy.charm_cls, scenario, setup, fake_juju if LATENCY else None)
+    bench_results.append({"name": f"keys[{name}-{keys}]", "keys": keys, **results})
+
+
+@pytest.mark.parametrize("labels", LABELS)
+@pytest.mark.parametrize("name", ["labels", "cache"])
+def test_labels(name, labels, bench_results):
+    """A growing number of secrets, each of them updated and deleted from repeatedly."""
+    strategy = STRATEGIES[name]
+
+    def setup(harness: Harness):
+        for label in range(labels):
+            strategy.set(harness, content(10), label=f"label{label}")
+
+    def scenario(harness: Harness) -> int:
+        for i in range(ROUNDS):
+            for label in range(labels):
+                strategy.set(harness, {"extra": f"value{i}"}, label=f"label{label}")
+                strategy.delete(harness, ["extra"], label=f"label{label}")
+        for label in range(labels):
+            assert harness.charm.get_secret(f"label{label}") == content(10)
+        return 2 * ROUNDS * labels
+
+    results = run_scenario(strategy.charm_cls, scenario, setup, fake_juju if LATENCY else None)
+    bench_results.append({"name": f"labels[{name}-{labels}]", "labels": labels, **results})
+
+
+@pytest.mark.parametrize("endpoints", ENDPOINTS)
+@pytest.mark.parametrize("name", STRATEGIES)
+def test_large_values(name, endpoints, bench_results):
+    """A large value (endpoint list), stored compressed and split in chunks, read repeatedly."""
+    strategy = STRATEGIES[name]
+    value = ",".join(f"host-{i}.example.internal:5432" for i in range(endpoints))
+    stored = {}
+
+    def setup(harness: Harness):
+        strategy.set(harness, {"endpoints": value})
+
+    def scenario(harness: Harness) -> int:
+        for _ in range(ROUNDS):
+            assert strategy.get(harness)["endpoints"] == value
+        stored.update(strategy.run(harness, "secret-sizes")["sizes"])
+        return ROUNDS + 1
+
+    results = run_scenario(strategy.charm_cls, scenario, setup, fake_juju if LATENCY else None)
+    bench_results.append(
+        {
+            "name": f"large-values[{name}-{endpoints}]",
+            "endpoints": endpoints,
+            "size-bytes": stored["size"],
+            "stored-bytes": stored["stored"],
+            **results,
+        }
+    )
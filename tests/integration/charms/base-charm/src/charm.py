@@ -7,14 +7,32 @@
 """A small charm handling secret manipulation within a single Juju Secret object"""
 
 import logging
+from typing import Any, Dict, List, Optional
 
 import ops
-from ops import ActiveStatus, SecretNotFoundError
-from ops.charm import ActionEvent
-from helpers import compare_secret_ids
+from ops import ActiveStatus, BlockedStatus
+from ops.charm import ActionEvent, RelationChangedEvent
+from helpers import (
+    DispatchContext,
+    Scope,
+    WriteQueue,
+    coalesce,
+    compare_secret_ids,
+    encode_content,
+    get_results,
+    reserved_keys,
+    run_stress,
+    scope_param,
+    secret_content,
+    stress_params,
+)
+from hook_stats import HookToolStats
+from migration import SECRET_ID_KEY, SchemeMigration
+from secret_log import SecretLogger
 
 # Log messages can be retrieved using juju debug-log
 logger = logging.getLogger(__name__)
+secret_log = SecretLogger(logger)
 
 VALID_LOG_LEVELS = ["info", "debug", "warning", "error", "critical"]
 PEER = "charm-peer"
@@ -25,13 +43,24 @@ class SecretsTestCharm(ops.CharmBase):
 
     def __init__(self, *args):
         super().__init__(*args)
+        self.hook_stats = HookToolStats(self)
+        self.context = DispatchContext.of(self.model)
+        self.write_queue = WriteQueue(self)
+        self.migration = SchemeMigration(self)
 
         self.framework.observe(self.on.start, self._on_start)
+        self.framework.observe(self.on.config_changed, self._on_config_changed)
+        self.framework.observe(self.on.update_status, self._on_update_status)
+        self.framework.observe(self.on.leader_elected, self._on_leader_elected)
+        self.framework.observe(self.on[PEER].relation_changed, self._on_peer_relation_changed)
 
         self.framework.observe(self.on.set_secret_action, self._on_set_secret_action)
         self.framework.observe(self.on.get_secrets_action, self._on_get_secrets_action)
         self.framework.observe(self.on.delete_secrets_action, self._on_delete_secrets_action)
         self.framework.observe(self.on.forget_all_secrets_action, self._on_forget_all_secrets_action)
+        self.framework.observe(self.on.stress_action, self._on_stress_action)
+        self.framework.observe(self.on.write_status_action, self._on_write_status_action)
+        self.framework.observe(self.on.secret_sizes_action, self._on_secret_sizes_action)
         self.framework.observe(self.on.secret_changed, self._on_secret_changed)
 
 ##############################################################################
@@ -41,37 +70,118 @@ class SecretsTestCharm(ops.CharmBase):
     def _on_start(self, event) -> None:
         self.unit.status = ActiveStatus()
 
+    def _on_config_changed(self, event) -> None:
+        """Move the secrets to the scheme configured."""
+        if not self.migration.target:
+            scheme = self.config.get("secret-scheme")
+            self.unit.status = BlockedStatus(f"Invalid secret-scheme {scheme}")
+            return
+        self.unit.status = ActiveStatus()
+        self.migration.run()
+
+    def _on_update_status(self, event) -> None:
+        self.migration.run()
+
+    def _on_leader_elected(self, event) -> None:
+        self.migration.run()
+        self._apply_write_requests()
+
+    def _on_peer_relation_changed(self, event: RelationChangedEvent) -> None:
+        """Apply the write requests of the units (leader), drop those applied (other units)."""
+        self.migration.run()
+        if self.context.is_leader:
+            self._apply_write_requests()
+        else:
+            self.write_queue.prune()
+
     def _on_set_secret_action(self, event: ActionEvent):
-        if self.unit.is_leader():
-            content = event.params
-            event.set_results({"secret-id": self.set_secret(content)})
+        if not (scope := self._action_scope(event)):
+            return
+        # NOTE: all parameters but the scope are the content of the secret
+        content = {key: value for key, value in event.params.items() if key != "scope"}
+        if reserved := reserved_keys(content):
+            event.fail(f"Reserved secret keys (ending in -codec or -chunk-<n>): {reserved}")
+            return
+        if self._can_write(scope):
+            secret_id = self.set_secret(content, scope)
+            event.set_results(
+                {"secret-id": secret_id} if secret_id else {"label": self.migration.label(scope)}
+            )
+        else:
+            self._request_write(event, "set", content=content)
 
     def _on_get_secrets_action(self, event: ActionEvent):
-        """Return the secrets stored in juju secrets backend."""
-        event.set_results({"secrets": self.get_secrets()})
+        """Return the secrets stored in juju secrets backend (a page of them, or a file)."""
+        if scope := self._action_scope(event):
+            secret = self._get_my_secret(scope)
+            content = secret_content(secret) if secret else {}
+            event.set_results(get_results(content, event.params, "secrets", self.app.name))
 
     def _on_secret_changed(self, event: ActionEvent):
-        if not compare_secret_ids(
-            event.secret.id, self.app_peer_data["secret-id"]
+        if event.secret.label != self.migration.label() and not compare_secret_ids(
+            event.secret.id, self.app_peer_data.get(SECRET_ID_KEY)
         ):
-            my_secret = self._get_my_secret()
-            logging.error({"secrets": {
-                "event_secret": event.secret.__dict__,
-                "my_secret": my_secret.__dict__
-                }
-            })
+            secret_log.secret(
+                "changed (not ours)",
+                event.secret.id or event.secret.label,
+                level=logging.ERROR,
+                expected=[self.app_peer_data.get(SECRET_ID_KEY) or self.migration.label()],
+            )
 
     def _on_delete_secrets_action(self, event: ActionEvent):
-        if self.unit.is_leader():
-            keys = event.params.get("keys")
+        if not (scope := self._action_scope(event)):
+            return
+        keys = event.params.get("keys")
+        if self._can_write(scope):
             for key in keys:
-                self.delete_secret(key)
+                self.delete_secret(key, scope)
+        else:
+            self._request_write(event, "delete", keys=keys)
 
     def _on_forget_all_secrets_action(self, event: ActionEvent):
-        if self.unit.is_leader():
-            if self.app_peer_data.get("secret-id"):
-                del self.app_peer_data["secret-id"]
-                self.secret_meta = None
+        if not (scope := self._action_scope(event)):
+            return
+        if self._can_write(scope):
+            # NOTE: with the label scheme, there's no pointer to drop: the secret is removed
+            # (see actions.yaml)
+            if not self.migration.forget(scope) and (secret := self._get_my_secret(scope)):
+                secret.remove_all_revisions()
+        else:
+            self._request_write(event, "forget")
+
+    def _on_write_status_action(self, event: ActionEvent):
+        """Report whether the leader applied a write request."""
+        event.set_results({"status": self.write_queue.status(event.params.get("ticket", ""))})
+
+    def _on_secret_sizes_action(self, event: ActionEvent):
+        """Report the size of each value of the secret, as read and as stored."""
+        if scope := self._action_scope(event):
+            secret = self._get_my_secret(scope)
+            event.set_results({"sizes": secret_content(secret).sizes() if secret else {}})
+
+    def _on_stress_action(self, event: ActionEvent):
+        """Churn the secret with a read/write/delete mix, report throughput and latencies."""
+        if not (scope := self._action_scope(event)):
+            return
+        if not self._can_write(scope):
+            event.fail("Only the leader unit can write app secrets")
+            return
+
+        try:
+            params = stress_params(event.params)
+        except ValueError as e:
+            event.fail(str(e))
+            return
+        # A single secret is handled by the charm
+        params.pop("secrets")
+        operations = {
+            "read": lambda label, key, value: self.get_secrets(scope),
+            "write": lambda label, key, value: self.set_secret({key: value}, scope),
+            "delete": lambda label, key, value: self.delete_secret(key, scope),
+        }
+        with secret_log.sampled():
+            results = run_stress(operations, ["default"], **params)
+        event.set_results(results)
 
 ##############################################################################
 # Properties and methods
@@ -79,72 +189,121 @@ class SecretsTestCharm(ops.CharmBase):
 
     @property
     def peers(self) -> ops.model.Relation:
-        """Retrieve the peer relation (`ops.model.Relation`)."""
-        return self.model.get_relation(PEER)
+        """Retrieve the peer relation (`ops.model.Relation`), looked up once per dispatch."""
+        return self.context.relation(PEER)
 
     @property
     def app_peer_data(self) -> dict[str, str]:
         """Application peer relation data object."""
-        if self.peers is None:
+        if (peers := self.peers) is None:
             return {}
 
-        return self.peers.data[self.app]
+        return peers.data[self.app]
 
-    def _get_my_secret(self):
-        secret_id = self.app_peer_data.get("secret-id")
-        if secret_id:
-            try:
-                return self.model.get_secret(id=secret_id)
-            except SecretNotFoundError:
-                pass
-        return {}
+    @property
+    def unit_peer_data(self) -> dict[str, str]:
+        """Unit peer relation data object."""
+        if (peers := self.peers) is None:
+            return {}
 
-    def get_secrets(self) -> dict[str, str]:
-        """Get the secrets stored in juju secrets backend."""
+        return peers.data[self.unit]
+
+    def _peer_data(self, scope: Scope = Scope.APP) -> dict[str, str]:
+        """Peer relation data the ID (or scheme) of the secret of a scope is kept in."""
+        return self.app_peer_data if scope == Scope.APP else self.unit_peer_data
+
+    def _action_scope(self, event: ActionEvent) -> Optional[Scope]:
+        """Scope an action is called for, failing the action if invalid."""
+        scope = scope_param(event.params)
+        if not scope:
+            event.fail(f"Invalid scope {event.params.get('scope')}, expected app or unit")
+        return scope
+
+    def _can_write(self, scope: Scope) -> bool:
+        """App secrets are written by the leader, unit secrets by any unit."""
+        return scope == Scope.UNIT or self.context.is_leader
+
+    def _request_write(self, event: ActionEvent, action: str, **fields) -> None:
+        """Pass a write to the app secret on to the leader, the ticket of the request as result."""
+        if not (ticket := self.write_queue.enqueue(action, **fields)):
+            event.fail("Only the leader unit can write app secrets")
+            return
+        event.set_results({"ticket": ticket})
+
+    def _apply_write_requests(self) -> None:
+        """Apply the write requests of the units (leader)."""
+        if applied := self.write_queue.drain(self._write_requested):
+            logger.info(f"Applied {applied} write requests")
+
+    def _write_requested(self, label: Optional[str], requests: List[Dict[str, Any]]) -> None:
+        """Apply the write requests to the app secret, writing it once.
+
+        NOTE: the secret is removed if no content is left (forgetting it included).
+        """
         secret = self._get_my_secret()
+        current = dict(secret_content(secret)) if secret else {}
+        content = coalesce(current, requests)
+        if content == current:
+            return
+
+        if not content:
+            secret.remove_all_revisions()
+            self.migration.forget()
+        elif secret:
+            secret.set_content(encode_content(content))
+        else:
+            self.migration.add_secret(encode_content(content))
+
+    def _get_my_secret(self, scope: Scope = Scope.APP):
+        return self.migration.get_secret(scope)
+
+    def get_secrets(self, scope: Scope = Scope.APP) -> dict[str, str]:
+        """Get the secrets stored in juju secrets backend."""
+        secret = self._get_my_secret(scope)
 
         if not secret:
             return {}
 
-        content = secret.get_content()
-        logger.info(f"Retrieved secret {self.app_peer_data['secret-id']} with content {content}")
+        content = dict(secret_content(secret))
+        secret_log.secret("retrieved", secret.id or secret.label, content)
         return content
 
-    def set_secret(self, new_content: dict) -> None:
-        """Set the secret in the juju secret storage."""
-        secret_id = self.app_peer_data.get("secret-id")
+    def set_secret(self, new_content: dict, scope: Scope = Scope.APP) -> Optional[str]:
+        """Set the secret in the juju secret storage.
+
+        The app secret is owned by the application, unit secrets by the unit writing them.
+        The ID of the secret is returned, unless it's found by its label.
+        """
+        secret = self._get_my_secret(scope)
 
-        if secret_id:
-            secret = self.model.get_secret(id=secret_id)
-            content = secret.get_content()
+        if secret:
+            content = dict(secret_content(secret))
             content.update(new_content)
-            logger.info(f"Setting secret {secret.id} to {content}")
-            secret.set_content(content)
+            secret_log.secret("set", secret.id or secret.label, content)
+            secret.set_content(encode_content(content))
         else:
-            secret = self.app.add_secret(new_content)
-            self.app_peer_data["secret-id"] = secret.id
-            logger.info(f"Added secret {secret.id} to {new_content}")
+            secret = self.migration.add_secret(encode_content(new_content), scope)
+            secret_log.secret("added", secret.id, new_content)
 
         return secret.id
 
-    def delete_secret(self, key: str) -> None:
+    def delete_secret(self, key: str, scope: Scope = Scope.APP) -> None:
         """Remove a secret."""
-        secret_id = self.app_peer_data.get("secret-id")
+        secret = self._get_my_secret(scope)
 
-        if not secret_id:
+        if not secret:
             logging.error("Can't delete any secrets as we have none defined")
+            return
 
-        secret = self.model.get_secret(id=secret_id)
-        content = secret.get_content()
+        content = dict(secret_content(secret))
         if key in content:
             del content[key]
-        logger.info(f"Removing {key} from secret {secret.id}")
-        logger.info(f"Remaining content is {list(content.keys())}")
+        secret_log.secret("deleted", secret.id or secret.label, content, removed=[key])
         if content:
-            secret.set_content(content)
+            secret.set_content(encode_content(content))
         else:
             secret.remove_all_revisions()
-            del self.app_peer_data["secret-id"]
+            self.migration.forget(scope)
 
 
 if __name__ == "__main__":  # pragma: nocover
@@ -0,0 +1,140 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Moving the secrets of the charm between the peer databag ID scheme and labels, online.
+
+With the `peer-id` scheme, the ID of the secret of a scope is kept in the peer databag of
+the scope (`secret-id`). With the `label` scheme, the secret is found by its label, the
+same as the labels charm gives its default secret: the peer databag holds no pointer.
+
+The scheme each scope is at is recorded in its peer databag (`secret-scheme`): this is the
+cursor of the migration, so that a migration interrupted (hook failing, leadership moving)
+resumes where it stopped. Each unit moves its own secret, the leader the app secret. A
+secret is moved by the first read of a hook, when it's due to be: fetching it by ID with a
+label assigns the label (no new revision), the pointer is dropped in the same hook (Juju
+commits both at once). Reading a secret during the migration thus costs no more than
+before.
+"""
+
+import logging
+from typing import Dict, Optional
+
+from helpers import Scope
+from ops import Secret, SecretNotFoundError
+
+logger = logging.getLogger(__name__)
+
+SCHEMES = ("peer-id", "label")
+DEFAULT_SCHEME = "peer-id"
+
+# Peer databag fields of a scope: pointer to its secret, scheme it's at
+SECRET_ID_KEY = "secret-id"
+SCHEME_KEY = "secret-scheme"
+
+# Label of the secret of a scope under the label scheme (as the default one of the labels charm)
+SECRET_LABEL = "mysecret"
+
+
+class SchemeMigration:
+    """Secrets of the charm by scope, found (and moved) according to the scheme configured."""
+
+    def __init__(self, charm, config_option: str = "secret-scheme"):
+        self.charm = charm
+        self.config_option = config_option
+        # IDs of the secrets resolved during the dispatch: labels assigned within a hook
+        # can't be relied upon before it's committed
+        self._ids: Dict[Scope, str] = {}
+
+    @property
+    def target(self) -> Optional[str]:
+        """Scheme configured (None if invalid)."""
+        scheme = self.charm.config.get(self.config_option) or DEFAULT_SCHEME
+        return scheme if scheme in SCHEMES else None
+
+    def label(self, scope: Scope = Scope.APP) -> str:
+        if scope == Scope.UNIT:
+            return f"{self.charm.unit.name.replace('/', '-')}.{SECRET_LABEL}"
+        return f"{self.charm.app.name}.{SECRET_LABEL}"
+
+    def scheme(self, scope: Scope = Scope.APP) -> str:
+        """Scheme the secret of a scope is at."""
+        return self._databag(scope).get(SCHEME_KEY, DEFAULT_SCHEME)
+
+    def pending(self) -> Dict[Scope, str]:
+        """Scopes this unit is to move, with the scheme each one is at."""
+        if not self.target or self.charm.peers is None:
+            return {}
+        scopes = [Scope.UNIT, Scope.APP] if self.charm.context.is_leader else [Scope.UNIT]
+        schemes = {scope: self.scheme(scope) for scope in scopes}
+        return {scope: scheme for scope, scheme in schemes.items() if scheme != self.target}
+
+    def _databag(self, scope: Scope):
+        return self.charm._peer_data(scope)
+
+    def _due(self, scope: Scope) -> bool:
+        if scope == Scope.APP and not self.charm.context.is_leader:
+            return False
+        return self.target not in (None, self.scheme(scope))
+
+    def _set_scheme(self, scope: Scope, scheme: str) -> None:
+        databag = self._databag(scope)
+        if scheme == DEFAULT_SCHEME:
+            databag.pop(SCHEME_KEY, None)
+        else:
+            databag[SCHEME_KEY] = scheme
+        logger.info(f"Secret of the {scope.value} scope moved to the {scheme} scheme")
+
+    def get_secret(self, scope: Scope = Scope.APP):
+        """Get the secret of a scope (moved to the labels scheme on the way, if due)."""
+        databag = self._databag(scope)
+        secret_id = self._ids.get(scope) or databag.get(SECRET_ID_KEY)
+        try:
+            if secret_id:
+                label = self.label(scope) if self._due(scope) else None
+                secret = self.charm.model.get_secret(id=secret_id, label=label)
+                self._ids[scope] = secret_id
+                if label:
+                    databag.pop(SECRET_ID_KEY, None)
+                    self._set_scheme(scope, "label")
+                return secret
+            if self.scheme(scope) == "label":
+                return self.charm.model.get_secret(label=self.label(scope))
+        except SecretNotFoundError:
+            pass
+        return {}
+
+    def add_secret(self, content: Dict[str, str], scope: Scope = Scope.APP) -> Secret:
+        """Add the secret of a scope, referenced according to the scheme the scope is at."""
+        owner = self.charm.app if scope == Scope.APP else self.charm.unit
+        if self.scheme(scope) == "label":
+            secret = owner.add_secret(content, label=self.label(scope))
+        else:
+            secret = owner.add_secret(content)
+            self._databag(scope)[SECRET_ID_KEY] = secret.id
+        self._ids[scope] = secret.id
+        return secret
+
+    def forget(self, scope: Scope = Scope.APP) -> bool:
+        """Drop the reference to the secret of a scope (the secret itself is left)."""
+        self._ids.pop(scope, None)
+        return self._databag(scope).pop(SECRET_ID_KEY, None) is not None
+
+    def run(self) -> None:
+        """Move the secrets due to, if any."""
+        for scope, scheme in self.pending().items():
+            if scheme == DEFAULT_SCHEME:
+                # Labelled while read
+                if not self.get_secret(scope):
+                    self._set_scheme(scope, "label")
+                continue
+
+            # Back to the peer databag: the label is left as it is
+            try:
+                secret = self.charm.model.get_secret(label=self.label(scope))
+            except SecretNotFoundError:
+                secret = None
+            if secret:
+                secret_id = secret.get_info().id
+                self._databag(scope)[SECRET_ID_KEY] = secret_id
+                self._ids[scope] = secret_id
+            self._set_scheme(scope, DEFAULT_SCHEME)
@@ -0,0 +1,117 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Logging of secret operations: lazy, redacted and sampled.
+
+Shared by all test charms: keep the copies in sync (`tests/unit/test_shared_modules.py`).
+
+Secret values never reach the log: only their keys are, each with a digest of its value,
+keyed with a random key of the process (values can be told apart within a dispatch, not
+guessed). Nothing is formatted unless the record is emitted. The fields of each record
+are also passed as `extra` (`secret_operation`, `secret_name`, `secret_keys`), for
+structured handlers.
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+# Key of the digests of the values logged, for the lifetime of the process
+_DIGEST_KEY = os.urandom(16)
+DIGEST_LENGTH = 8
+
+# Default sampling of `sampled()` blocks: one record logged per operation in that many
+HOT_PATH_SAMPLE = 100
+
+
+def value_digest(value: str) -> str:
+    """Digest of a secret value, as logged."""
+    return hmac.new(_DIGEST_KEY, value.encode(), hashlib.sha256).hexdigest()[:DIGEST_LENGTH]
+
+
+class Redacted:
+    """Keys of a secret content with digests of their values, rendered only when logged."""
+
+    def __init__(self, content: Optional[Mapping[str, str]] = None, **names: Iterable[str]):
+        self.content = content
+        self.names = names
+
+    def __str__(self) -> str:
+        """Digested fields, then the names given, e.g. `password=<1f2e...> removed=['tls']`."""
+        fields = [f"{key}=<{value_digest(value)}>" for key, value in (self.content or {}).items()]
+        fields.extend(f"{field}={sorted(names)}" for field, names in self.names.items() if names)
+        return " ".join(fields) or "-"
+
+
+class SecretLogger(logging.LoggerAdapter):
+    """Logger adapter for secret operations.
+
+    Example:
+        secret_log = SecretLogger(logger)
+        secret_log.secret("set", label, content)
+        with secret_log.sampled():
+            for ...:
+                secret_log.secret("retrieved", label, content)
+    """
+
+    def __init__(self, logger: logging.Logger, extra: Optional[Dict[str, Any]] = None):
+        super().__init__(logger, extra or {})
+        self.sample = 1
+        self._counts = Counter()
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+        return msg, kwargs
+
+    @contextmanager
+    def sampled(self, every: int = HOT_PATH_SAMPLE):
+        """Log one record per operation in `every` within the block (hot paths)."""
+        previous, self.sample = self.sample, max(every, 1)
+        try:
+            yield self
+        finally:
+            self.sample = previous
+
+    def secret(
+        self,
+        operation: str,
+        name: Optional[str],
+        content: Optional[Mapping[str, str]] = None,
+        level: int = logging.INFO,
+        **names: Iterable[str],
+    ) -> None:
+        """Log an operation on a secret: its keys (with digests of the values), and names.
+
+        Args:
+            operation: what was done (e.g. "retrieved", "set").
+            name: label or ID of the secret.
+            content: content involved, of which only keys and digests are logged.
+            level: level of the record.
+            names: other key names to log (e.g. `removed=[key]`), as they are.
+        """
+        if not self.isEnabledFor(level):
+            return
+        if self.sample > 1:
+            self._counts[operation] += 1
+            if self._counts[operation] % self.sample != 1:
+                return
+
+        extra = {
+            "secret_operation": operation,
+            "secret_name": name,
+            "secret_keys": list(content or {}),
+        }
+        sampled = f" (1/{self.sample})" if self.sample > 1 else ""
+        self.log(
+            level,
+            "Secret %s %s%s: %s",
+            name,
+            operation,
+            sampled,
+            Redacted(content, **names),
+            extra=extra,
+        )
@@ -0,0 +1,125 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Archives of secrets: versioned, compressed and encrypted, written and read block by block.
+
+An archive is a header line (JSON, not encrypted), followed by one line per block of
+secrets: the JSON list of the secrets of the block, zlib-compressed and encrypted (Fernet
+token). Secrets are never all held in memory at once, neither when writing nor reading.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List
+
+from cryptography.fernet import Fernet, InvalidToken
+
+ARCHIVE_FORMAT = "juju-secrets-archive"
+ARCHIVE_VERSION = 1
+# Secrets per block (each block compressed and encrypted on its own)
+BLOCK_SIZE = 100
+
+
+class ArchiveError(Exception):
+    """The archive can't be read (format, version, key)."""
+
+
+def new_key() -> str:
+    """Generate a new archive key."""
+    return Fernet.generate_key().decode()
+
+
+def key_fingerprint(key: str) -> str:
+    """Fingerprint a key, telling which key an archive was encrypted with."""
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def new_archive_path(name: str) -> str:
+    """Create a new file for an archive, only readable by its owner."""
+    fd, path = tempfile.mkstemp(prefix=f"{name}-", suffix=".archive")
+    os.close(fd)
+    return path
+
+
+def content_digest(content: Dict[str, str]) -> str:
+    """Digest of the content of a secret, for secrets unchanged to be skipped on import."""
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def _blocks(records: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    block = []
+    for record in records:
+        block.append(record)
+        if len(block) == BLOCK_SIZE:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def write_archive(
+    path: str, key: str, records: Iterable[Dict[str, Any]], metadata: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Write secrets (`{"label", "scope", "content", "digest"}` records) to an archive.
+
+    The file is only readable by its owner.
+
+    Returns:
+        the path of the archive, its SHA-256 digest and size, and the number of secrets.
+    """
+    fernet = Fernet(key.encode())
+    header = {
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "compression": "zlib",
+        "encryption": "fernet",
+        "key": key_fingerprint(key),
+        "created": time.time(),
+        **metadata,
+    }
+    digest = hashlib.sha256()
+    size = secrets = 0
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+
+        def write(data: bytes) -> None:
+            nonlocal size
+            f.write(data)
+            digest.update(data)
+            size += len(data)
+
+        write(json.dumps(header, sort_keys=True).encode() + b"\n")
+        for block in _blocks(records):
+            write(fernet.encrypt(zlib.compress(json.dumps(block).encode())) + b"\n")
+            secrets += len(block)
+    return {"path": path, "sha256": digest.hexdigest(), "bytes": size, "secrets": secrets}
+
+
+def read_archive(path: str, key: str) -> Iterator[List[Dict[str, Any]]]:
+    """Blocks of secrets of an archive, decrypted and decompressed one at a time.
+
+    Raises:
+        ArchiveError if the archive isn't one, of a newer version, or of another key.
+    """
+    fernet = Fernet(key.encode())
+    with open(path, "rb") as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            raise ArchiveError(f"{path} is not a secrets archive")
+        if not isinstance(header, dict) or header.get("format") != ARCHIVE_FORMAT:
+            raise ArchiveError(f"{path} is not a secrets archive")
+        if header.get("version", 0) > ARCHIVE_VERSION:
+            raise ArchiveError(f"Unsupported archive version {header['version']}")
+        if header.get("key") != key_fingerprint(key):
+            raise ArchiveError("The archive was encrypted with another key")
+
+        for line in f:
+            try:
+                yield json.loads(zlib.decompress(fernet.decrypt(line.strip())))
+            except InvalidToken:
+                raise ArchiveError(f"{path} is corrupted")
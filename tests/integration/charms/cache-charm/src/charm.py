@@ -6,38 +6,77 @@
 
 """A small charm handling secret manipulation within a single Juju Secret object"""
 
+import json
 import logging
-from typing import Optional, Dict
+from contextlib import contextmanager
+from collections.abc import Mapping
+from typing import Any, Optional, Dict, List, Tuple
 
 import ops
-from ops import ActiveStatus, SecretNotFoundError, SecretInfo, Secret
-from ops.charm import ActionEvent, CharmBase
+from ops import ActiveStatus, ModelError, SecretNotFoundError, SecretInfo, Secret
+from ops.charm import ActionEvent, CharmBase, RelationChangedEvent
+from ops.framework import StoredState
+
+from archive import (
+    ArchiveError,
+    content_digest,
+    new_archive_path,
+    new_key,
+    read_archive,
+    write_archive,
+)
+from helpers import (
+    DispatchContext,
+    Scope,
+    SecretContent,
+    WriteQueue,
+    coalesce,
+    encode_content,
+    get_results,
+    owned_secret_labels,
+    reserved_keys,
+    run_stress,
+    scope_param,
+    stress_params,
+)
+from hook_stats import HookToolStats
+from secret_log import SecretLogger
 
 # Log messages can be retrieved using juju debug-log
 logger = logging.getLogger(__name__)
+secret_log = SecretLogger(logger)
 
 VALID_LOG_LEVELS = ["info", "debug", "warning", "error", "critical"]
 PEER = "charm-peer"
 
 SECRET_DEFAULT_LABEL = "mysecret"
+# Label of the app secret holding the key of the archives (export-secrets, import-secrets)
+ARCHIVE_KEY_LABEL = "archive-key"
+
+# Peer app databag field the leader publishes the revision of each secret in: {label: revision}
+REVISIONS_KEY = "secret-revisions"
 
 
 class CachedSecret:
     """Internal helper class locally cache secrets.
 
-    The data structure is precisely re-using/simulating as in the actual Secret Storage
+    The data structure is precisely reusing/simulating as in the actual Secret Storage.
+    Contents are stored encoded (see `encode_content()`), and decoded on access.
     """
 
     def __init__(self, charm: CharmBase, label: str) -> None:
         self._secret_meta = None
-        self._secret_content = {}
+        self._secret_content = None
         self._secret_label = label
         self.charm = charm
 
-    def add_secret(self, content: Dict[str, str]) -> Secret:
-        """Create a new secret."""
-        secret = self.charm.app.add_secret(content, label=self._secret_label)
+    def add_secret(self, content: Dict[str, str], scope: Scope = Scope.APP) -> Secret:
+        """Create a new secret, owned by the application or by the unit."""
+        owner = self.charm.app if scope == Scope.APP else self.charm.unit
+        encoded = encode_content(content)
+        secret = owner.add_secret(encoded, label=self._secret_label)
         self._secret_meta = secret
+        self._secret_content = SecretContent(encoded)
         return self._secret_meta
 
     @property
@@ -50,18 +89,25 @@ class CachedSecret:
                 return
         return self._secret_meta
 
+    @property
+    def content(self) -> SecretContent:
+        """Cached secret content, decoded lazily."""
+        if self._secret_content is None:
+            if not self.meta:
+                return SecretContent({})
+            self._secret_content = SecretContent(self.meta.get_content())
+        return self._secret_content
+
     def get_content(self) -> Dict[str, str]:
         """Getting cached secret content."""
-        if not self._secret_content:
-            if self.meta:
-                self._secret_content = self.meta.get_content()
-        return self._secret_content
+        return dict(self.content)
 
     def set_content(self, content: Dict[str, str]) -> None:
         """Setting cached secret content."""
         if self.meta:
-            self.meta.set_content(content)
-            self._secret_content = content
+            encoded = encode_content(content)
+            self.meta.set_content(encoded)
+            self._secret_content = SecretContent(encoded)
 
     def get_info(self) -> Optional[SecretInfo]:
         """Wrapper function to provide direct access to contained Secret's equal function."""
@@ -70,37 +116,255 @@ class CachedSecret:
 
 
 class SecretCache:
+    """Secrets of the charm by label, cached for the time of a dispatch.
+
+    The leader counts its writes to each secret, and publishes these revisions in the peer
+    app databag (once, at the end of the dispatch). Other units keep the revision of each
+    secret they read in their stored state (never the content, held in memory for the
+    dispatch only): on a change of the peer relation, only secrets with a newer revision
+    published are read again.
+    """
+
     def __init__(self, charm):
         self.charm = charm
         self._secrets = {}
+        self._revisions = None
+        self._written = False
+        # Writes staged by batch(): {label: {"action": ..., "content": ..., ...}}
+        self._staged = None
 
     def get(self, label):
+        if self._staged and self._staged.get(label, {}).get("action") == "remove":
+            return
         if not self._secrets.get(label):
             secret = CachedSecret(self.charm, label)
             if secret.meta:
                 self._secrets[label] = secret
         return self._secrets.get(label)
 
-    def add(self, label, content):
+    def add(self, label, content, scope: Scope = Scope.APP):
+        if self._staged is not None:
+            return self._stage_add(label, content, scope)
         if not self._secrets.get(label):
             secret = CachedSecret(self.charm, label)
-            secret.add_secret(content)
+            secret.add_secret(content, scope)
             self._secrets[label] = secret
         return self._secrets.get(label)
 
+    def update(self, label, content):
+        """Set the content of an existing secret."""
+        secret = self.get(label)
+        if self._staged is None:
+            secret.set_content(content)
+            return
+
+        staged = self._staged.get(label)
+        if not staged or staged["action"] != "create":
+            previous = staged["previous"] if staged else dict(secret.get_content())
+            self._staged[label] = {"action": "update", "content": content, "previous": previous}
+        else:
+            staged["content"] = content
+        secret._secret_content = SecretContent(content)
+
+    def remove(self, label):
+        """Remove a secret with all its revisions."""
+        if self._staged is None:
+            if secret := self.get(label):
+                secret.meta.remove_all_revisions()
+            self.forget(label)
+            return
+
+        staged = self._staged.get(label)
+        if staged and staged["action"] == "create":
+            del self._staged[label]
+        elif self.get(label):
+            self._staged[label] = {"action": "remove"}
+        self.forget(label)
+
+    def forget(self, label):
+        self._secrets.pop(label, None)
+
+    def creating(self, label) -> bool:
+        """Whether the secret is to be created by the current batch (no ID yet)."""
+        return bool(self._staged) and self._staged.get(label, {}).get("action") == "create"
+
+    @contextmanager
+    def batch(self):
+        """Stage the writes to secrets, apply them at once when leaving the block.
+
+        Only the final state of each secret is written: creations and updates first,
+        removals only once all of them succeeded. If a write fails, the secrets created are
+        removed, the ones updated get their previous content back (as a new revision: Juju
+        doesn't restore revisions), the revisions to publish are the ones before the batch
+        again, and the error is raised. Removals can't be undone.
+
+        Reads within the block see the staged content. Nothing is written if the block
+        raises; batches nested join the outer one.
+        """
+        if self._staged is not None:
+            yield self
+            return
+
+        self._staged = {}
+        revisions = (
+            dict(self._revisions) if self._revisions is not None else None,
+            self._written,
+        )
+        try:
+            yield self
+            staged = self._staged
+        except Exception:
+            for label in self._staged:
+                self.forget(label)
+            self._revisions, self._written = revisions
+            raise
+        finally:
+            self._staged = None
+        try:
+            self._flush(staged)
+        except Exception:
+            self._revisions, self._written = revisions
+            raise
+
+    def _stage_add(self, label, content, scope: Scope) -> CachedSecret:
+        """Stage the creation of a secret (or the update of one removed in the batch)."""
+        staged = self._staged.get(label)
+        if staged and staged["action"] == "remove":
+            del self._staged[label]
+            self.update(label, content)
+            return self._secrets[label]
+
+        secret = CachedSecret(self.charm, label)
+        secret._secret_content = SecretContent(content)
+        self._secrets[label] = secret
+        self._staged[label] = {"action": "create", "content": content, "scope": scope}
+        return secret
+
+    def _flush(self, staged: Dict[str, Dict[str, Any]]) -> None:
+        """Apply the staged writes, rolling back the ones applied if any fails."""
+        applied = []
+        try:
+            for label, change in staged.items():
+                if change["action"] != "remove":
+                    self._write(label, change)
+                    applied.append((label, change))
+        except Exception:
+            self._rollback(applied)
+            raise
+
+        for label, change in staged.items():
+            if change["action"] == "remove":
+                self.remove(label)
+
+    def _write(self, label: str, change: Dict[str, Any]) -> None:
+        """Create or update a secret, as staged."""
+        secret = self._secrets.get(label) or CachedSecret(self.charm, label)
+        if change["action"] == "create":
+            secret.add_secret(change["content"], change["scope"])
+            self._secrets[label] = secret
+        else:
+            secret.set_content(change["content"])
+
+    def _rollback(self, applied: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Undo the writes of a batch applied before one failed."""
+        for label, change in applied:
+            try:
+                if change["action"] == "create":
+                    self.remove(label)
+                else:
+                    self._secrets[label].set_content(change["previous"])
+            except ModelError as e:
+                logger.error(f"Couldn't roll back the {change['action']} of secret {label}: {e}")
+
+    @property
+    def revisions(self) -> Dict[str, int]:
+        """Revisions of the secrets, as published by the leader."""
+        if self._revisions is None:
+            self._revisions = json.loads(self.charm.app_peer_data.get(REVISIONS_KEY, "{}"))
+        return self._revisions
+
+    def written(self, label: str, removed: bool = False) -> None:
+        """Account for a write of the leader to a secret."""
+        if removed:
+            self.revisions.pop(label, None)
+        else:
+            self.revisions[label] = self.revisions.get(label, 0) + 1
+        self._written = True
+
+    def publish(self) -> None:
+        """Publish the revisions of the secrets written to, if any."""
+        if self._written and self.charm.peers:
+            self.charm.app_peer_data[REVISIONS_KEY] = json.dumps(
+                self.revisions, sort_keys=True, separators=(",", ":")
+            )
+            self._written = False
+
+    def stale(self) -> List[str]:
+        """Labels of which the revision read last is not the latest one."""
+        stored = self.charm._stored.revisions
+        return [label for label, revision in self.revisions.items() if stored.get(label) != revision]
+
+    def get_content(self, label: str) -> Dict[str, str]:
+        """Content of a secret, read once per dispatch."""
+        return dict(self.content(label))
+
+    def content(self, label: str) -> Mapping:
+        """Content of a secret, as `get_content()` (decoded on access)."""
+        secret = self.get(label)
+        if not secret:
+            return {}
+        if not self.charm.context.is_leader:
+            self._seen(label)
+        return secret.content
+
+    def _seen(self, label: str) -> None:
+        """Store the revision published of a secret read by a non-leader unit."""
+        if (revision := self.revisions.get(label)) is not None:
+            self.charm._stored.revisions[label] = revision
+
+    def refresh(self) -> List[str]:
+        """Read the stale secrets again, drop the removed ones (non-leader units)."""
+        stored = self.charm._stored
+        for label in [label for label in stored.revisions if label not in self.revisions]:
+            del stored.revisions[label]
+
+        stale = self.stale()
+        for label in stale:
+            self.forget(label)
+            self.content(label)
+        return stale
+
 
 class SecretsTestCharm(ops.CharmBase):
     """Charm the service."""
 
+    _stored = StoredState()
+
     def __init__(self, *args):
         super().__init__(*args)
+        self.hook_stats = HookToolStats(self)
+        self.context = DispatchContext.of(self.model)
+        # Revisions of the secrets read by a non-leader unit: {label: revision}
+        self._stored.set_default(revisions={})
+        # Content of secrets stored by earlier versions of the charm: not kept on disk
+        if hasattr(self._stored, "contents"):
+            self._stored.contents = {}
+        self.write_queue = WriteQueue(self)
 
         self.framework.observe(self.on.start, self._on_start)
+        self.framework.observe(self.on.leader_elected, self._on_leader_elected)
+        self.framework.observe(self.on[PEER].relation_changed, self._on_peer_relation_changed)
+        self.framework.observe(self.framework.on.pre_commit, self._on_pre_commit)
 
         self.framework.observe(self.on.set_secret_action, self._on_set_secret_action)
         self.framework.observe(self.on.get_secret_action, self._on_get_secret_action)
         self.framework.observe(self.on.delete_secrets_action, self._on_delete_secrets_action)
         self.framework.observe(self.on.forget_default_secret_action, self._on_forget_default_secret_action)
+        self.framework.observe(self.on.stress_action, self._on_stress_action)
+        self.framework.observe(self.on.write_status_action, self._on_write_status_action)
+        self.framework.observe(self.on.secret_sizes_action, self._on_secret_sizes_action)
+        self.framework.observe(self.on.export_secrets_action, self._on_export_secrets_action)
+        self.framework.observe(self.on.import_secrets_action, self._on_import_secrets_action)
 
         self.secret_cache = SecretCache(self)
 
@@ -111,40 +375,168 @@ class SecretsTestCharm(ops.CharmBase):
     def _on_start(self, event) -> None:
         self.unit.status = ActiveStatus()
 
+    def _on_leader_elected(self, event) -> None:
+        self._apply_write_requests()
+
+    def _on_peer_relation_changed(self, event: RelationChangedEvent) -> None:
+        """Apply the write requests of the units on the leader.
+
+        Non-leader units drop their requests applied, and read the secrets the leader
+        published a new revision of.
+        """
+        if self.context.is_leader:
+            self._apply_write_requests()
+            return
+
+        self.write_queue.prune()
+        if stale := self.secret_cache.refresh():
+            logger.info(f"Refreshed secrets {stale}")
+
+    def _on_pre_commit(self, event) -> None:
+        if self.context.is_leader:
+            self.secret_cache.publish()
+
     def _on_set_secret_action(self, event: ActionEvent):
-        if self.unit.is_leader():
-            label = event.params.get("label")
-            content = event.params.get("content")
-            if label:
-                event.set_results({self.generate_label(label): self.set_secret(content, label)})
-            else:
-                event.set_results({self.generate_label(): self.set_secret(content)})
+        if not (scope := self._action_scope(event)):
+            return
+        label = event.params.get("label") or SECRET_DEFAULT_LABEL
+        content = event.params.get("content")
+        if reserved := reserved_keys(content):
+            event.fail(f"Reserved secret keys (ending in -codec or -chunk-<n>): {reserved}")
+            return
+        if self._can_write(scope):
+            event.set_results(
+                {self.generate_label(label, scope): self.set_secret(content, label, scope)}
+            )
+        else:
+            self._request_write(event, "set", label, content=content)
 
     def _on_get_secret_action(self, event: ActionEvent):
-        """Return the secrets stored in juju secrets backend."""
-        label = event.params.get("label")
-        if label:
-            event.set_results({"secret": self.get_secret()})
-        else:
-            event.set_results({"secret": self.get_secret()})
+        """Return the secrets stored in juju secrets backend (a page of them, or a file)."""
+        if scope := self._action_scope(event):
+            label = event.params.get("label") or SECRET_DEFAULT_LABEL
+            full_label = self.generate_label(label, scope)
+            content = self.secret_cache.content(full_label)
+            event.set_results(get_results(content, event.params, "secret", full_label))
 
     def _on_delete_secrets_action(self, event: ActionEvent):
-        if self.unit.is_leader():
-            label = event.params.get("label")
-            keys = event.params.get("keys")
+        if not (scope := self._action_scope(event)):
+            return
+        label = event.params.get("label") or SECRET_DEFAULT_LABEL
+        keys = event.params.get("keys")
+        if self._can_write(scope):
             for key in keys:
-                if label:
-                    self.delete_secret(key, label)
-                else:
-                    self.delete_secret(key)
+                self.delete_secret(key, label, scope)
+        else:
+            self._request_write(event, "delete", label, keys=keys)
 
     def _on_forget_default_secret_action(self, event: ActionEvent):
-        if self.unit.is_leader():
-            label = event.params.get("label")
-            if label:
-                self.delete_full_secret(label)
-            else:
-                self.delete_full_secret()
+        if not (scope := self._action_scope(event)):
+            return
+        label = event.params.get("label") or SECRET_DEFAULT_LABEL
+        if self._can_write(scope):
+            self.delete_full_secret(label, scope)
+        else:
+            self._request_write(event, "forget", label)
+
+    def _on_write_status_action(self, event: ActionEvent):
+        """Report whether the leader applied a write request."""
+        event.set_results({"status": self.write_queue.status(event.params.get("ticket", ""))})
+
+    def _on_secret_sizes_action(self, event: ActionEvent):
+        """Report the size of each value of a secret, as read and as stored."""
+        if scope := self._action_scope(event):
+            label = event.params.get("label") or SECRET_DEFAULT_LABEL
+            secret = self._get_my_secret(label, scope)
+            event.set_results({"sizes": secret.content.sizes() if secret else {}})
+
+    def _on_export_secrets_action(self, event: ActionEvent):
+        """Write the secrets of the charm to an archive: all, under a label prefix, or some.
+
+        The secrets of the labels given are exported (those that don't exist are skipped),
+        otherwise every secret of the scope the unit owns (its app's ones on the leader
+        only) with a label under the prefix given, as listed by `_owned_labels()`.
+        """
+        if not (scope := self._action_scope(event)):
+            return
+        try:
+            key = self._archive_key(event.params.get("key-secret"))
+        except (ArchiveError, KeyError, ModelError) as e:
+            event.fail(f"No archive key: {e}")
+            return
+
+        try:
+            labels = event.params.get("labels") or self._owned_labels(
+                scope, event.params.get("prefix", "")
+            )
+        except ModelError as e:
+            event.fail(f"Can't list the secrets: {e}")
+            return
+        records = (self._export_record(label, scope) for label in labels)
+        path = event.params.get("path") or new_archive_path(f"{self.app.name}-secrets")
+        try:
+            results = write_archive(
+                path, key, filter(None, records), {"app": self.app.name, "scope": scope.value}
+            )
+        except OSError as e:
+            event.fail(f"Can't write {path}: {e}")
+            return
+        event.set_results(results)
+
+    def _on_import_secrets_action(self, event: ActionEvent):
+        """Write the secrets of an archive, skipping those holding the same content already.
+
+        The secrets of each block of the archive are written in a batch.
+        """
+        if not (scope := self._action_scope(event)):
+            return
+        if not self._can_write(scope):
+            event.fail("Only the leader unit can write app secrets")
+            return
+        if not (path := event.params.get("path")):
+            event.fail("The path of the archive is required")
+            return
+        prefix = event.params.get("prefix", "")
+
+        written = unchanged = 0
+        try:
+            key = self._archive_key(event.params.get("key-secret"))
+            for block in read_archive(path, key):
+                with self.secret_cache.batch():
+                    changed = [
+                        self._import_record(record, scope)
+                        for record in block
+                        if record["scope"] == scope.value and record["label"].startswith(prefix)
+                    ]
+                written += sum(changed)
+                unchanged += len(changed) - sum(changed)
+        except (ArchiveError, OSError, KeyError, ValueError, ModelError) as e:
+            event.fail(f"Import of {path} stopped after {written} secrets written: {e}")
+            return
+        event.set_results({"written": written, "unchanged": unchanged})
+
+    def _on_stress_action(self, event: ActionEvent):
+        """Churn secrets with a read/write/delete mix, report throughput and latencies."""
+        if not (scope := self._action_scope(event)):
+            return
+        if not self._can_write(scope):
+            event.fail("Only the leader unit can write app secrets")
+            return
+
+        try:
+            params = stress_params(event.params)
+        except ValueError as e:
+            event.fail(str(e))
+            return
+        labels = [f"stress{index}" for index in range(params.pop("secrets"))]
+        operations = {
+            "read": lambda label, key, value: self.get_secret(label, scope),
+            "write": lambda label, key, value: self.set_secret({key: value}, label, scope),
+            "delete": lambda label, key, value: self.delete_secret(key, label, scope),
+        }
+        with secret_log.sampled():
+            results = run_stress(operations, labels, **params)
+        event.set_results(results)
 
 ##############################################################################
 # Properties and methods
@@ -152,83 +544,207 @@ class SecretsTestCharm(ops.CharmBase):
 
     @property
     def peers(self) -> ops.model.Relation:
-        """Retrieve the peer relation (`ops.model.Relation`)."""
-        return self.model.get_relation(PEER)
+        """Retrieve the peer relation (`ops.model.Relation`), looked up once per dispatch."""
+        return self.context.relation(PEER)
 
     @property
     def app_peer_data(self) -> dict[str, str]:
         """Application peer relation data object."""
-        if self.peers is None:
+        if (peers := self.peers) is None:
             return {}
 
-        return self.peers.data[self.app]
+        return peers.data[self.app]
+
+    def _action_scope(self, event: ActionEvent) -> Optional[Scope]:
+        """Scope an action is called for, failing the action if invalid."""
+        scope = scope_param(event.params)
+        if not scope:
+            event.fail(f"Invalid scope {event.params.get('scope')}, expected app or unit")
+        return scope
 
-    def generate_label(self, label: Optional[str] = SECRET_DEFAULT_LABEL):
+    def _can_write(self, scope: Scope) -> bool:
+        """App secrets are written by the leader, unit secrets by any unit."""
+        return scope == Scope.UNIT or self.context.is_leader
+
+    def _request_write(self, event: ActionEvent, action: str, label: str, **fields) -> None:
+        """Pass a write to an app secret on to the leader, the ticket of the request as result."""
+        if not (ticket := self.write_queue.enqueue(action, label, **fields)):
+            event.fail("Only the leader unit can write app secrets")
+            return
+        event.set_results({"ticket": ticket})
+
+    def _apply_write_requests(self) -> None:
+        """Apply the write requests of the units (leader), all secrets in a single batch."""
+        with self.secret_cache.batch():
+            applied = self.write_queue.drain(self._write_requested)
+        if applied:
+            logger.info(f"Applied {applied} write requests")
+
+    def _write_requested(self, label: str, requests: List[Dict[str, Any]]) -> None:
+        """Apply the write requests to a secret, writing it once."""
+        full_label = self.generate_label(label)
+        secret = self._get_my_secret(label)
+        current = secret.get_content() if secret else {}
+        content = coalesce(current, requests)
+        if content == current:
+            return
+
+        if not content:
+            self.secret_cache.remove(full_label)
+        elif secret:
+            self.secret_cache.update(full_label, content)
+        else:
+            self.secret_cache.add(label=full_label, content=content)
+        self.secret_cache.written(full_label, removed=not content)
+
+    def generate_label(
+        self, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ):
         """Generate label on the fly"""
+        if scope == Scope.UNIT:
+            return f"{self.unit.name.replace('/', '-')}.{label}"
         return f"{self.app.name}.{label}"
 
-    def _get_my_secret(self, label: Optional[str] = SECRET_DEFAULT_LABEL):
-        full_label = self.generate_label(label)
+    def _get_my_secret(
+        self, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ):
+        full_label = self.generate_label(label, scope)
         try:
             return self.secret_cache.get(label=full_label)
         except SecretNotFoundError:
             pass
         return {}
 
-    def get_secret(self, label: Optional[str] = SECRET_DEFAULT_LABEL) -> dict[str, str]:
+    def get_secret(
+        self, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ) -> dict[str, str]:
         """Get the secrets stored in juju secrets backend."""
-        secret = self._get_my_secret(label)
-
-        if not secret:
+        full_label = self.generate_label(label, scope)
+        content = self.secret_cache.get_content(full_label)
+        if not content:
             return {}
 
-        content = secret.get_content()
-        logger.info(f"Retrieved secret {self.generate_label(label)} with content {content}")
+        secret_log.secret("retrieved", full_label, content)
         return content
 
-    def set_secret(self, new_content: dict, label: Optional[str] = SECRET_DEFAULT_LABEL) -> None:
-        """Set the secret in the juju secret storage."""
-        full_label = self.generate_label(label)
-        secret = self._get_my_secret(label=label)
+    def set_secret(
+        self,
+        new_content: dict,
+        label: Optional[str] = SECRET_DEFAULT_LABEL,
+        scope: Scope = Scope.APP,
+    ) -> Optional[str]:
+        """Set the secret in the juju secret storage, return its ID (none yet within a batch).
+
+        App secrets are owned by the application, unit secrets by the unit writing them.
+        Only the revisions of app secrets are published to the other units.
+        """
+        full_label = self.generate_label(label, scope)
+        secret = self._get_my_secret(label=label, scope=scope)
 
         if secret:
-            content = secret.get_content()
-            content.update(new_content)
-            logger.info(f"Setting secret {full_label} to {content}")
-            secret.set_content(content)
+            content = {**secret.get_content(), **new_content}
+            secret_log.secret("set", full_label, content)
+            self.secret_cache.update(full_label, content)
         else:
-            secret = self.secret_cache.add(label=full_label, content=new_content)
-            logger.info(f"Added secret {full_label} with {new_content}")
+            secret = self.secret_cache.add(label=full_label, content=new_content, scope=scope)
+            secret_log.secret("added", full_label, new_content)
+        if scope == Scope.APP:
+            self.secret_cache.written(full_label)
 
+        if self.secret_cache.creating(full_label):
+            return
         return secret.meta.id
 
-    def delete_secret(self, key: str, label: Optional[str] = SECRET_DEFAULT_LABEL) -> None:
+    def delete_secret(
+        self, key: str, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ) -> None:
         """Remove a secret."""
-        secret = self._get_my_secret(label=label)
+        full_label = self.generate_label(label, scope)
+        secret = self._get_my_secret(label=label, scope=scope)
 
         if not secret:
             logging.error("Can't delete any secrets as we have none defined")
+            return
 
-        content = secret.get_content()
+        content = dict(secret.get_content())
         if key in content:
             del content[key]
-        logger.info(f"Removing {key} from secret {secret.meta.id}")
-        logger.info(f"Remaining content is {list(content.keys())}")
+        secret_log.secret("deleted", full_label, content, removed=[key])
         if content:
-            secret.set_content(content)
+            self.secret_cache.update(full_label, content)
         else:
-            secret.meta.remove_all_revisions()
+            self.secret_cache.remove(full_label)
+        if scope == Scope.APP:
+            self.secret_cache.written(full_label, removed=not content)
 
-    def delete_full_secret(self, label: Optional[str] = SECRET_DEFAULT_LABEL) -> None:
+    def delete_full_secret(
+        self, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ) -> None:
         """Remove the complete secret"""
-        full_label = self.generate_label(label)
+        full_label = self.generate_label(label, scope)
         try:
             secret = self.secret_cache.get(label=full_label)
         except SecretNotFoundError:
             return
 
         if secret:
-            secret.meta.remove_all_revisions()
+            self.secret_cache.remove(full_label)
+            if scope == Scope.APP:
+                self.secret_cache.written(full_label, removed=True)
+
+    def _archive_key(self, secret_id: Optional[str] = None) -> str:
+        """Key of the archives: the one of the app (created by the leader), or of a secret."""
+        if secret_id:
+            return self.model.get_secret(id=secret_id).get_content()["key"]
+        try:
+            secret = self.model.get_secret(label=self.generate_label(ARCHIVE_KEY_LABEL))
+        except SecretNotFoundError:
+            if not self.context.is_leader:
+                raise ArchiveError("the leader unit creates it on the first export")
+            key = new_key()
+            self.app.add_secret({"key": key}, label=self.generate_label(ARCHIVE_KEY_LABEL))
+            return key
+        return secret.get_content()["key"]
+
+    def _owned_labels(self, scope: Scope, prefix: str = "") -> List[str]:
+        """Labels (without the scope part) of the secrets of a scope owned, under a prefix.
+
+        Juju lists the secrets a unit owns with the `secret-ids` hook tool (and those of its
+        application, on the leader), their labels are read with `secret-info-get`. The key
+        of the archives isn't exported.
+        """
+        scope_prefix = self.generate_label("", scope)
+        internal = {self.generate_label(ARCHIVE_KEY_LABEL)}
+        return sorted(
+            label[len(scope_prefix) :]
+            for label in owned_secret_labels(self.model)
+            if label.startswith(scope_prefix + prefix) and label not in internal
+        )
+
+    def _export_record(self, label: str, scope: Scope) -> Optional[Dict[str, Any]]:
+        """Get a secret as written to an archive (None if it's gone)."""
+        if not (content := self.secret_cache.get_content(self.generate_label(label, scope))):
+            return None
+        return {
+            "label": label,
+            "scope": scope.value,
+            "content": content,
+            "digest": content_digest(content),
+        }
+
+    def _import_record(self, record: Dict[str, Any], scope: Scope) -> bool:
+        """Stage the write of a secret of an archive, unless it holds that content already."""
+        label, content = record["label"], record["content"]
+        full_label = self.generate_label(label, scope)
+        if secret := self._get_my_secret(label, scope):
+            if content_digest(secret.get_content()) == record["digest"]:
+                return False
+            self.secret_cache.update(full_label, content)
+        else:
+            self.secret_cache.add(label=full_label, content=content, scope=scope)
+        if scope == Scope.APP:
+            self.secret_cache.written(full_label)
+        return True
 
 
 if __name__ == "__main__":  # pragma: nocover
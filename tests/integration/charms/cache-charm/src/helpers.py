@@ -1,8 +1,26 @@
+import base64
+import bisect
+import hashlib
+import json
+import math
+import os
+import random
 import re
+import string
+import subprocess
+import tempfile
+import time
+import zlib
+from collections.abc import Mapping
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ops import JujuVersion, ModelError
 
 
 def compare_secret_ids(secret_id1: str, secret_id2: str) -> bool:
     """Reliable comparison on secret equality.
+
     Taken from existing PR where we're targeting this problem
 
     NOTE: Secret IDs may be of any of these forms:
@@ -20,3 +38,567 @@ def compare_secret_ids(secret_id1: str, secret_id2: str) -> bool:
     if pure_id1 and pure_id2:
         return pure_id1 == pure_id2
     return False
+
+
+class Scope(Enum):
+    """Owner of a secret: the application (managed by the leader), or a unit.
+
+    The same as `Scope` of the data_interfaces charm library.
+    """
+
+    APP = "app"
+    UNIT = "unit"
+
+
+class DispatchContext:
+    """What doesn't change during a dispatch, looked up once.
+
+    Peer relations, leadership, the Juju version and its capabilities.
+
+    Juju runs each dispatch in a new charm process, with a new model: the context lives as
+    long as the model (`DispatchContext.of(charm.model)`), shared by all objects of the charm.
+    Leadership is left to ops, which checks it again once the lease (30s) is over. Under
+    Harness, which keeps the same model across events, `reset()` starts a new dispatch.
+
+    The same as `DispatchContext` of the data_interfaces charm library.
+    """
+
+    # Attribute of the model keeping the context (data_interfaces keeps its own apart)
+    ATTRIBUTE = "_dispatch_context"
+
+    def __init__(self, model):
+        self.model = model
+        self.reset()
+
+    @classmethod
+    def of(cls, model) -> "DispatchContext":
+        """Get the context of the dispatch a model is of."""
+        if (context := getattr(model, cls.ATTRIBUTE, None)) is None:
+            context = cls(model)
+            setattr(model, cls.ATTRIBUTE, context)
+        return context
+
+    def reset(self) -> None:
+        self._relations = {}
+        self._juju_version = None
+
+    def relation(self, name: str):
+        """Get the relation of an endpoint with a single one (peers), None if not there (yet)."""
+        if (relation := self._relations.get(name)) is None:
+            if relation := self.model.get_relation(name):
+                self._relations[name] = relation
+        return relation
+
+    @property
+    def is_leader(self) -> bool:
+        # Not memoized: changes within a dispatch (Harness.set_leader) are seen, ops keeps it
+        # for the lease without calling is-leader again
+        return self.model.unit.is_leader()
+
+    @property
+    def juju_version(self) -> JujuVersion:
+        if self._juju_version is None:
+            self._juju_version = JujuVersion.from_environ()
+        return self._juju_version
+
+    @property
+    def has_secrets(self) -> bool:
+        return self.juju_version.has_secrets
+
+
+def scope_param(params: Dict[str, Any]) -> Optional[Scope]:
+    """Scope of the secrets an action is called for (`app` by default), None if invalid."""
+    try:
+        return Scope(params.get("scope") or Scope.APP.value)
+    except ValueError:
+        return None
+
+
+# Secrets owned by the charm
+
+
+def secret_ids(model) -> List[str]:
+    """IDs of the secrets the unit owns, and its application on the leader (`secret-ids`).
+
+    ops doesn't wrap this hook tool in its model backend: it is run directly, unless the
+    backend serves it (e.g. the fake Juju of the unit tests).
+    """
+    if hasattr(model._backend, "secret_ids"):
+        return model._backend.secret_ids()
+    try:
+        output = subprocess.run(
+            ["secret-ids", "--format=json"], capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise ModelError(f"secret-ids failed: {getattr(e, 'stderr', None) or e}") from e
+    return json.loads(output or "[]")
+
+
+def owned_secret_labels(model) -> Iterator[str]:
+    """Labels of the secrets the unit (and its application on the leader) owns.
+
+    Each label is read with `secret-info-get`, the content of the secrets isn't read.
+    """
+    for secret_id in secret_ids(model):
+        if label := model._backend.secret_info_get(id=secret_id).label:
+            yield label
+
+
+# Secret content codec (the same as the one of the data_interfaces charm library)
+
+# Secret values longer than this (bytes) are stored compressed
+COMPRESS_THRESHOLD = 1024
+# Longest encoded value stored in a single secret key, longer ones are split across keys
+CHUNK_SIZE = 4096
+# Keys holding an encoded value `<key>`: `<key>-codec` ("<codec>:<chunks>:<size>"), and
+# `<key>-chunk-<n>` for each of its chunks
+CODEC_SUFFIX = "-codec"
+CHUNK_SUFFIX = "-chunk-"
+CODEC_HEADER = re.compile(r"(zlib|raw):([1-9][0-9]*):([0-9]+)")
+# Keys of the content written can't end like the codec and chunk keys
+RESERVED_KEY = re.compile(rf".*({CODEC_SUFFIX}|{CHUNK_SUFFIX}[0-9]+)")
+
+
+def reserved_keys(content: Dict[str, str]) -> List[str]:
+    """Keys of a content which could be mistaken for codec or chunk keys once stored."""
+    return sorted(key for key in content if RESERVED_KEY.fullmatch(key))
+
+
+def encode_content(content: Dict[str, str]) -> Dict[str, str]:
+    """Content of a secret as stored: large values compressed, and chunked if still too large.
+
+    Raises ValueError if keys of the content are reserved (see `reserved_keys()`).
+    """
+    if reserved := reserved_keys(content):
+        raise ValueError(f"Reserved secret keys (ending in -codec or -chunk-<n>): {reserved}")
+    encoded = {}
+    for key, value in content.items():
+        size = len(value.encode())
+        if size <= COMPRESS_THRESHOLD:
+            encoded[key] = value
+            continue
+
+        codec, data = "zlib", base64.b64encode(zlib.compress(value.encode())).decode()
+        if len(data) >= len(value):
+            if len(value) <= CHUNK_SIZE:
+                encoded[key] = value
+                continue
+            codec, data = "raw", value
+
+        chunks = range(0, len(data), CHUNK_SIZE)
+        encoded[f"{key}{CODEC_SUFFIX}"] = f"{codec}:{len(chunks)}:{size}"
+        for index, start in enumerate(chunks):
+            encoded[f"{key}{CHUNK_SUFFIX}{index}"] = data[start : start + CHUNK_SIZE]
+    return encoded
+
+
+class SecretContent(Mapping):
+    """Content of a secret as read, values decoded only once accessed."""
+
+    def __init__(self, stored: Dict[str, str]):
+        """Index the keys of the content as stored, nothing is decoded yet.
+
+        A codec key is only taken as such with a valid header and all its chunks present:
+        keys written before `encode_content()` reserved these names are left as they are.
+        """
+        self.stored = stored
+        self._decoded = {}
+        # Encoded values: {key: (codec, chunks, size)}
+        self._encoded = {}
+        for key, value in stored.items():
+            if not key.endswith(CODEC_SUFFIX) or not (header := CODEC_HEADER.fullmatch(value)):
+                continue
+            name = key[: -len(CODEC_SUFFIX)]
+            codec, chunks, size = header.group(1), int(header.group(2)), int(header.group(3))
+            if all(f"{name}{CHUNK_SUFFIX}{index}" in stored for index in range(chunks)):
+                self._encoded[name] = (codec, chunks, size)
+
+        internal = {f"{key}{CODEC_SUFFIX}" for key in self._encoded} | {
+            f"{key}{CHUNK_SUFFIX}{index}"
+            for key, (_, chunks, _) in self._encoded.items()
+            for index in range(chunks)
+        }
+        self._keys = [key for key in stored if key not in internal] + list(self._encoded)
+
+    def __getitem__(self, key: str) -> str:
+        """Value of a key, decoded (and cached) on first access if encoded."""
+        if key not in self._decoded:
+            if key not in self._encoded:
+                return self.stored[key]
+            codec, chunks, _ = self._encoded[key]
+            data = "".join(self.stored[f"{key}{CHUNK_SUFFIX}{index}"] for index in range(chunks))
+            if codec == "zlib":
+                data = zlib.decompress(base64.b64decode(data)).decode()
+            self._decoded[key] = data
+        return self._decoded[key]
+
+    def __iter__(self) -> Iterator[str]:
+        """Keys of the content, as written: without the chunk and codec keys."""
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        """Count the keys of the content, as written."""
+        return len(self._keys)
+
+    def fields(self, keys: List[str]) -> Dict[str, str]:
+        """Get the values of some keys only (the ones present)."""
+        return {key: self[key] for key in keys if key in self}
+
+    def sizes(self) -> Dict[str, Any]:
+        """Size (bytes) of each value, as stored too, with its codec and number of chunks.
+
+        Nothing is decoded.
+        """
+        keys = {}
+        for key in self._keys:
+            if key in self._encoded:
+                codec, chunks, size = self._encoded[key]
+                stored = sum(
+                    len(self.stored[f"{key}{CHUNK_SUFFIX}{index}"].encode())
+                    for index in range(chunks)
+                )
+            else:
+                codec, chunks, size = "none", 1, len(self.stored[key].encode())
+                stored = size
+            keys[key] = {"size": size, "stored": stored, "codec": codec, "chunks": chunks}
+        return {
+            "keys": keys,
+            "size": sum(key["size"] for key in keys.values()),
+            "stored": sum(len(key) + len(value.encode()) for key, value in self.stored.items()),
+        }
+
+
+def secret_content(secret) -> SecretContent:
+    """Content of an `ops.Secret`, decoded lazily."""
+    return SecretContent(secret.get_content())
+
+
+# Reading large secrets: projection, pagination, dump to a file
+
+
+def select_content(
+    content: Mapping,
+    keys: Optional[List[str]] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Tuple[Dict[str, str], Optional[str]]:
+    """Values of the keys requested (all by default), in key order.
+
+    Only values from the `cursor` key on are returned, at most `limit` of them. Values not
+    returned are not decoded.
+
+    Returns:
+        the values, and the cursor of the next page (None if none left).
+    """
+    selected = sorted(key for key in (content if keys is None else keys) if key in content)
+    if cursor:
+        selected = selected[bisect.bisect_left(selected, cursor) :]
+    next_cursor = None
+    if limit and len(selected) > limit:
+        next_cursor = selected[limit]
+        selected = selected[:limit]
+    return {key: content[key] for key in selected}, next_cursor
+
+
+def dump_content(content: Mapping, keys: Optional[List[str]] = None, name: str = "secret") -> Dict:
+    """Write values (as a JSON object) to a file only readable by root, one value at a time.
+
+    Returns:
+        the path of the file, its SHA-256 digest and size, and the number of keys written.
+    """
+    selected = sorted(key for key in (content if keys is None else keys) if key in content)
+    fd, path = tempfile.mkstemp(prefix=f"{name}-", suffix=".json")
+    digest = hashlib.sha256()
+    size = 0
+    with os.fdopen(fd, "wb") as f:
+        for index, key in enumerate(selected):
+            chunk = f"{'{' if not index else ','}{json.dumps(key)}:{json.dumps(content[key])}"
+            data = chunk.encode()
+            f.write(data)
+            digest.update(data)
+            size += len(data)
+        data = b"}" if selected else b"{}"
+        f.write(data)
+        digest.update(data)
+        size += len(data)
+    return {"path": path, "sha256": digest.hexdigest(), "bytes": size, "keys": len(selected)}
+
+
+def get_results(content: Mapping, params: Dict[str, Any], result_key: str, name: str) -> Dict:
+    """Results of a get action: the values requested (a page of them), or the file holding them.
+
+    Action parameters: `keys` (all by default), `cursor` and `limit` (page), `to-file`.
+    """
+    keys = params.get("keys")
+    if params.get("to-file"):
+        return {"file": dump_content(content, keys, name)}
+
+    values, cursor = select_content(content, keys, params.get("cursor"), params.get("limit"))
+    results = {result_key: values}
+    if cursor:
+        results["next-cursor"] = cursor
+    return results
+
+
+# Write requests of non-leader units
+
+# Unit peer databag field of the requests of a unit: {"sequence": <last>, "requests": [...]}
+WRITE_REQUESTS_KEY = "write-requests"
+# App peer databag field of the requests the leader applied: {unit: <last sequence applied>}
+WRITE_ACKS_KEY = "write-acks"
+
+
+def _json_field(databag, key: str, default: Any) -> Any:
+    value = databag.get(key)
+    return json.loads(value) if value else default
+
+
+def coalesce(content: Dict[str, str], requests: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Content of a secret once write requests are applied to it, in order.
+
+    Empty if the secret is to be removed.
+    """
+    content = dict(content)
+    for request in requests:
+        if request["action"] == "set":
+            content.update(request["content"])
+        elif request["action"] == "delete":
+            for key in request["keys"]:
+                content.pop(key, None)
+        else:
+            content = {}
+    return content
+
+
+class WriteQueue:
+    """Writes to app secrets requested by non-leader units, applied by the leader.
+
+    A non-leader unit appends its requests to its peer databag, each of them numbered, and
+    gets a ticket (`<unit>:<number>`) to follow it up. The leader applies the requests of
+    all units on peer-relation-changed, all requests to the same secret at once, then
+    acknowledges the last request applied of each unit in the app peer databag. Units drop
+    their requests once acknowledged.
+
+    Requests of different units are applied in the order they were made (unit clocks).
+    """
+
+    def __init__(self, charm):
+        self.charm = charm
+
+    @property
+    def acks(self) -> Dict[str, int]:
+        """Last request applied, per unit."""
+        return _json_field(self.charm.peers.data[self.charm.app], WRITE_ACKS_KEY, {})
+
+    def _queue(self, unit) -> Dict[str, Any]:
+        return _json_field(
+            self.charm.peers.data[unit], WRITE_REQUESTS_KEY, {"sequence": 0, "requests": []}
+        )
+
+    def enqueue(self, action: str, label: Optional[str] = None, **fields) -> Optional[str]:
+        """Request a write from the leader, return the ticket of the request.
+
+        None if there is no peer relation to pass the request on.
+        """
+        if not self.charm.peers:
+            return None
+
+        unit = self.charm.unit
+        queue = self._queue(unit)
+        queue["sequence"] += 1
+        queue["requests"].append(
+            {
+                "sequence": queue["sequence"],
+                "time": time.time(),
+                "action": action,
+                "label": label,
+                **fields,
+            }
+        )
+        self.charm.peers.data[unit][WRITE_REQUESTS_KEY] = json.dumps(queue, separators=(",", ":"))
+        return f"{unit.name}:{queue['sequence']}"
+
+    def status(self, ticket: str) -> str:
+        """Status of a request: applied, pending or unknown."""
+        unit_name, _, sequence = ticket.rpartition(":")
+        if not self.charm.peers or not sequence.isdigit():
+            return "unknown"
+        if int(sequence) <= self.acks.get(unit_name, 0):
+            return "applied"
+
+        units = [self.charm.unit, *self.charm.peers.units]
+        unit = next((unit for unit in units if unit.name == unit_name), None)
+        if unit and any(
+            request["sequence"] == int(sequence) for request in self._queue(unit)["requests"]
+        ):
+            return "pending"
+        return "unknown"
+
+    def drain(self, apply: Callable[[Optional[str], List[Dict[str, Any]]], None]) -> int:
+        """Apply the requests of all units, once per secret: `apply(label, requests)`.
+
+        To be called on the leader. Returns the number of requests applied.
+        """
+        if not self.charm.peers:
+            return 0
+
+        acks = self.acks
+        pending = []
+        for unit in [self.charm.unit, *self.charm.peers.units]:
+            requests = [
+                request
+                for request in self._queue(unit)["requests"]
+                if request["sequence"] > acks.get(unit.name, 0)
+            ]
+            if requests:
+                acks[unit.name] = requests[-1]["sequence"]
+                pending.extend(requests)
+        if not pending:
+            return 0
+
+        by_label = {}
+        for request in sorted(pending, key=lambda request: request["time"]):
+            by_label.setdefault(request["label"], []).append(request)
+        for label, requests in by_label.items():
+            apply(label, requests)
+
+        self.charm.peers.data[self.charm.app][WRITE_ACKS_KEY] = json.dumps(
+            acks, sort_keys=True, separators=(",", ":")
+        )
+        return len(pending)
+
+    def prune(self) -> None:
+        """Drop the requests of the unit the leader applied."""
+        if not self.charm.peers:
+            return
+
+        unit = self.charm.unit
+        queue = self._queue(unit)
+        applied = self.acks.get(unit.name, 0)
+        requests = [request for request in queue["requests"] if request["sequence"] > applied]
+        if len(requests) < len(queue["requests"]):
+            queue["requests"] = requests
+            self.charm.peers.data[unit][WRITE_REQUESTS_KEY] = json.dumps(
+                queue, separators=(",", ":")
+            )
+
+
+# Stress testing
+
+STRESS_OPERATIONS = ("read", "write", "delete")
+
+# Parameters of the stress action (the action schema is not enforced on them)
+STRESS_DEFAULTS = {
+    "secrets": 1,
+    "keys": 10,
+    "value-size": 16,
+    "read-weight": 80,
+    "write-weight": 15,
+    "delete-weight": 5,
+    "duration": 10.0,
+    "count": 0,
+    "seed": None,
+}
+
+
+def stress_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Stress action parameters, as arguments of `run_stress()` (and the number of secrets).
+
+    Raises:
+        ValueError: if the operation weights are negative, or all zero (nothing to run).
+    """
+    params = {**STRESS_DEFAULTS, **params}
+    mix = {operation: int(params[f"{operation}-weight"]) for operation in STRESS_OPERATIONS}
+    if any(weight < 0 for weight in mix.values()) or not sum(mix.values()):
+        raise ValueError(f"Invalid weights {mix}: none negative, at least one positive expected")
+    return {
+        "secrets": int(params["secrets"]),
+        "keys": int(params["keys"]),
+        "value_size": int(params["value-size"]),
+        "mix": mix,
+        "duration": float(params["duration"]),
+        "count": int(params["count"]),
+        "seed": params["seed"],
+    }
+
+
+def _percentile(latencies: List[float], percent: int) -> float:
+    """Nearest-rank percentile of sorted latencies."""
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies) - 1, math.ceil(len(latencies) * percent / 100) - 1)]
+
+
+def _latency_report(latencies: List[float]) -> Dict[str, str]:
+    """Latency percentiles, in milliseconds."""
+    latencies = sorted(latencies)
+    report = {f"p{percent}": _percentile(latencies, percent) for percent in (50, 90, 99)}
+    report["max"] = latencies[-1] if latencies else 0.0
+    return {name: f"{value * 1000:.3f}" for name, value in report.items()}
+
+
+def run_stress(
+    operations: Dict[str, Callable[[str, str, str], None]],
+    labels: List[str],
+    keys: int,
+    value_size: int,
+    mix: Dict[str, int],
+    duration: float = 0.0,
+    count: int = 0,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Create secrets, then churn them with a random read/write/delete mix.
+
+    Args:
+        operations: the charm's own code paths for each of STRESS_OPERATIONS, called with
+            (label, key, value) -- the value being only relevant for writes.
+        labels: one secret is created for each of them, with `keys` keys
+        keys: number of keys per secret
+        value_size: size of the (random) values written
+        mix: relative weights of the operations
+        duration: how long to churn the secrets for (seconds)...
+        count: ...or the number of operations to execute
+        seed: seed of the random values and mix, for reproducible runs
+
+    Returns:
+        action results: throughput, and latency percentiles (ms) per operation
+    """
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits
+
+    def value() -> str:
+        return "".join(rng.choices(alphabet, k=value_size))
+
+    key_names = [f"key{index}" for index in range(keys)]
+    latencies = {operation: [] for operation in ("create", *STRESS_OPERATIONS)}
+
+    for label in labels:
+        for key in key_names:
+            start = time.monotonic()
+            operations["write"](label, key, value())
+            latencies["create"].append(time.monotonic() - start)
+
+    weights = [mix.get(operation, 0) for operation in STRESS_OPERATIONS]
+    executed = 0
+    start = deadline = time.monotonic()
+    deadline += duration
+    while (count and executed < count) or (not count and time.monotonic() < deadline):
+        operation = rng.choices(STRESS_OPERATIONS, weights)[0]
+        label, key = rng.choice(labels), rng.choice(key_names)
+        value_written = value() if operation == "write" else ""
+
+        operation_start = time.monotonic()
+        operations[operation](label, key, value_written)
+        latencies[operation].append(time.monotonic() - operation_start)
+        executed += 1
+    elapsed = time.monotonic() - start
+
+    return {
+        "operations": str(executed),
+        "duration": f"{elapsed:.3f}",
+        "throughput": f"{executed / elapsed:.1f}" if elapsed else "0",
+        "latency": {
+            operation: {"count": str(len(values)), **_latency_report(values)}
+            for operation, values in latencies.items()
+        },
+    }
@@ -0,0 +1,125 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Accounting of the hook tool calls issued by a charm.
+
+Shared by all test charms: keep the copies in sync (`tests/unit/test_shared_modules.py`).
+"""
+
+import json
+import logging
+import sys
+import time
+from functools import wraps
+from typing import Callable, Dict, List
+
+from ops.charm import ActionEvent, CharmBase
+from ops.framework import Object, StoredState
+
+logger = logging.getLogger(__name__)
+
+# Hook tools accounted for, indexed by the corresponding ops model backend method
+HOOK_TOOLS = {
+    "secret_get": "secret-get",
+    "secret_set": "secret-set",
+    "secret_add": "secret-add",
+    "secret_info_get": "secret-info-get",
+    "secret_grant": "secret-grant",
+    "relation_get": "relation-get",
+    "relation_set": "relation-set",
+    "relation_ids": "relation-ids",
+    "is_leader": "is-leader",
+}
+
+# Modules not to be considered as the caller of a hook tool
+_SKIPPED_MODULES = ("ops.", "collections.abc", "_collections_abc", __name__)
+
+
+def _caller() -> str:
+    """Innermost charm (or charm library) function on the call stack."""
+    frame = sys._getframe(2)
+    while frame and frame.f_globals.get("__name__", "").startswith(_SKIPPED_MODULES):
+        frame = frame.f_back
+    if not frame:
+        return "unknown"
+
+    name = frame.f_code.co_name
+    instance = frame.f_locals.get("self")
+    if instance is not None:
+        name = f"{type(instance).__name__}.{name}"
+    return name
+
+
+class HookToolStats(Object):
+    """Count and time the hook tool calls of a charm, per tool and calling function.
+
+    Statistics of each dispatch are written to the debug log, and accumulated over dispatches
+    (in the unit's local state) to be reported by the `get-hook-stats` action.
+
+    NOTE: calls are accounted at the ops model backend level, thus results ops serves from
+    its own cache (like leadership) are counted as well.
+    """
+
+    _stored = StoredState()
+
+    def __init__(self, charm: CharmBase):
+        super().__init__(charm, "hook-stats")
+        self.charm = charm
+        self._stored.set_default(dispatches=0, totals={})
+        self.calls: Dict[str, List] = {}
+
+        backend = self.model._backend
+        for method, tool in HOOK_TOOLS.items():
+            setattr(backend, method, self._accounted(tool, getattr(backend, method)))
+
+        self.framework.observe(self.framework.on.pre_commit, self._on_pre_commit)
+        self.framework.observe(charm.on.get_hook_stats_action, self._on_get_hook_stats_action)
+
+    def _accounted(self, tool: str, call: Callable) -> Callable:
+        @wraps(call)
+        def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                stats = self.calls.setdefault(f"{tool} {_caller()}", [0, 0.0])
+                stats[0] += 1
+                stats[1] += time.monotonic() - start
+
+        return wrapper
+
+    def _on_pre_commit(self, _) -> None:
+        """Log the statistics of the dispatch and add them to the totals."""
+        per_tool = {}
+        for key, (count, duration) in sorted(self.calls.items()):
+            logger.debug("Hook tool %s: %d calls, %.3fs", key, count, duration)
+            tool = key.split(" ", 1)[0]
+            tool_count, tool_duration = per_tool.get(tool, (0, 0.0))
+            per_tool[tool] = (tool_count + count, tool_duration + duration)
+        if per_tool:
+            logger.info(
+                "Hook tool calls: %s",
+                ", ".join(
+                    f"{tool}={count} ({duration:.3f}s)"
+                    for tool, (count, duration) in per_tool.items()
+                ),
+            )
+
+        totals = {key: list(value) for key, value in self._stored.totals.items()}
+        for key, (count, duration) in self.calls.items():
+            total_count, total_duration = totals.get(key, (0, 0.0))
+            totals[key] = [total_count + count, total_duration + duration]
+        self._stored.totals = totals
+        self._stored.dispatches += 1
+
+    def _on_get_hook_stats_action(self, event: ActionEvent) -> None:
+        """Report the hook tool calls of all dispatches so far (this one excluded)."""
+        stats = {}
+        for key, (count, duration) in self._stored.totals.items():
+            tool, caller = key.split(" ", 1)
+            stats.setdefault(tool, {})[caller] = {"count": count, "time": round(duration, 6)}
+
+        event.set_results({"dispatches": self._stored.dispatches, "stats": json.dumps(stats)})
+        if event.params.get("reset"):
+            self._stored.totals = {}
+            self._stored.dispatches = 0
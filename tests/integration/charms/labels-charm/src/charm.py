@@ -7,19 +7,84 @@
 """A small charm handling secret manipulation within a single Juju Secret object"""
 
 import logging
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import ops
-from ops import ActiveStatus, SecretNotFoundError
-from ops.charm import ActionEvent
+from archive import (
+    ArchiveError,
+    content_digest,
+    new_archive_path,
+    new_key,
+    read_archive,
+    write_archive,
+)
+from helpers import (
+    DispatchContext,
+    Scope,
+    SecretContent,
+    WriteQueue,
+    coalesce,
+    encode_content,
+    get_results,
+    owned_secret_labels,
+    reserved_keys,
+    run_stress,
+    scope_param,
+    secret_content,
+    stress_params,
+)
+from hook_stats import HookToolStats
+from ops import ActiveStatus, ModelError, Secret, SecretNotFoundError
+from ops.charm import ActionEvent, RelationChangedEvent
+from secret_log import SecretLogger
 
 # Log messages can be retrieved using juju debug-log
 logger = logging.getLogger(__name__)
+secret_log = SecretLogger(logger)
 
 VALID_LOG_LEVELS = ["info", "debug", "warning", "error", "critical"]
 PEER = "charm-peer"
 
 SECRET_DEFAULT_LABEL = "mysecret"
+# Label of the app secret holding the key of the archives (export-secrets, import-secrets)
+ARCHIVE_KEY_LABEL = "archive-key"
+
+
+class SecretRegistry:
+    """Secrets written during the dispatch, by label, with the content written (read-your-writes).
+
+    Secrets created, updated or removed serve the lookups of the rest of the dispatch
+    without a `secret-get`: neither the secret nor its content are read again. Nothing is
+    kept across dispatches (no databag involved), as other units may write unit secrets
+    of their own, and the leader may change.
+    """
+
+    def __init__(self):
+        """Registry empty, for a new dispatch."""
+        # None for a secret removed
+        self._secrets: Dict[str, Optional[Tuple[Secret, SecretContent]]] = {}
+
+    def __contains__(self, label: str) -> bool:
+        """Whether the secret with this label was written (or removed) during the dispatch."""
+        return label in self._secrets
+
+    def get(self, label: str) -> Optional[Secret]:
+        entry = self._secrets.get(label)
+        return entry[0] if entry else None
+
+    def content(self, label: str) -> SecretContent:
+        entry = self._secrets.get(label)
+        return entry[1] if entry else SecretContent({})
+
+    def written(self, label: str, secret: Secret, stored: Dict[str, str]) -> None:
+        """Account for the content written to a secret (as stored, i.e. encoded)."""
+        self._secrets[label] = (secret, SecretContent(stored))
+
+    def removed(self, label: str) -> None:
+        self._secrets[label] = None
+
+    def clear(self) -> None:
+        self._secrets.clear()
 
 
 class SecretsTestCharm(ops.CharmBase):
@@ -27,13 +92,24 @@ class SecretsTestCharm(ops.CharmBase):
 
     def __init__(self, *args):
         super().__init__(*args)
+        self.hook_stats = HookToolStats(self)
+        self.context = DispatchContext.of(self.model)
+        self.write_queue = WriteQueue(self)
+        self.secret_registry = SecretRegistry()
 
         self.framework.observe(self.on.start, self._on_start)
+        self.framework.observe(self.on.leader_elected, self._on_leader_elected)
+        self.framework.observe(self.on[PEER].relation_changed, self._on_peer_relation_changed)
 
         self.framework.observe(self.on.set_secret_action, self._on_set_secret_action)
         self.framework.observe(self.on.get_secret_action, self._on_get_secret_action)
         self.framework.observe(self.on.delete_secrets_action, self._on_delete_secrets_action)
         self.framework.observe(self.on.forget_default_secret_action, self._on_forget_default_secret_action)
+        self.framework.observe(self.on.stress_action, self._on_stress_action)
+        self.framework.observe(self.on.write_status_action, self._on_write_status_action)
+        self.framework.observe(self.on.secret_sizes_action, self._on_secret_sizes_action)
+        self.framework.observe(self.on.export_secrets_action, self._on_export_secrets_action)
+        self.framework.observe(self.on.import_secrets_action, self._on_import_secrets_action)
 
 ##############################################################################
 # Event handlers
@@ -42,40 +118,153 @@ class SecretsTestCharm(ops.CharmBase):
     def _on_start(self, event) -> None:
         self.unit.status = ActiveStatus()
 
+    def _on_leader_elected(self, event) -> None:
+        self._apply_write_requests()
+
+    def _on_peer_relation_changed(self, event: RelationChangedEvent) -> None:
+        """Apply the write requests of the units (leader), drop those applied (other units)."""
+        if self.context.is_leader:
+            self._apply_write_requests()
+        else:
+            self.write_queue.prune()
+
     def _on_set_secret_action(self, event: ActionEvent):
-        if self.unit.is_leader():
-            label = event.params.get("label")
-            content = event.params.get("content")
-            if label:
-                event.set_results({self.generate_label(label): self.set_secret(content, label)})
-            else:
-                event.set_results({self.generate_label(): self.set_secret(content)})
+        if not (scope := self._action_scope(event)):
+            return
+        label = event.params.get("label") or SECRET_DEFAULT_LABEL
+        content = event.params.get("content")
+        if reserved := reserved_keys(content):
+            event.fail(f"Reserved secret keys (ending in -codec or -chunk-<n>): {reserved}")
+            return
+        if self._can_write(scope):
+            event.set_results(
+                {self.generate_label(label, scope): self.set_secret(content, label, scope)}
+            )
+        else:
+            self._request_write(event, "set", label, content=content)
 
     def _on_get_secret_action(self, event: ActionEvent):
-        """Return the secrets stored in juju secrets backend."""
-        label = event.params.get("label")
-        if label:
-            event.set_results({"secret": self.get_secret()})
-        else:
-            event.set_results({"secret": self.get_secret()})
+        """Return the secrets stored in juju secrets backend (a page of them, or a file)."""
+        if scope := self._action_scope(event):
+            label = event.params.get("label") or SECRET_DEFAULT_LABEL
+            content = self._get_content(label, scope)
+            name = self.generate_label(label, scope)
+            event.set_results(get_results(content, event.params, "secret", name))
 
     def _on_delete_secrets_action(self, event: ActionEvent):
-        if self.unit.is_leader():
-            label = event.params.get("label")
-            keys = event.params.get("keys")
+        if not (scope := self._action_scope(event)):
+            return
+        label = event.params.get("label") or SECRET_DEFAULT_LABEL
+        keys = event.params.get("keys")
+        if self._can_write(scope):
             for key in keys:
-                if label:
-                    self.delete_secret(key, label)
-                else:
-                    self.delete_secret(key)
+                self.delete_secret(key, label, scope)
+        else:
+            self._request_write(event, "delete", label, keys=keys)
 
     def _on_forget_default_secret_action(self, event: ActionEvent):
-        if self.unit.is_leader():
-            label = event.params.get("label")
-            if label:
-                self.delete_full_secret(label)
-            else:
-                self.delete_full_secret()
+        if not (scope := self._action_scope(event)):
+            return
+        label = event.params.get("label") or SECRET_DEFAULT_LABEL
+        if self._can_write(scope):
+            self.delete_full_secret(label, scope)
+        else:
+            self._request_write(event, "forget", label)
+
+    def _on_write_status_action(self, event: ActionEvent):
+        """Report whether the leader applied a write request."""
+        event.set_results({"status": self.write_queue.status(event.params.get("ticket", ""))})
+
+    def _on_secret_sizes_action(self, event: ActionEvent):
+        """Report the size of each value of a secret, as read and as stored."""
+        if scope := self._action_scope(event):
+            label = event.params.get("label") or SECRET_DEFAULT_LABEL
+            event.set_results({"sizes": self._get_content(label, scope).sizes()})
+
+    def _on_export_secrets_action(self, event: ActionEvent):
+        """Write the secrets of the charm to an archive: all, under a label prefix, or some.
+
+        The secrets of the labels given are exported (those that don't exist are skipped),
+        otherwise every secret of the scope the unit owns (its app's ones on the leader
+        only) with a label under the prefix given, as listed by `_owned_labels()`.
+        """
+        if not (scope := self._action_scope(event)):
+            return
+        try:
+            key = self._archive_key(event.params.get("key-secret"))
+        except (ArchiveError, KeyError, ModelError) as e:
+            event.fail(f"No archive key: {e}")
+            return
+
+        try:
+            labels = event.params.get("labels") or self._owned_labels(
+                scope, event.params.get("prefix", "")
+            )
+        except ModelError as e:
+            event.fail(f"Can't list the secrets: {e}")
+            return
+        records = (self._export_record(label, scope) for label in labels)
+        path = event.params.get("path") or new_archive_path(f"{self.app.name}-secrets")
+        try:
+            results = write_archive(
+                path, key, filter(None, records), {"app": self.app.name, "scope": scope.value}
+            )
+        except OSError as e:
+            event.fail(f"Can't write {path}: {e}")
+            return
+        event.set_results(results)
+
+    def _on_import_secrets_action(self, event: ActionEvent):
+        """Write the secrets of an archive, skipping those holding the same content already."""
+        if not (scope := self._action_scope(event)):
+            return
+        if not self._can_write(scope):
+            event.fail("Only the leader unit can write app secrets")
+            return
+        if not (path := event.params.get("path")):
+            event.fail("The path of the archive is required")
+            return
+        prefix = event.params.get("prefix", "")
+
+        written = unchanged = 0
+        try:
+            key = self._archive_key(event.params.get("key-secret"))
+            for block in read_archive(path, key):
+                records = [
+                    record
+                    for record in block
+                    if record["scope"] == scope.value and record["label"].startswith(prefix)
+                ]
+                changed = [self._import_record(record, scope) for record in records]
+                written += sum(changed)
+                unchanged += len(changed) - sum(changed)
+        except (ArchiveError, OSError, KeyError, ValueError, ModelError) as e:
+            event.fail(f"Import of {path} stopped after {written} secrets written: {e}")
+            return
+        event.set_results({"written": written, "unchanged": unchanged})
+
+    def _on_stress_action(self, event: ActionEvent):
+        """Churn secrets with a read/write/delete mix, report throughput and latencies."""
+        if not (scope := self._action_scope(event)):
+            return
+        if not self._can_write(scope):
+            event.fail("Only the leader unit can write app secrets")
+            return
+
+        try:
+            params = stress_params(event.params)
+        except ValueError as e:
+            event.fail(str(e))
+            return
+        labels = [f"stress{index}" for index in range(params.pop("secrets"))]
+        operations = {
+            "read": lambda label, key, value: self.get_secret(label, scope),
+            "write": lambda label, key, value: self.set_secret({key: value}, label, scope),
+            "delete": lambda label, key, value: self.delete_secret(key, label, scope),
+        }
+        with secret_log.sampled():
+            results = run_stress(operations, labels, **params)
+        event.set_results(results)
 
 ##############################################################################
 # Properties and methods
@@ -83,82 +272,221 @@ class SecretsTestCharm(ops.CharmBase):
 
     @property
     def peers(self) -> ops.model.Relation:
-        """Retrieve the peer relation (`ops.model.Relation`)."""
-        return self.model.get_relation(PEER)
+        """Retrieve the peer relation (`ops.model.Relation`), looked up once per dispatch."""
+        return self.context.relation(PEER)
 
     @property
     def app_peer_data(self) -> dict[str, str]:
         """Application peer relation data object."""
-        if self.peers is None:
+        if (peers := self.peers) is None:
             return {}
 
-        return self.peers.data[self.app]
+        return peers.data[self.app]
+
+    def _action_scope(self, event: ActionEvent) -> Optional[Scope]:
+        """Scope an action is called for, failing the action if invalid."""
+        scope = scope_param(event.params)
+        if not scope:
+            event.fail(f"Invalid scope {event.params.get('scope')}, expected app or unit")
+        return scope
+
+    def _can_write(self, scope: Scope) -> bool:
+        """App secrets are written by the leader, unit secrets by any unit."""
+        return scope == Scope.UNIT or self.context.is_leader
+
+    def _request_write(self, event: ActionEvent, action: str, label: str, **fields) -> None:
+        """Pass a write to an app secret on to the leader, the ticket of the request as result."""
+        if not (ticket := self.write_queue.enqueue(action, label, **fields)):
+            event.fail("Only the leader unit can write app secrets")
+            return
+        event.set_results({"ticket": ticket})
+
+    def _apply_write_requests(self) -> None:
+        """Apply the write requests of the units (leader)."""
+        if applied := self.write_queue.drain(self._write_requested):
+            logger.info(f"Applied {applied} write requests")
+
+    def _write_requested(self, label: str, requests: List[Dict[str, Any]]) -> None:
+        """Apply the write requests to a secret, writing it once."""
+        secret = self._get_my_secret(label)
+        current = dict(self._get_content(label, secret=secret))
+        content = coalesce(current, requests)
+        if content == current:
+            return
+
+        if not content:
+            self._remove_secret(secret, label)
+        elif secret:
+            self._update_secret(secret, content, label)
+        else:
+            self._add_secret(content, label)
 
-    def generate_label(self, label: Optional[str] = SECRET_DEFAULT_LABEL):
+    def generate_label(
+        self, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ):
         """Generate label on the fly"""
+        if scope == Scope.UNIT:
+            return f"{self.unit.name.replace('/', '-')}.{label}"
         return f"{self.app.name}.{label}"
 
-    def _get_my_secret(self, label: Optional[str] = SECRET_DEFAULT_LABEL):
-        full_label = self.generate_label(label)
+    def _get_my_secret(
+        self, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ):
+        full_label = self.generate_label(label, scope)
+        if full_label in self.secret_registry:
+            return self.secret_registry.get(full_label) or {}
         try:
             return self.model.get_secret(label=full_label)
         except SecretNotFoundError:
             pass
         return {}
 
-    def get_secret(self, label: Optional[str] = SECRET_DEFAULT_LABEL) -> dict[str, str]:
-        """Get the secrets stored in juju secrets backend."""
-        secret = self._get_my_secret(label)
+    def _get_content(
+        self,
+        label: Optional[str] = SECRET_DEFAULT_LABEL,
+        scope: Scope = Scope.APP,
+        secret: Optional[Secret] = None,
+    ) -> SecretContent:
+        """Content of a secret as written during the dispatch, or read (looked up if needed)."""
+        full_label = self.generate_label(label, scope)
+        if full_label in self.secret_registry:
+            return self.secret_registry.content(full_label)
+        if secret is None:
+            secret = self._get_my_secret(label, scope)
+        return secret_content(secret) if secret else SecretContent({})
+
+    def _add_secret(
+        self, content: Dict[str, str], label: str, scope: Scope = Scope.APP
+    ) -> Secret:
+        owner = self.app if scope == Scope.APP else self.unit
+        full_label = self.generate_label(label, scope)
+        stored = encode_content(content)
+        secret = owner.add_secret(stored, label=full_label)
+        self.secret_registry.written(full_label, secret, stored)
+        return secret
+
+    def _update_secret(
+        self, secret: Secret, content: Dict[str, str], label: str, scope: Scope = Scope.APP
+    ) -> None:
+        stored = encode_content(content)
+        secret.set_content(stored)
+        self.secret_registry.written(self.generate_label(label, scope), secret, stored)
+
+    def _remove_secret(self, secret: Secret, label: str, scope: Scope = Scope.APP) -> None:
+        secret.remove_all_revisions()
+        self.secret_registry.removed(self.generate_label(label, scope))
 
-        if not secret:
+    def get_secret(
+        self, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ) -> dict[str, str]:
+        """Get the secrets stored in juju secrets backend."""
+        content = dict(self._get_content(label, scope))
+        if not content:
             return {}
 
-        content = secret.get_content()
-        logger.info(f"Retrieved secret {self.generate_label(label)} with content {content}")
+        secret_log.secret("retrieved", self.generate_label(label, scope), content)
         return content
 
-    def set_secret(self, new_content: dict, label: Optional[str] = SECRET_DEFAULT_LABEL) -> None:
-        """Set the secret in the juju secret storage."""
-        full_label = self.generate_label(label)
-        secret = self._get_my_secret(label=label)
+    def set_secret(
+        self,
+        new_content: dict,
+        label: Optional[str] = SECRET_DEFAULT_LABEL,
+        scope: Scope = Scope.APP,
+    ) -> None:
+        """Set the secret in the juju secret storage.
+
+        App secrets are owned by the application, unit secrets by the unit writing them.
+        """
+        full_label = self.generate_label(label, scope)
+        secret = self._get_my_secret(label=label, scope=scope)
 
         if secret:
-            content = secret.get_content()
+            content = dict(self._get_content(label, scope, secret))
             content.update(new_content)
-            logger.info(f"Setting secret {full_label} to {content}")
-            secret.set_content(content)
+            secret_log.secret("set", full_label, content)
+            self._update_secret(secret, content, label, scope)
         else:
-            secret = self.app.add_secret(new_content, label=full_label)
-            logger.info(f"Added secret {full_label} with {new_content}")
+            secret = self._add_secret(new_content, label, scope)
+            secret_log.secret("added", full_label, new_content)
 
         return secret.id
 
-    def delete_secret(self, key: str, label: Optional[str] = SECRET_DEFAULT_LABEL) -> None:
+    def delete_secret(
+        self, key: str, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ) -> None:
         """Remove a secret."""
-        secret = self._get_my_secret(label=label)
+        secret = self._get_my_secret(label=label, scope=scope)
 
         if not secret:
             logging.error("Can't delete any secrets as we have none defined")
+            return
 
-        content = secret.get_content()
+        content = dict(self._get_content(label, scope, secret))
         if key in content:
             del content[key]
-        logger.info(f"Removing {key} from secret {secret.id}")
-        logger.info(f"Remaining content is {list(content.keys())}")
+        secret_log.secret("deleted", self.generate_label(label, scope), content, removed=[key])
         if content:
-            secret.set_content(content)
+            self._update_secret(secret, content, label, scope)
         else:
-            secret.remove_all_revisions()
+            self._remove_secret(secret, label, scope)
 
-    def delete_full_secret(self, label: Optional[str] = SECRET_DEFAULT_LABEL) -> None:
+    def delete_full_secret(
+        self, label: Optional[str] = SECRET_DEFAULT_LABEL, scope: Scope = Scope.APP
+    ) -> None:
         """Remove the complete secret"""
-        full_label = self.generate_label(label)
+        if secret := self._get_my_secret(label, scope):
+            self._remove_secret(secret, label, scope)
+
+    def _archive_key(self, secret_id: Optional[str] = None) -> str:
+        """Key of the archives: the one of the app (created by the leader), or of a secret."""
+        if secret_id:
+            return self.model.get_secret(id=secret_id).get_content()["key"]
         try:
-            secret = self.model.get_secret(label=full_label)
+            secret = self.model.get_secret(label=self.generate_label(ARCHIVE_KEY_LABEL))
         except SecretNotFoundError:
-            return
-
-        secret.remove_all_revisions()
+            if not self.context.is_leader:
+                raise ArchiveError("the leader unit creates it on the first export")
+            key = new_key()
+            self.app.add_secret({"key": key}, label=self.generate_label(ARCHIVE_KEY_LABEL))
+            return key
+        return secret.get_content()["key"]
+
+    def _owned_labels(self, scope: Scope, prefix: str = "") -> List[str]:
+        """Labels (without the scope part) of the secrets of a scope owned, under a prefix.
+
+        Juju lists the secrets a unit owns with the `secret-ids` hook tool (and those of its
+        application, on the leader), their labels are read with `secret-info-get`. The key
+        of the archives isn't exported.
+        """
+        scope_prefix = self.generate_label("", scope)
+        internal = {self.generate_label(ARCHIVE_KEY_LABEL)}
+        return sorted(
+            label[len(scope_prefix) :]
+            for label in owned_secret_labels(self.model)
+            if label.startswith(scope_prefix + prefix) and label not in internal
+        )
+
+    def _export_record(self, label: str, scope: Scope) -> Optional[Dict[str, Any]]:
+        """Get a secret as written to an archive (None if it's gone)."""
+        if not (content := dict(self._get_content(label, scope))):
+            return None
+        return {
+            "label": label,
+            "scope": scope.value,
+            "content": content,
+            "digest": content_digest(content),
+        }
+
+    def _import_record(self, record: Dict[str, Any], scope: Scope) -> bool:
+        """Write a secret of an archive, unless it holds that content already."""
+        label, content = record["label"], record["content"]
+        if secret := self._get_my_secret(label, scope):
+            if content_digest(dict(self._get_content(label, scope, secret))) == record["digest"]:
+                return False
+            self._update_secret(secret, content, label, scope)
+        else:
+            self._add_secret(content, label, scope)
+        return True
 
 
 if __name__ == "__main__":  # pragma: nocover
@@ -9,6 +9,7 @@ of the libraries in this repository.
 """
 
 import logging
+import secrets
 
 from ops.charm import CharmBase
 from ops.framework import StoredState
@@ -16,11 +17,18 @@ from ops.main import main
 from ops.model import ActiveStatus, MaintenanceStatus
 
 from charms.data_platform_libs.v0.data_interfaces import (
+    CredentialsRotation,
+    CredentialsRotationRequestedEvent,
     DatabaseProvides,
     DatabaseRequestedEvent,
 )
+from hook_stats import HookToolStats
+from secret_log import SecretLogger
 
 logger = logging.getLogger(__name__)
+secret_log = SecretLogger(logger)
+
+PEER = "database-peers"
 
 
 class DatabaseCharm(CharmBase):
@@ -30,15 +38,31 @@ class DatabaseCharm(CharmBase):
 
     def __init__(self, *args):
         super().__init__(*args)
+        self.hook_stats = HookToolStats(self)
 
         # Default charm events.
 #        self.framework.observe(self.on.database_pebble_ready, self._on_database_pebble_ready)
         self.framework.observe(self.on.start, self._on_start)
 
         # Charm events defined in the database provides charm library.
-        self.provides = DatabaseProvides(self, relation_name="database")
+        # TLS data is identical for all clients, thus shared across relations.
+        self.provides = DatabaseProvides(
+            self,
+            relation_name="database",
+            shared_secret_labels=["tls"],
+            peer_relation_name=PEER,
+        )
         self.framework.observe(self.provides.on.database_requested, self._on_database_requested)
 
+        # Rolling credentials rotation over all relations.
+        self.rotation = CredentialsRotation(self, self.provides, PEER)
+        self.framework.observe(
+            self.rotation.on.credentials_rotation_requested, self._on_credentials_rotation_requested
+        )
+        self.framework.observe(
+            self.on.rotate_credentials_action, self._on_rotate_credentials_action
+        )
+
     def _on_start(self, event) -> None:
         self.unit.status = ActiveStatus()
 
@@ -51,12 +75,28 @@ class DatabaseCharm(CharmBase):
             event.relation.id, f'{self.model.get_binding("database").network.bind_address}:5432'
         )
 
+        self._set_credentials(event.relation.id)
+
         # Share additional information with the application.
         self.provides.set_tls(event.relation.id, "False")
         self.provides.set_version(event.relation.id, "0.1")
 
         self.unit.status = ActiveStatus()
 
+    def _on_rotate_credentials_action(self, event) -> None:
+        """Schedule credentials rotation for all relations."""
+        self.rotation.start()
+        event.set_results({"pending": len(self.rotation.pending)})
+
+    def _on_credentials_rotation_requested(self, event: CredentialsRotationRequestedEvent) -> None:
+        """Set new credentials for the relation."""
+        self._set_credentials(event.relation.id)
+
+    def _set_credentials(self, relation_id: int) -> None:
+        credentials = {"username": f"relation-{relation_id}", "password": secrets.token_hex(16)}
+        self.provides.set_credentials(relation_id, **credentials)
+        secret_log.secret("set", f"credentials of relation {relation_id}", credentials)
+
 
 if __name__ == "__main__":
     main(DatabaseCharm)
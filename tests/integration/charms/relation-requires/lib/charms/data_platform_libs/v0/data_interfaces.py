@@ -145,7 +145,8 @@ class ApplicationCharm(CharmBase):
 ```
 
 When it's needed to check whether a plugin (extension) is enabled on the PostgreSQL
-charm, you can use the is_postgresql_plugin_enabled method. To use that, you need to
+charm, you can use the is_postgresql_plugin_enabled method, or get_enabled_plugins
+to check several plugins at once. To use that, you need to
 add the following dependency to your charmcraft.yaml file:
 
 ```yaml
@@ -193,6 +194,59 @@ It's preferred to subscribe to this event instead of relation changed event to a
 creating a new database when other information other than a database name is
 exchanged in the relation databag.
 
+Providers serving many relations with identical secret content (e.g. the same TLS CA)
+can share a single Juju Secret across these relations. Shared secret groups are listed
+on instantiation, together with a peer relation where the leader keeps track of them:
+
+```python
+        self.provided_database = DatabaseProvides(
+            self,
+            relation_name="database",
+            shared_secret_labels=["tls"],
+            peer_relation_name="database-peers",
+        )
+        ...
+        # Rotating the CA for all relations is a single secret update
+        self.provided_database.set_shared_relation_fields({"tls-ca": new_ca})
+```
+
+When the same change has to be pushed to many relations (e.g. new endpoints after a
+failover), `set_relation_fields_bulk()` applies it to all of them at once, skipping
+unchanged values and updating shared secrets once:
+
+```python
+        relations = self.provided_database.relations
+        self.provided_database.set_relation_fields_bulk(
+            {relation.id: {"endpoints": endpoints} for relation in relations}
+        )
+```
+
+Credentials of all relations can be rotated in waves, so that clients don't all have to
+reconnect at the same time, using `CredentialsRotation`:
+
+```python
+        self.rotation = CredentialsRotation(
+            self,
+            self.provided_database,
+            "database-peers",
+            wave_size=10,
+            wave_interval=60,
+            rotation_policy=SecretRotate.MONTHLY,
+        )
+        self.framework.observe(
+            self.rotation.on.credentials_rotation_requested, self._on_rotation_requested
+        )
+        ...
+        # Schedule the rotation of all relations: the first wave now, the next ones on
+        # update-status (Juju also triggers rotations monthly, relation by relation)
+        self.rotation.start()
+
+    def _on_rotation_requested(self, event: CredentialsRotationRequestedEvent) -> None:
+        username = self.database.username_for(event.relation.id)
+        password = self.database.rotate_password(username)
+        self.provided_database.set_credentials(event.relation.id, username, password)
+```
+
 ### Kafka
 
 This library is the interface to use and interact with the Kafka charm. This library contains
@@ -291,25 +345,35 @@ creating a new topic when other information other than a topic name is
 exchanged in the relation databag.
 """
 
+import base64
 import copy
+import hashlib
+import hmac
 import json
 import logging
+import os
+import re
+import zlib
 from abc import ABC, abstractmethod
 from collections import namedtuple
+from collections.abc import Mapping
+from contextlib import contextmanager
 from datetime import datetime
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 
-from ops import JujuVersion, Secret, SecretInfo
+from ops import JujuVersion, Secret, SecretInfo, SecretNotFoundError, SecretRotate
 from ops.charm import (
     CharmBase,
     CharmEvents,
+    RelationBrokenEvent,
     RelationChangedEvent,
     RelationCreatedEvent,
     RelationEvent,
+    SecretRotateEvent,
 )
 from ops.framework import EventSource, Object
-from ops.model import Application, ModelError, Relation, Unit
+from ops.model import Application, Model, ModelError, Relation, RelationDataContent, Unit
 
 # The unique Charmhub library identifier, never change it
 LIBID = "6c3e6b6680d64e9c89e611d1a15f65be"
@@ -319,7 +383,7 @@ LIBAPI = 0
 
 # Increment this PATCH version before using `charmcraft publish-lib` or reset
 # to 0 if you are raising the major API version
-LIBPATCH = 17
+LIBPATCH = 18
 
 PYDEPS = ["ops>=2.0.0"]
 
@@ -333,6 +397,19 @@ added - keys that were added
 changed - keys that still exist but have new values
 deleted - key that were deleted"""
 
+EventTrigger = namedtuple(
+    "EventTrigger", "event priority added changed added_all final", defaults=((), (), (), False)
+)
+EventTrigger.__doc__ = """
+Declarative description of the relation data changes triggering a custom event.
+
+event - name of the event to emit
+priority - triggers are evaluated in increasing priority order
+added - the event is emitted if any of these keys were added
+changed - the event is emitted if any of these keys had their values changed
+added_all - the event is emitted if all of these keys were added
+final - no more events are emitted after this one (to avoid unnecessary restarts)"""
+
 
 # Local map to associate labels with secrets potentially as a group
 SECRET_LABEL_MAP = {
@@ -344,6 +421,35 @@ SECRET_LABEL_MAP = {
     "uris": "uris",
 }
 
+# Key of the leader's peer databag holding the registry of shared (content-addressed) secrets
+SHARED_SECRETS_KEY = "shared-secrets"
+
+# Key of the leader's peer databag holding the IDs of the (unshared) secrets of each
+# relation, prefixed with the relation name
+RELATION_SECRETS_KEY = "relation-secrets"
+
+# Default number of orphaned secrets removed by a sweep
+SWEEP_BATCH_SIZE = 50
+
+# Length of the (hex) per-field digests published next to relation secrets
+SECRET_DIGEST_LENGTH = 12
+
+# Secret values longer than this (bytes) are stored compressed
+SECRET_COMPRESS_THRESHOLD = 1024
+# Longest encoded value stored in a single secret key, longer ones are split across keys
+SECRET_CHUNK_SIZE = 4096
+# Keys holding an encoded value `<key>`: `<key>-codec` ("<codec>:<chunks>:<size>"), and
+# `<key>-chunk-<n>` for each of its chunks
+SECRET_CODEC_SUFFIX = "-codec"
+SECRET_CHUNK_SUFFIX = "-chunk-"
+SECRET_CODECS = ("zlib", "raw")
+SECRET_CODEC_HEADER = re.compile(r"(zlib|raw):([1-9][0-9]*):([0-9]+)")
+# Keys of the content written can't end like the codec and chunk keys
+SECRET_RESERVED_KEY = re.compile(rf".*({SECRET_CODEC_SUFFIX}|{SECRET_CHUNK_SUFFIX}[0-9]+)")
+# Field of the requirer's app databag listing the codecs it decodes (since LIBPATCH 18):
+# relation secrets are only encoded for requirers advertising all of `SECRET_CODECS`
+SECRET_CODECS_FIELD = "secret_codecs"
+
 
 class DataInterfacesError(Exception):
     """Common ancestor for DataInterfaces related exceptions."""
@@ -361,6 +467,10 @@ class SecretsUnavailableError(SecretError):
     """Secrets aren't yet available for Juju version used."""
 
 
+class SecretKeyReservedError(SecretError):
+    """Keys of the content of a secret are reserved by the secret content codec."""
+
+
 def diff(event: RelationChangedEvent, bucket: Union[Unit, Application]) -> Diff:
     """Retrieves the diff of the data in the relation changed databag.
 
@@ -368,6 +478,10 @@ def diff(event: RelationChangedEvent, bucket: Union[Unit, Application]) -> Diff:
         event: relation changed event.
         bucket: bucket of the databag (app or unit)
 
+    Fields stored in Juju Secrets are reported as well, as long as the provider publishes
+    digests of their values (`secret-<label>-digests`): this way the changed fields are
+    known without fetching the secret.
+
     Returns:
         a Diff instance containing the added, deleted and changed
             keys from the event relation databag.
@@ -388,6 +502,18 @@ def diff(event: RelationChangedEvent, bucket: Union[Unit, Application]) -> Diff:
     # These are the keys that already existed in the databag,
     # but had their values changed.
     changed = {key for key in old_data.keys() & new_data.keys() if old_data[key] != new_data[key]}
+    # Fields stored in secrets are reported using the digest manifests published next to them.
+    for key in added | deleted | changed:
+        if key.startswith("secret-") and key.endswith("-digests"):
+            old_digests = json.loads(old_data.get(key, "{}"))
+            new_digests = json.loads(new_data.get(key, "{}"))
+            added |= new_digests.keys() - old_digests.keys()
+            deleted |= old_digests.keys() - new_digests.keys()
+            changed |= {
+                field
+                for field in old_digests.keys() & new_digests.keys()
+                if old_digests[field] != new_digests[field]
+            }
     # Convert the new_data to a serializable format and save it for a next diff check.
     event.relation.data[bucket].update({"data": json.dumps(new_data)})
 
@@ -399,7 +525,7 @@ def leader_only(f):
     """Decorator to ensure that only leader can perform given operation."""
 
     def wrapper(self, *args, **kwargs):
-        if not self.local_unit.is_leader():
+        if not self._context.is_leader:
             return
         return f(self, *args, **kwargs)
 
@@ -417,6 +543,131 @@ def juju_secrets_only(f):
     return wrapper
 
 
+# Secret content codec
+
+
+def check_secret_keys(content: Dict[str, str]) -> None:
+    """Check that no key of a secret's content could be mistaken for a codec or chunk key.
+
+    Raises:
+        SecretKeyReservedError: if keys of the content end like codec or chunk keys.
+    """
+    if reserved := sorted(key for key in content if SECRET_RESERVED_KEY.fullmatch(key)):
+        raise SecretKeyReservedError(f"Keys reserved by the secret content codec: {reserved}")
+
+
+def encode_secret_content(content: Dict[str, str]) -> Dict[str, str]:
+    """Content of a secret as stored: large values compressed, and chunked if still too large.
+
+    Values up to `SECRET_COMPRESS_THRESHOLD` bytes are stored as they are.
+
+    Raises:
+        SecretKeyReservedError: if keys of the content end like codec or chunk keys.
+    """
+    check_secret_keys(content)
+    encoded = {}
+    for key, value in content.items():
+        size = len(value.encode())
+        if size <= SECRET_COMPRESS_THRESHOLD:
+            encoded[key] = value
+            continue
+
+        codec, data = "zlib", base64.b64encode(zlib.compress(value.encode())).decode()
+        if len(data) >= len(value):
+            if len(value) <= SECRET_CHUNK_SIZE:
+                encoded[key] = value
+                continue
+            codec, data = "raw", value
+
+        chunks = range(0, len(data), SECRET_CHUNK_SIZE)
+        encoded[f"{key}{SECRET_CODEC_SUFFIX}"] = f"{codec}:{len(chunks)}:{size}"
+        for index, start in enumerate(chunks):
+            encoded[f"{key}{SECRET_CHUNK_SUFFIX}{index}"] = data[start : start + SECRET_CHUNK_SIZE]
+    return encoded
+
+
+class SecretContent(Mapping):
+    """Content of a secret as read, values decoded only once accessed."""
+
+    def __init__(self, stored: Dict[str, str]):
+        """Index the keys of the content as stored, nothing is decoded yet.
+
+        A codec key is only taken as such with a valid header and all its chunks present:
+        keys written before `encode_secret_content()` reserved these names are left as is.
+        """
+        self.stored = stored
+        self._decoded = {}
+        # Encoded values: {key: (codec, chunks, size)}
+        self._encoded = {}
+        for key, value in stored.items():
+            if not key.endswith(SECRET_CODEC_SUFFIX):
+                continue
+            if not (header := SECRET_CODEC_HEADER.fullmatch(value)):
+                continue
+            name = key[: -len(SECRET_CODEC_SUFFIX)]
+            codec, chunks, size = header.group(1), int(header.group(2)), int(header.group(3))
+            if all(f"{name}{SECRET_CHUNK_SUFFIX}{index}" in stored for index in range(chunks)):
+                self._encoded[name] = (codec, chunks, size)
+
+        internal = {f"{key}{SECRET_CODEC_SUFFIX}" for key in self._encoded} | {
+            f"{key}{SECRET_CHUNK_SUFFIX}{index}"
+            for key, (_, chunks, _) in self._encoded.items()
+            for index in range(chunks)
+        }
+        self._keys = [key for key in stored if key not in internal] + list(self._encoded)
+
+    def __getitem__(self, key: str) -> str:
+        """Value of a key, decoded (and cached) on first access if encoded."""
+        if key not in self._decoded:
+            if key not in self._encoded:
+                return self.stored[key]
+            codec, chunks, _ = self._encoded[key]
+            data = "".join(
+                self.stored[f"{key}{SECRET_CHUNK_SUFFIX}{index}"] for index in range(chunks)
+            )
+            if codec == "zlib":
+                data = zlib.decompress(base64.b64decode(data)).decode()
+            self._decoded[key] = data
+        return self._decoded[key]
+
+    def __iter__(self) -> Iterator[str]:
+        """Keys of the content, as written: without the chunk and codec keys."""
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        """Count the keys of the content, as written."""
+        return len(self._keys)
+
+    def fields(self, keys: List[str]) -> Dict[str, str]:
+        """Get the values of some keys only (the ones present)."""
+        return {key: self[key] for key in keys if key in self}
+
+    def sizes(self) -> Dict[str, Any]:
+        """Size accounting, without decoding anything.
+
+        Returns:
+            per key: its size (bytes), size as stored (bytes, all chunks), codec and
+                number of chunks; and the totals.
+        """
+        keys = {}
+        for key in self._keys:
+            if key in self._encoded:
+                codec, chunks, size = self._encoded[key]
+                stored = sum(
+                    len(self.stored[f"{key}{SECRET_CHUNK_SUFFIX}{index}"].encode())
+                    for index in range(chunks)
+                )
+            else:
+                codec, chunks, size = "none", 1, len(self.stored[key].encode())
+                stored = size
+            keys[key] = {"size": size, "stored": stored, "codec": codec, "chunks": chunks}
+        return {
+            "keys": keys,
+            "size": sum(key["size"] for key in keys.values()),
+            "stored": sum(len(key) + len(value.encode()) for key, value in self.stored.items()),
+        }
+
+
 class Scope(Enum):
     """Peer relations scope."""
 
@@ -424,29 +675,105 @@ class Scope(Enum):
     UNIT = "unit"
 
 
+class DispatchContext:
+    """What doesn't change during a dispatch, looked up once.
+
+    Peer relations, leadership, the Juju version and its capabilities.
+
+    Juju runs each dispatch in a new charm process, with a new model: the context lives as
+    long as the model (`DispatchContext.of(charm.model)`), shared by the charm and all objects
+    of this library. Leadership is left to ops, which checks it again once the lease (30s) is
+    over. Under Harness, which keeps the same model across events, `reset()` starts a new
+    dispatch.
+    """
+
+    # Attribute of the model keeping the context, apart from the one of the charm's own helpers
+    ATTRIBUTE = "_data_interfaces_dispatch_context"
+
+    def __init__(self, model: Model):
+        self.model = model
+        self.reset()
+
+    @classmethod
+    def of(cls, model: Model) -> "DispatchContext":
+        """Get the context of the dispatch a model is of."""
+        if (context := getattr(model, cls.ATTRIBUTE, None)) is None:
+            context = cls(model)
+            setattr(model, cls.ATTRIBUTE, context)
+        return context
+
+    def reset(self) -> None:
+        self._relations = {}
+        self._juju_version = None
+
+    def relation(self, name: str) -> Optional[Relation]:
+        """Get the relation of an endpoint with a single one (peers), None if not there (yet)."""
+        if (relation := self._relations.get(name)) is None:
+            if relation := self.model.get_relation(name):
+                self._relations[name] = relation
+        return relation
+
+    @property
+    def is_leader(self) -> bool:
+        # Not memoized: changes within a dispatch (Harness.set_leader) are seen, ops keeps it
+        # for the lease without calling is-leader again
+        return self.model.unit.is_leader()
+
+    @property
+    def juju_version(self) -> JujuVersion:
+        if self._juju_version is None:
+            self._juju_version = JujuVersion.from_environ()
+        return self._juju_version
+
+    @property
+    def has_secrets(self) -> bool:
+        return self.juju_version.has_secrets
+
+
 class SecretCache:
     """Internal helper class locally cache secrets.
 
-    The data structure is precisely re-using/simulating as in the actual Secret Storage
+    The data structure is precisely re-using/simulating as in the actual Secret Storage.
+    Contents are stored encoded (see `encode_secret_content()`) unless `encode` is False
+    (secrets read by charms unable to decode them), and decoded on access.
     """
 
-    def __init__(self, charm: CharmBase, secret_uri: Optional[str] = None):
+    def __init__(self, charm: CharmBase, secret_uri: Optional[str] = None, encode: bool = True):
         self._secret_meta = None
-        self._secret_content = {}
+        self._secret_content = None
         self._secret_uri = secret_uri
         self.charm = charm
+        self.encode = encode
 
-    def add_secret(self, content: Dict[str, str], relation: Relation) -> Secret:
-        """Create a new secret."""
+    def _stored(self, content: Dict[str, str]) -> Dict[str, str]:
+        """Content as written to the secret."""
+        if self.encode:
+            return encode_secret_content(content)
+        check_secret_keys(content)
+        return dict(content)
+
+    def add_secret(
+        self,
+        content: Dict[str, str],
+        relation: Optional[Relation] = None,
+        label: Optional[str] = None,
+        scope: Scope = Scope.APP,
+        rotate: Optional[SecretRotate] = None,
+    ) -> Secret:
+        """Create a new secret, owned by the application (default) or by the unit."""
         if self._secret_uri:
             raise SecretAlreadyExistsError(
                 "Secret is already defined with uri %s", self._secret_uri
             )
 
-        secret = self.charm.app.add_secret(content)
-        secret.grant(relation)
+        owner = self.charm.app if scope == Scope.APP else self.charm.unit
+        encoded = self._stored(content)
+        secret = owner.add_secret(encoded, label=label, rotate=rotate)
+        if relation:
+            secret.grant(relation)
         self._secret_uri = secret.id
         self._secret_meta = secret
+        self._secret_content = SecretContent(encoded)
         return self._secret_meta
 
     @property
@@ -458,18 +785,27 @@ class SecretCache:
             self._secret_meta = self.charm.model.get_secret(id=self._secret_uri)
         return self._secret_meta
 
+    @property
+    def content(self) -> SecretContent:
+        """Cached secret content, decoded lazily."""
+        if self._secret_content is None:
+            self._secret_content = SecretContent(self.meta.get_content() if self.meta else {})
+        return self._secret_content
+
     def get_content(self) -> Dict[str, str]:
         """Getting cached secret content."""
-        if not self._secret_content:
-            if self.meta:
-                self._secret_content = self.meta.get_content()
-        return self._secret_content
+        return dict(self.content)
+
+    def get_fields(self, fields: List[str]) -> Dict[str, str]:
+        """Get some fields of the cached secret content, decoding only these."""
+        return self.content.fields(fields)
 
     def set_content(self, content: Dict[str, str]) -> None:
         """Setting cached secret content."""
         if self.meta:
-            self.meta.set_content(content)
-            self._secret_content = content
+            encoded = self._stored(content)
+            self.meta.set_content(encoded)
+            self._secret_content = SecretContent(encoded)
 
     def get_info(self) -> Optional[SecretInfo]:
         """Wrapper function to provide direct access to contained Secret's equal function."""
@@ -493,7 +829,6 @@ class DataRelation(Object, ABC):
             charm.on[relation_name].relation_changed,
             self._on_relation_changed_event,
         )
-        self._jujuversion = None
         self.secrets = {}
 
     @property
@@ -505,12 +840,15 @@ class DataRelation(Object, ABC):
             if self._is_relation_active(relation)
         ]
 
+    @property
+    def _context(self) -> DispatchContext:
+        """Peer relations, leadership and Juju version, looked up once per dispatch."""
+        return DispatchContext.of(self.model)
+
     @property
     def secrets_enabled(self):
         """Is this Juju version allowing for Secrets usage?"""
-        if not self._jujuversion:
-            self._jujuversion = JujuVersion.from_environ()
-        return self._jujuversion.has_secrets
+        return self._context.has_secrets
 
     @abstractmethod
     def _on_relation_changed_event(self, event: RelationChangedEvent) -> None:
@@ -605,10 +943,48 @@ class DataRelation(Object, ABC):
 
 
 class DataProvides(DataRelation):
-    """Base provides-side of the data products relation."""
+    """Base provides-side of the data products relation.
 
-    def __init__(self, charm: CharmBase, relation_name: str) -> None:
+    Secret groups listed in `shared_secret_labels` are content-addressed: relations receiving
+    identical content for such a group (e.g. the same TLS CA) share a single Juju Secret.
+    The registry of shared secrets (and their reference counts) is kept in the leader's
+    application databag of the `peer_relation_name` peer relation.
+
+    Fields set within a `batch()` block are applied at once when leaving it (see `batch()`).
+
+    The secrets of a relation are removed on relation-broken. The IDs of the secrets created
+    for each relation are also recorded in the leader's peer databag, so that secrets left
+    behind (relation-broken missed or failing) are removed on `update-status`, in batches
+    (see `sweep_orphaned_secrets()`).
+    """
+
+    def __init__(
+        self,
+        charm: CharmBase,
+        relation_name: str,
+        shared_secret_labels: Optional[List[str]] = None,
+        peer_relation_name: Optional[str] = None,
+    ) -> None:
         super().__init__(charm, relation_name)
+        self.shared_secret_labels = shared_secret_labels or []
+        self.peer_relation_name = peer_relation_name
+        # Rotation policies of the secrets created for each secret group (see
+        # `CredentialsRotation`)
+        self.secret_rotation: Dict[str, SecretRotate] = {}
+        self._shared_secrets = {}
+        self._digest_key_value = None
+        # Fields staged by batch(), and secrets created while applying them
+        self._batch = None
+        self._batch_created = None
+        # IDs of the unshared secrets of each relation, saved on commit if changed
+        self._relation_secrets_ledger = None
+        self._relation_secrets_changed = False
+
+        self.framework.observe(
+            charm.on[relation_name].relation_broken, self._on_relation_broken_event
+        )
+        self.framework.observe(charm.on.update_status, self._on_update_status)
+        self.framework.observe(self.framework.on.pre_commit, self._on_pre_commit)
 
     def _diff(self, event: RelationChangedEvent) -> Diff:
         """Retrieves the diff of the data in the relation changed databag.
@@ -622,6 +998,212 @@ class DataProvides(DataRelation):
         """
         return diff(event, self.local_app)
 
+    # Secret digests
+
+    @property
+    def _digest_key(self) -> bytes:
+        """Private key for the secret digests, kept in a secret not shared with anyone."""
+        if not self._digest_key_value:
+            label = f"{self.relation_name}.digest-key"
+            try:
+                key = self.charm.model.get_secret(label=label).get_content()["key"]
+            except SecretNotFoundError:
+                key = os.urandom(32).hex()
+                self.charm.app.add_secret({"key": key}, label=label)
+            self._digest_key_value = bytes.fromhex(key)
+        return self._digest_key_value
+
+    def _secret_digests(self, content: Dict[str, str]) -> str:
+        """Manifest of keyed digests of secret fields (no secret material)."""
+        digests = {
+            field: hmac.new(self._digest_key, value.encode(), hashlib.sha256).hexdigest()[
+                :SECRET_DIGEST_LENGTH
+            ]
+            for field, value in content.items()
+        }
+        return json.dumps(digests, sort_keys=True, separators=(",", ":"))
+
+    # Shared (content-addressed) secrets
+
+    @property
+    def _shared_secrets_databag(self) -> Optional[RelationDataContent]:
+        """The leader's peer databag holding the shared secrets registry (and secrets ledger)."""
+        if not self.peer_relation_name:
+            return
+        peer_relation = self._context.relation(self.peer_relation_name)
+        if not peer_relation:
+            return
+        return peer_relation.data[self.local_app]
+
+    def _is_shared_label(self, label: str) -> bool:
+        """Whether the secret group is handled in content-addressed mode."""
+        if label not in self.shared_secret_labels:
+            return False
+        if self._shared_secrets_databag is None:
+            logger.warning(
+                "Peer relation %s unavailable, secret %s is not shared",
+                self.peer_relation_name,
+                label,
+            )
+            return False
+        return True
+
+    def _load_shared_secrets(self) -> Dict[str, dict]:
+        """Shared secrets registry, indexed by `<label>-<content digest>`."""
+        databag = self._shared_secrets_databag
+        if databag is None:
+            return {}
+        return json.loads(databag.get(SHARED_SECRETS_KEY, "{}"))
+
+    def _save_shared_secrets(self, registry: Dict[str, dict]) -> None:
+        databag = self._shared_secrets_databag
+        if databag is not None:
+            databag[SHARED_SECRETS_KEY] = json.dumps(registry, sort_keys=True)
+
+    @staticmethod
+    def _shared_secret_key(label: str, content: Dict[str, str], encoded: bool = True) -> str:
+        """Content address of a secret group (the registry key, not the label of the secret).
+
+        Relations able to decode encoded contents and the others don't share secrets.
+        """
+        digest = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+        return f"{label}-{digest[:16]}" + ("" if encoded else "-plain")
+
+    def _find_shared_secret(
+        self, registry: Dict[str, dict], relation_id: int, label: str
+    ) -> Optional[str]:
+        """Registry key of the shared secret currently granted to a relation."""
+        for key, entry in registry.items():
+            if entry["label"] == label and relation_id in entry["relations"]:
+                return key
+
+    def _get_shared_secret(self, entry: dict) -> SecretCache:
+        """Shared secret objects are cached by ID, as many relations may refer to them."""
+        if entry["id"] not in self._shared_secrets:
+            self._shared_secrets[entry["id"]] = SecretCache(
+                self.charm, entry["id"], encode=entry.get("encoded", True)
+            )
+        return self._shared_secrets[entry["id"]]
+
+    def _attach_shared_secret(
+        self, registry: Dict[str, dict], relation: Relation, content: Dict[str, str], label: str
+    ) -> SecretCache:
+        """Grant the relation the shared secret holding `content`, creating it if needed."""
+        encoded = self._decodes_secrets(relation)
+        key = self._shared_secret_key(label, content, encoded)
+        if entry := registry.get(key):
+            secret = self._get_shared_secret(entry)
+            if secret.meta:
+                secret.meta.grant(relation)
+        else:
+            secret = SecretCache(self.charm, encode=encoded)
+            # Labelled by an ID of its own: the content (and registry key) may change
+            shared_id = os.urandom(8).hex()
+            secret.add_secret(content, relation, label=f"{self.relation_name}.{label}-{shared_id}")
+            secret_info = secret.get_info()
+            entry = registry[key] = {
+                "id": secret.meta.id if secret.meta else None,
+                "label": label,
+                "revision": secret_info.revision if secret_info else 1,
+                "digests": self._secret_digests(content),
+                "encoded": encoded,
+                "relations": [],
+            }
+            self._shared_secrets[entry["id"]] = secret
+            self._created_secret(secret)
+
+        entry["relations"].append(relation.id)
+        relation.data[self.local_app][f"secret-{label}"] = entry["id"]
+        relation.data[self.local_app][f"secret-{label}-revision"] = str(entry["revision"])
+        relation.data[self.local_app][f"secret-{label}-digests"] = entry.setdefault(
+            "digests", self._secret_digests(content)
+        )
+        self.secrets.setdefault(relation.id, {})[label] = secret
+        return secret
+
+    def _detach_shared_secret(
+        self, registry: Dict[str, dict], relation: Relation, key: str
+    ) -> None:
+        """Revoke the relation's access to a shared secret, removing it when unreferenced."""
+        entry = registry[key]
+        entry["relations"].remove(relation.id)
+        secret = self._get_shared_secret(entry)
+        if not secret.meta:
+            return
+
+        if entry["relations"]:
+            secret.meta.revoke(relation)
+        else:
+            secret.meta.remove_all_revisions()
+            del registry[key]
+        self.secrets.get(relation.id, {}).pop(entry["label"], None)
+
+    def _update_shared_secret(
+        self, registry: Dict[str, dict], key: str, content: Dict[str, str]
+    ) -> Optional[str]:
+        """Update a shared secret in place for all the relations referring to it.
+
+        Returns:
+            the new registry key of the secret if its contents changed.
+        """
+        entry = registry[key]
+        secret = self._get_shared_secret(entry)
+        old_content = secret.get_content()
+        full_content = copy.deepcopy(old_content)
+        full_content.update(content)
+        if old_content == full_content:
+            return
+
+        new_key = self._shared_secret_key(entry["label"], full_content, entry.get("encoded", True))
+        if new_key in registry:
+            # Content converged with another shared secret: move the relations over
+            relations = [
+                self.get_relation(self.relation_name, relation_id)
+                for relation_id in entry["relations"]
+            ]
+            for relation in relations:
+                self._detach_shared_secret(registry, relation, key)
+                self._attach_shared_secret(registry, relation, full_content, entry["label"])
+            return new_key
+
+        secret.set_content(full_content)
+        entry["revision"] += 1
+        entry["digests"] = self._secret_digests(full_content)
+        registry[new_key] = registry.pop(key)
+        for relation_id in entry["relations"]:
+            if relation := self.charm.model.get_relation(self.relation_name, relation_id):
+                relation.data[self.local_app][f"secret-{entry['label']}-revision"] = str(
+                    entry["revision"]
+                )
+                relation.data[self.local_app][f"secret-{entry['label']}-digests"] = entry[
+                    "digests"
+                ]
+                self.secrets.setdefault(relation_id, {})[entry["label"]] = secret
+        return new_key
+
+    @leader_only
+    @juju_secrets_only
+    def set_shared_relation_fields(self, fields: Dict[str, str]) -> None:
+        """Update secret fields on all shared secrets they belong to.
+
+        Contrary to `set_relation_fields()` the change applies to every relation at once,
+        at the cost of a single secret update per shared secret (e.g. rotating a TLS CA).
+        """
+        registry = self._load_shared_secrets()
+        label_sorted_content = self._create_label_sorted_content(list(fields.keys()))
+        for label, keys in label_sorted_content.items():
+            if not self._is_shared_label(label):
+                logger.error("Secret %s is not shared, can't update it for all relations", label)
+                continue
+
+            content = {k: fields[k] for k in keys}
+            for key in [key for key, entry in registry.items() if entry["label"] == label]:
+                if key in registry:
+                    self._update_shared_secret(registry, key, content)
+        self._save_shared_secrets(registry)
+
+    # Relation secrets
+
     @leader_only
     @juju_secrets_only
     def add_relation_secret(
@@ -634,19 +1216,41 @@ class DataProvides(DataRelation):
             logging.error("Secret for relation %s already exists, not adding again", relation_id)
             return
 
-        secret = SecretCache(self.charm)
-        secret.add_secret(content, relation)
+        if self._is_shared_label(label):
+            registry = self._load_shared_secrets()
+            secret = self._attach_shared_secret(registry, relation, content, label)
+            self._save_shared_secrets(registry)
+            return secret.meta
+
+        secret = SecretCache(self.charm, encode=self._decodes_secrets(relation))
+        secret.add_secret(content, relation, rotate=self.secret_rotation.get(label))
+        self._created_secret(secret)
+        if secret.meta and secret.meta.id:
+            self._record_relation_secret(relation_id, secret.meta.id)
 
         # According to lint we may not have a Secret ID
         if secret.meta and secret.meta.id and (secret_info := secret.get_info()):
             relation.data[self.local_app][f"secret-{label}"] = secret.meta.id
             relation.data[self.local_app][f"secret-{label}-revision"] = str(secret_info.revision)
+            relation.data[self.local_app][f"secret-{label}-digests"] = self._secret_digests(
+                content
+            )
             self.secrets.setdefault(relation_id, {})[label] = secret
 
     @leader_only
     @juju_secrets_only
     def update_relation_secret(self, relation_id: int, content: Dict[str, str], label: str):
         """Update the contents of an existing Juju Secret, referred in the relation databag."""
+        if self._is_shared_label(label):
+            registry = self._load_shared_secrets()
+            relation = self.get_relation(self.relation_name, relation_id)
+            if not self._find_shared_secret(registry, relation_id, label):
+                logging.error("Can't update shared secret for relation %s", relation_id)
+                return
+            self._set_relation_shared_secret(registry, relation, content, label)
+            self._save_shared_secrets(registry)
+            return
+
         secret = self._get_relation_secret(relation_id, label)
 
         if not secret:
@@ -656,16 +1260,47 @@ class DataProvides(DataRelation):
         old_content = secret.get_content()
         full_content = copy.deepcopy(old_content)
         full_content.update(content)
-        secret.set_content(full_content)
 
         # We only have a new revision, if the secret contents changed
-        if old_content != full_content and secret.meta and (secret_info := secret.get_info()):
+        if old_content == full_content:
+            return
+        secret.set_content(full_content)
+
+        if secret.meta and (secret_info := secret.get_info()):
             relation = self.get_relation(self.relation_name, relation_id)
 
             # Horrible hack to work around the fact that we can't query a secret's new revision after update
             relation.data[self.local_app][f"secret-{label}-revision"] = str(
                 secret_info.revision + 1
             )
+            relation.data[self.local_app][f"secret-{label}-digests"] = self._secret_digests(
+                full_content
+            )
+
+    def _set_relation_shared_secret(
+        self, registry: Dict[str, dict], relation: Relation, content: Dict[str, str], label: str
+    ) -> None:
+        """Set the shared secret of a single relation.
+
+        The secret is updated in place when no other relation refers to it, otherwise the
+        relation is moved to the shared secret matching its new contents.
+        """
+        key = self._find_shared_secret(registry, relation.id, label)
+        if not key:
+            self._attach_shared_secret(registry, relation, content, label)
+            return
+
+        entry = registry[key]
+        full_content = copy.deepcopy(self._get_shared_secret(entry).get_content())
+        full_content.update(content)
+        if self._shared_secret_key(label, full_content, entry.get("encoded", True)) == key:
+            return
+
+        if len(entry["relations"]) == 1:
+            self._update_shared_secret(registry, key, content)
+        else:
+            self._detach_shared_secret(registry, relation, key)
+            self._attach_shared_secret(registry, relation, full_content, label)
 
     @juju_secrets_only
     def _get_relation_secret(
@@ -681,43 +1316,465 @@ class DataProvides(DataRelation):
                 return
             if secret_id := relation.data[self.local_app].get(f"secret-{label}"):
                 self.secrets.setdefault(relation_id, {})[label] = SecretCache(
-                    self.charm, secret_id
+                    self.charm, secret_id, encode=self._decodes_secrets(relation)
                 )
         return self.secrets.get(relation_id, {}).get(label)
 
-    @leader_only
-    def set_relation_fields(self, relation_id: int, fields: Dict[str, str]) -> None:
-        """Set values for fields not caring whether it's a secret or not."""
-        relation = self.get_relation(self.relation_name, relation_id)
+    @staticmethod
+    def _decodes_secrets(relation: Relation) -> bool:
+        """Whether the requirer advertised it decodes encoded secret contents."""
+        codecs = relation.data.get(
+            relation.app, {}  # pyright: ignore [reportGeneralTypeIssues]
+        ).get(SECRET_CODECS_FIELD, "")
+        return set(SECRET_CODECS) <= set(codecs.split())
+
+    def _plan_relation_fields(
+        self, relation: Relation, fields: Dict[str, str]
+    ) -> Tuple[Dict[str, str], Dict[str, Dict[str, str]]]:
+        """Split fields into plain databag content and secret contents grouped by label."""
         relation_secret_fields = relation.data.get(
             relation.app, {}  # pyright: ignore [reportGeneralTypeIssues]
         ).get("secret_fields")
 
-        normal_fields = list(fields)
-        if relation_secret_fields and self.secrets_enabled:
-            relation_secret_fields = relation_secret_fields.split(" ")
-            normal_fields = set(fields.keys()) - set(relation_secret_fields)
-            secret_fields = set(fields.keys()) - set(normal_fields)
+        if not relation_secret_fields or not self.secrets_enabled:
+            return dict(fields), {}
 
-            label_sorted_content = self._create_label_sorted_content(list(fields.keys()))
+        secret_fields = [
+            k for k in fields if k in relation_secret_fields.split(" ") and k in SECRET_LABEL_MAP
+        ]
+        normal_content = {k: v for k, v in fields.items() if k not in secret_fields}
+        secret_content = {
+            label: {k: fields[k] for k in keys}
+            for label, keys in self._create_label_sorted_content(secret_fields).items()
+        }
+        return normal_content, secret_content
 
-            for label in label_sorted_content:
-                secret_content = {
-                    k: v
-                    for k, v in fields.items()
-                    if k in secret_fields and SECRET_LABEL_MAP[k] == label
-                }
-
-                if self._get_relation_secret(relation_id, label):
-                    self.update_relation_secret(relation_id, secret_content, label)
-                else:
-                    self.add_relation_secret(relation_id, secret_content, label)
+    def _set_relation_secret(self, relation_id: int, content: Dict[str, str], label: str) -> None:
+        """Add or update a relation secret, depending on whether it exists already."""
+        if self._get_relation_secret(relation_id, label):
+            self.update_relation_secret(relation_id, content, label)
+        else:
+            self.add_relation_secret(relation_id, content, label)
+
+    @leader_only
+    def set_relation_fields(self, relation_id: int, fields: Dict[str, str]) -> None:
+        """Set values for fields not caring whether it's a secret or not."""
+        if self._batch is not None:
+            self._batch.setdefault(relation_id, {}).update(fields)
+            return
+
+        relation = self.get_relation(self.relation_name, relation_id)
+        normal_content, secret_content = self._plan_relation_fields(relation, fields)
+
+        for label, content in secret_content.items():
+            self._set_relation_secret(relation_id, content, label)
 
-        normal_content = {k: v for k, v in fields.items() if k in normal_fields}
         relation.data[self.local_app].update(  # pyright: ignore [reportGeneralTypeIssues]
             normal_content
         )
 
+    def _plan_relation_fields_bulk(
+        self, relation_fields: Dict[int, Dict[str, str]]
+    ) -> Tuple[list, list]:
+        """Plan the changes of many relations: per relation ones, and shared secrets.
+
+        Plain fields already holding the requested value are left out.
+        """
+        plans = []
+        shared_secrets = []
+        for relation_id, fields in relation_fields.items():
+            relation = self.get_relation(self.relation_name, relation_id)
+            normal_content, secret_content = self._plan_relation_fields(relation, fields)
+
+            databag = relation.data[self.local_app]
+            normal_content = {k: v for k, v in normal_content.items() if databag.get(k) != v}
+            for label in [label for label in secret_content if self._is_shared_label(label)]:
+                shared_secrets.append((relation, secret_content.pop(label), label))
+
+            if normal_content or secret_content:
+                plans.append((relation, normal_content, secret_content))
+        return plans, shared_secrets
+
+    def _apply_relation_fields(
+        self,
+        relation: Relation,
+        normal_content: Dict[str, str],
+        secret_content: Dict[str, Dict[str, str]],
+    ) -> None:
+        """Write the secrets of a relation, then its databag (pointing to them)."""
+        for label, content in secret_content.items():
+            self._set_relation_secret(relation.id, content, label)
+        if normal_content:
+            relation.data[self.local_app].update(normal_content)
+
+    @leader_only
+    def set_relation_fields_bulk(self, relation_fields: Dict[int, Dict[str, str]]) -> None:
+        """Set values for fields across many relations at once.
+
+        All operations are planned first: plain fields already holding the requested value
+        are skipped, and shared secrets are created or updated once for all relations
+        (the registry saved once): a shared secret that all its relations move away from
+        together gets a single update. The remaining operations are applied relation by
+        relation.
+
+        Args:
+            relation_fields: fields to be set, indexed by relation ID.
+        """
+        if self._batch is not None:
+            for relation_id, fields in relation_fields.items():
+                self._batch.setdefault(relation_id, {}).update(fields)
+            return
+
+        plans, shared_secrets = self._plan_relation_fields_bulk(relation_fields)
+        if shared_secrets:
+            registry = self._load_shared_secrets()
+            self._set_shared_secrets_bulk(registry, shared_secrets)
+            self._save_shared_secrets(registry)
+
+        for plan in plans:
+            self._apply_relation_fields(*plan)
+
+    def _set_shared_secrets_bulk(
+        self, registry: Dict[str, dict], shared_secrets: List[tuple]
+    ) -> None:
+        """Set the shared secrets of many relations, grouped by the secret they refer to.
+
+        A shared secret all the relations referring to it move away from, to the same
+        content, is updated in place (a single `secret-set`). The other relations are moved
+        one by one to the shared secret matching their new contents.
+        """
+        groups = {}
+        for relation, content, label in shared_secrets:
+            key = self._find_shared_secret(registry, relation.id, label)
+            groups.setdefault(key, []).append((relation, content, label))
+
+        remaining = groups.pop(None, [])
+        for key, group in groups.items():
+            relation_ids = {relation.id for relation, _, _ in group}
+            contents = [content for _, content, _ in group]
+            if relation_ids == set(registry[key]["relations"]) and all(
+                content == contents[0] for content in contents
+            ):
+                self._update_shared_secret(registry, key, contents[0])
+            else:
+                remaining.extend(group)
+
+        for relation, content, label in remaining:
+            self._set_relation_shared_secret(registry, relation, content, label)
+
+    # Batches
+
+    @contextmanager
+    def batch(self):
+        """Stage the fields set within the block, apply them all at once when leaving it.
+
+        Fields set on the same relation are merged, and applied by `set_relation_fields_bulk()`:
+        the shared secrets registry first, then each relation's secrets before its databag.
+
+        If applying fails, the changes already made are rolled back before the error is
+        raised: secrets created are removed, secrets updated get their previous content
+        (as a new revision, Juju doesn't restore revisions), shared secrets are granted
+        again, databags and the shared secrets registry are restored. Secrets removed (the
+        last reference to a shared secret dropped) can't be restored. This matters to
+        charms handling the error: Juju discards the changes of a failing hook anyway.
+
+        Nothing is applied if the block raises. Batches nested join the outer one.
+
+        Example:
+            with self.database.batch():
+                for relation in self.database.relations:
+                    self.database.set_credentials(relation.id, username, password)
+                    self.database.set_tls_ca(relation.id, ca)
+        """
+        if self._batch is not None:
+            yield self
+            return
+
+        self._batch = {}
+        try:
+            yield self
+            staged = self._batch
+        finally:
+            self._batch = None
+        if staged:
+            self._apply_batch(staged)
+
+    def _apply_batch(self, relation_fields: Dict[int, Dict[str, str]]) -> None:
+        """Set the fields staged, rolling back if any of them fails."""
+        snapshot = self._snapshot(relation_fields)
+        self._batch_created = snapshot["created"]
+        try:
+            self.set_relation_fields_bulk(relation_fields)
+        except Exception:
+            self._rollback(snapshot)
+            raise
+        finally:
+            self._batch_created = None
+
+    def _created_secret(self, secret: SecretCache) -> None:
+        """Account for a secret created while applying a batch."""
+        if self._batch_created is not None:
+            self._batch_created.append(secret)
+
+    def _snapshot(self, relation_fields: Dict[int, Dict[str, str]]) -> dict:
+        """State to roll back to: databags, shared secrets registry, contents of the secrets.
+
+        The contents are the ones the secrets will be updated from: cached, not read again.
+        """
+        registry = self._load_shared_secrets()
+        relation_ids = set(relation_fields)
+        secrets = {}
+        for relation_id, fields in relation_fields.items():
+            relation = self.get_relation(self.relation_name, relation_id)
+            _, secret_content = self._plan_relation_fields(relation, fields)
+            for label in secret_content:
+                if self._is_shared_label(label):
+                    key = self._find_shared_secret(registry, relation_id, label)
+                    if not key:
+                        continue
+                    relation_ids.update(registry[key]["relations"])
+                    secret = self._get_shared_secret(registry[key])
+                else:
+                    secret = self._get_relation_secret(relation_id, label)
+                if secret and secret.meta:
+                    secrets[secret.meta.id] = (secret, copy.deepcopy(secret.get_content()))
+
+        databags = {}
+        for relation_id in relation_ids:
+            if relation := self.charm.model.get_relation(self.relation_name, relation_id):
+                databags[relation_id] = dict(relation.data[self.local_app])
+        return {
+            "registry": copy.deepcopy(registry),
+            "databags": databags,
+            "secrets": secrets,
+            "created": [],
+        }
+
+    def _rollback(self, snapshot: dict) -> None:
+        """Undo the changes of a batch applied partially."""
+        self._rollback_created(snapshot["created"])
+        self._rollback_contents(snapshot["secrets"])
+        self._rollback_registry(snapshot["registry"])
+        self._rollback_databags(snapshot["databags"])
+        self._shared_secrets = {}
+
+    def _rollback_created(self, created: List[SecretCache]) -> None:
+        """Remove the secrets created by a batch."""
+        for secret in created:
+            try:
+                if secret.meta:
+                    secret.meta.remove_all_revisions()
+                    self._forget_relation_secret(secret.meta.id)
+            except ModelError as e:
+                logger.error("Failed to remove secret created: %s", e)
+
+    def _rollback_contents(self, secrets: Dict[str, tuple]) -> None:
+        """Give the secrets updated by a batch their previous content back."""
+        for secret_id, (secret, content) in secrets.items():
+            try:
+                if secret.get_content() != content:
+                    secret.set_content(content)
+            except ModelError as e:
+                logger.error("Failed to restore the content of secret %s: %s", secret_id, e)
+
+    def _rollback_registry(self, previous: Dict[str, dict]) -> None:
+        """Grant the shared secrets again, and restore their registry."""
+        registry = self._load_shared_secrets()
+        current = {entry["id"]: entry["relations"] for entry in registry.values()}
+        for entry in previous.values():
+            for relation_id in set(entry["relations"]) - set(current.get(entry["id"], [])):
+                self._grant_shared_secret(entry, relation_id)
+        if registry != previous:
+            self._save_shared_secrets(previous)
+
+    def _grant_shared_secret(self, entry: dict, relation_id: int) -> None:
+        relation = self.charm.model.get_relation(self.relation_name, relation_id)
+        try:
+            if relation and (secret := self._get_shared_secret(entry)).meta:
+                secret.meta.grant(relation)
+        except ModelError as e:
+            logger.error("Failed to grant secret %s again: %s", entry["id"], e)
+
+    def _rollback_databags(self, databags: Dict[int, Dict[str, str]]) -> None:
+        """Restore the databags of the relations touched by a batch."""
+        for relation_id, old in databags.items():
+            relation = self.charm.model.get_relation(self.relation_name, relation_id)
+            databag = relation.data[self.local_app]
+            for key in set(databag) | set(old):
+                if databag.get(key) != old.get(key):
+                    databag[key] = old.get(key, "")
+            self.secrets.pop(relation_id, None)
+
+    # Cleanup of the secrets of relations gone
+
+    @property
+    def _relation_secrets_key(self) -> str:
+        return f"{self.relation_name}-{RELATION_SECRETS_KEY}"
+
+    def _relation_secrets(self) -> Dict[str, List[str]]:
+        """Ledger of the unshared secrets created for each relation (by relation ID)."""
+        if self._relation_secrets_ledger is None:
+            databag = self._shared_secrets_databag
+            self._relation_secrets_ledger = (
+                json.loads(databag.get(self._relation_secrets_key, "{}"))
+                if databag is not None
+                else {}
+            )
+        return self._relation_secrets_ledger
+
+    def _record_relation_secret(self, relation_id: int, secret_id: str) -> None:
+        ledger = self._relation_secrets()
+        ledger.setdefault(str(relation_id), []).append(secret_id)
+        self._relation_secrets_changed = True
+
+    def _forget_relation_secret(self, secret_id: str) -> None:
+        ledger = self._relation_secrets()
+        for relation_id, secret_ids in list(ledger.items()):
+            if secret_id in secret_ids:
+                secret_ids.remove(secret_id)
+                if not secret_ids:
+                    del ledger[relation_id]
+                self._relation_secrets_changed = True
+
+    def _on_pre_commit(self, _) -> None:
+        """Save the ledger of relation secrets, if changed during the dispatch."""
+        if not self._relation_secrets_changed or not self._context.is_leader:
+            return
+        databag = self._shared_secrets_databag
+        if databag is not None:
+            if ledger := self._relation_secrets():
+                databag[self._relation_secrets_key] = json.dumps(
+                    ledger, sort_keys=True, separators=(",", ":")
+                )
+            elif self._relation_secrets_key in databag:
+                del databag[self._relation_secrets_key]
+        self._relation_secrets_changed = False
+
+    def _remove_secret(self, secret_id: str) -> int:
+        """Remove a secret with all its revisions, if it's still there."""
+        try:
+            self.charm.model.get_secret(id=secret_id).remove_all_revisions()
+        except SecretNotFoundError:
+            return 0
+        self._shared_secrets.pop(secret_id, None)
+        return 1
+
+    def _on_relation_broken_event(self, event: RelationBrokenEvent) -> None:
+        """Remove the secrets of the relation, drop its references to shared secrets."""
+        if not self._context.is_leader or not self.secrets_enabled:
+            return
+        if removed := self._remove_relation_secrets(event.relation):
+            logger.info("Removed %s secrets of relation %s", removed, event.relation.id)
+
+    def _remove_relation_secrets(self, relation: Relation) -> int:
+        """Remove the unshared secrets of a relation gone, and its references to shared ones.
+
+        Juju drops the access granted to a relation along with the relation: shared secrets
+        still referred to by other relations are left as they are, the others removed.
+
+        Returns:
+            the number of secrets removed.
+        """
+        registry = self._load_shared_secrets()
+        shared_ids = {entry["id"] for entry in registry.values()}
+        removed = 0
+        keys = [key for key, entry in registry.items() if relation.id in entry["relations"]]
+        for key in keys:
+            entry = registry[key]
+            entry["relations"].remove(relation.id)
+            if not entry["relations"]:
+                removed += self._remove_secret(entry["id"])
+                del registry[key]
+        if keys:
+            self._save_shared_secrets(registry)
+
+        ledger = self._relation_secrets()
+        secret_ids = set(ledger.pop(str(relation.id), []))
+        self._relation_secrets_changed = self._relation_secrets_changed or bool(secret_ids)
+        # Secrets created before the ledger was kept, as referred to by the databag
+        try:
+            databag = relation.data[self.local_app]
+            for label in set(SECRET_LABEL_MAP.values()):
+                if (secret_id := databag.get(f"secret-{label}")) and secret_id not in shared_ids:
+                    secret_ids.add(secret_id)
+        except ModelError as e:
+            logger.debug("Relation %s databag unavailable: %s", relation.id, e)
+
+        for secret_id in secret_ids:
+            removed += self._remove_secret(secret_id)
+        self.secrets.pop(relation.id, None)
+        return removed
+
+    def _on_update_status(self, _) -> None:
+        if not self._context.is_leader or not self.secrets_enabled:
+            return
+        if removed := self.sweep_orphaned_secrets():
+            logger.info("Removed %s orphaned secrets of %s relations", removed, self.relation_name)
+
+    @leader_only
+    @juju_secrets_only
+    def sweep_orphaned_secrets(self, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+        """Remove the secrets left behind by relations gone, at most `batch_size` of them.
+
+        The secrets recorded for relations that are gone, and the shared secrets only these
+        referred to, are removed one after the other. Called on `update-status`: charms with
+        many relations broken at once get rid of their secrets over a few hooks, rather than
+        in a single one. A secret is only dropped from the records once removed (or found
+        gone already): those failing to be removed are logged, and retried by the next sweep.
+
+        Returns:
+            the number of secrets removed (0 once no orphan is left).
+        """
+        live = {relation.id for relation in self.charm.model.relations[self.relation_name]}
+        removed = 0
+        orphans = self._ledger_orphans(live, batch_size)
+        for secret_id in orphans:
+            if (result := self._sweep_secret(secret_id)) is not None:
+                self._forget_relation_secret(secret_id)
+                removed += result
+
+        registry = self._load_shared_secrets()
+        registry_changed = self._drop_gone_relations(registry, live)
+        shared_orphans = [key for key, entry in registry.items() if not entry["relations"]]
+        for key in shared_orphans[: batch_size - len(orphans)]:
+            if (result := self._sweep_secret(registry[key]["id"])) is not None:
+                del registry[key]
+                registry_changed = True
+                removed += result
+        if registry_changed:
+            self._save_shared_secrets(registry)
+        return removed
+
+    def _ledger_orphans(self, live: Set[int], limit: int) -> List[str]:
+        """IDs of (at most `limit`) secrets recorded for relations that are gone."""
+        ledger = self._relation_secrets()
+        orphans = [
+            secret_id
+            for relation_id, secret_ids in ledger.items()
+            if int(relation_id) not in live
+            for secret_id in secret_ids
+        ]
+        return orphans[:limit]
+
+    @staticmethod
+    def _drop_gone_relations(registry: Dict[str, dict], live: Set[int]) -> bool:
+        """Drop the relations gone from the shared secrets registry, tell if any was."""
+        changed = False
+        for entry in registry.values():
+            relations = [relation_id for relation_id in entry["relations"] if relation_id in live]
+            if relations != entry["relations"]:
+                entry["relations"] = relations
+                changed = True
+        return changed
+
+    def _sweep_secret(self, secret_id: str) -> Optional[int]:
+        """Remove an orphaned secret: 1 if removed, 0 if gone already, None if that failed."""
+        try:
+            return self._remove_secret(secret_id)
+        except ModelError as e:
+            logger.error("Failed to remove orphaned secret %s: %s", secret_id, e)
+            return None
+
     def set_credentials(self, relation_id: int, username: str, password: str) -> None:
         """Set credentials.
 
@@ -755,6 +1812,9 @@ class DataRequires(DataRelation):
 
     SECRET_FIELDS = ["username", "password", "tls", "tls-ca", "endpoints", "uris"]
 
+    # Custom events emitted on relation data changes
+    EVENT_TRIGGERS: List[EventTrigger] = []
+
     def __init__(
         self,
         charm,
@@ -776,11 +1836,12 @@ class DataRequires(DataRelation):
 
     def _on_relation_created_event(self, event: RelationCreatedEvent) -> None:
         """Event emitted when the relation is created."""
-        if not self.local_unit.is_leader():
+        if not self._context.is_leader:
             return
 
         if self.secrets_enabled:
             event.relation.data[self.charm.app]["secret_fields"] = " ".join(self.SECRET_FIELDS)
+            event.relation.data[self.charm.app][SECRET_CODECS_FIELD] = " ".join(SECRET_CODECS)
 
     def _diff(self, event: RelationChangedEvent) -> Diff:
         """Retrieves the diff of the data in the relation changed databag.
@@ -794,6 +1855,57 @@ class DataRequires(DataRelation):
         """
         return diff(event, self.local_unit)
 
+    @classmethod
+    def _compiled_event_triggers(cls) -> Tuple[frozenset, List[EventTrigger]]:
+        """Compile the class' `EVENT_TRIGGERS` into sets, once per class.
+
+        Returns:
+            all keys watched by the triggers, and the triggers in order of priority.
+        """
+        if "_event_triggers" not in cls.__dict__:
+            triggers = [
+                trigger._replace(
+                    added=frozenset(trigger.added),
+                    changed=frozenset(trigger.changed),
+                    added_all=frozenset(trigger.added_all),
+                )
+                for trigger in sorted(cls.EVENT_TRIGGERS, key=lambda trigger: trigger.priority)
+            ]
+            watched = frozenset().union(
+                *(trigger.added | trigger.changed | trigger.added_all for trigger in triggers)
+            )
+            cls._event_triggers = (watched, triggers)
+        return cls._event_triggers
+
+    def _emit_diff_event(self, event: RelationChangedEvent, event_name: str) -> None:
+        """Emit a custom event triggered by relation data changes."""
+        getattr(self.on, event_name).emit(event.relation, app=event.app, unit=event.unit)
+
+    def _on_relation_changed_event(self, event: RelationChangedEvent) -> None:
+        """Event emitted when the relation has changed.
+
+        Custom events are emitted according to `EVENT_TRIGGERS`, in a single pass on the diff.
+        """
+        # Check which data has changed to emit customs events.
+        diff = self._diff(event)
+
+        watched, triggers = self._compiled_event_triggers()
+        added = watched.intersection(diff.added)
+        changed = watched.intersection(diff.changed)
+        if not added and not changed:
+            return
+
+        for trigger in triggers:
+            if (
+                not trigger.added.isdisjoint(added)
+                or not trigger.changed.isdisjoint(changed)
+                or (trigger.added_all and trigger.added_all <= added)
+            ):
+                logger.info("%s at %s", trigger.event, datetime.now())
+                self._emit_diff_event(event, trigger.event)
+                if trigger.final:
+                    return
+
     @juju_secrets_only
     def _get_relation_secret(
         self, relation_id: int, label: str, relation_name: Optional[str] = None
@@ -829,10 +1941,8 @@ class DataRequires(DataRelation):
 
             label_sorted_content = self._create_label_sorted_content(fields)
             for label in label_sorted_content:
-                if (secret := self._get_relation_secret(relation_id, label)) and (
-                    secret_data := secret.get_content()
-                ):
-                    result.update({k: v for k, v in secret_data.items() if k in secret_fields})
+                if secret := self._get_relation_secret(relation_id, label):
+                    result.update(secret.get_fields(list(secret_fields)))
 
         result.update(
             {
@@ -923,25 +2033,18 @@ class AuthenticationEvent(RelationEvent):
 
     @property
     def _jujuversion(self) -> JujuVersion:
-        """Caching jujuversion to avoid a Juju call on each field evaluation.
+        """Juju version, probed once per dispatch (shared with the library objects)."""
+        return DispatchContext.of(self.framework.model).juju_version
 
-        DON'T USE the encapsulated helper variable outside of this function
-        """
-        if not hasattr(self, "_cached_jujuversion"):
-            self._cached_jujuversion = None
-        if not self._cached_jujuversion:
-            self._cached_jujuversion = JujuVersion.from_environ()
-        return self._cached_jujuversion
-
-    def _get_secret(self, label) -> Optional[Dict[str, str]]:
-        """Retrieveing secrets."""
+    def _get_secret(self, label) -> Optional[SecretContent]:
+        """Retrieve secrets (decoding only the fields accessed)."""
         if not self.app:
             return
         if not self._secrets.get(label):
             self._secrets[label] = None
             if secret_uri := self.relation.data[self.app].get(f"secret-{label}"):
                 secret = self.framework.model.get_secret(id=secret_uri)
-                self._secrets[label] = secret.get_content()
+                self._secrets[label] = SecretContent(secret.get_content())
         return self._secrets[label]
 
     @property
@@ -1002,6 +2105,161 @@ class AuthenticationEvent(RelationEvent):
         return self.relation.data[self.relation.app].get("tls-ca")
 
 
+# Credentials rotation
+
+
+class CredentialsRotationRequestedEvent(RelationEvent):
+    """Event emitted when the credentials of a relation are due for rotation.
+
+    Handlers are expected to generate new credentials and set them using
+    `DataProvides.set_credentials()` within the same hook.
+    """
+
+
+class CredentialsRotationEvents(CharmEvents):
+    """Credentials rotation events.
+
+    This class defines the events that the credentials rotation can emit.
+    """
+
+    credentials_rotation_requested = EventSource(CredentialsRotationRequestedEvent)
+
+
+class CredentialsRotation(Object):
+    """Rolling rotation of the credentials of all relations of a provider endpoint.
+
+    Relations are rotated in waves of at most `wave_size` relations, with at least
+    `wave_interval` seconds between two waves, so that clients don't all reconnect at once
+    and a single hook doesn't have to rotate all credentials. Progress is kept in the
+    leader's peer databag, thus a rotation interrupted by a failing hook resumes from the
+    last completed wave.
+
+    Waves are run by `start()`, then on `update-status` and `secret-rotate` events.
+    `wave_interval` is only the minimum gap between two waves: update-status runs coming
+    sooner than that are skipped, so the update-status interval (`update-status-hook-interval`)
+    sets the actual pace, when longer.
+
+    With a `rotation_policy`, the credentials secrets created from then on are rotated by
+    Juju: on `secret-rotate`, the relation a secret belongs to is scheduled for rotation
+    (see `start()`).
+    """
+
+    on = CredentialsRotationEvents()  # pyright: ignore [reportGeneralTypeIssues]
+
+    def __init__(
+        self,
+        charm: CharmBase,
+        provides: DataProvides,
+        peer_relation_name: str,
+        wave_size: int = 10,
+        wave_interval: int = 60,
+        rotation_policy: Optional[SecretRotate] = None,
+    ) -> None:
+        super().__init__(charm, f"{provides.relation_name}-credentials-rotation")
+        self.charm = charm
+        self.provides = provides
+        self.peer_relation_name = peer_relation_name
+        self.wave_size = wave_size
+        self.wave_interval = wave_interval
+        if rotation_policy:
+            provides.secret_rotation[SECRET_LABEL_MAP["password"]] = rotation_policy
+        self.framework.observe(charm.on.update_status, self._on_update_status)
+        self.framework.observe(charm.on.secret_rotate, self._on_secret_rotate)
+
+    @property
+    def _context(self) -> DispatchContext:
+        return DispatchContext.of(self.model)
+
+    @property
+    def _state_key(self) -> str:
+        return f"{self.provides.relation_name}-credentials-rotation"
+
+    @property
+    def _databag(self) -> Optional[RelationDataContent]:
+        peer_relation = self._context.relation(self.peer_relation_name)
+        if not peer_relation:
+            return
+        return peer_relation.data[self.charm.app]
+
+    def _load_state(self) -> dict:
+        if self._databag is None:
+            return {}
+        return json.loads(self._databag.get(self._state_key, "{}"))
+
+    def _save_state(self, state: dict) -> None:
+        if self._databag is None:
+            logger.error("Peer relation %s unavailable", self.peer_relation_name)
+            return
+        if state.get("pending"):
+            self._databag[self._state_key] = json.dumps(state)
+        elif self._state_key in self._databag:
+            del self._databag[self._state_key]
+
+    @property
+    def pending(self) -> List[int]:
+        """IDs of the relations still waiting for their credentials to be rotated."""
+        return self._load_state().get("pending", [])
+
+    @property
+    def in_progress(self) -> bool:
+        """Whether a rotation is ongoing."""
+        return bool(self.pending)
+
+    def start(self, relation_ids: Optional[List[int]] = None) -> None:
+        """Schedule the rotation of the credentials of the given (default: all) relations.
+
+        Relations already scheduled keep their place. The next wave is run right away, unless
+        the previous one was less than `wave_interval` seconds ago.
+        """
+        if not self._context.is_leader:
+            return
+
+        if relation_ids is None:
+            relation_ids = [relation.id for relation in self.provides.relations]
+
+        state = self._load_state()
+        pending = state.setdefault("pending", [])
+        pending.extend(relation_id for relation_id in relation_ids if relation_id not in pending)
+        self._run_wave(state)
+
+    def _run_wave(self, state: dict) -> None:
+        """Rotate credentials for the next wave of relations if it's due."""
+        now = datetime.now().timestamp()
+        if not state.get("pending") or now - state.get("last-wave", 0) < self.wave_interval:
+            self._save_state(state)
+            return
+
+        active = {relation.id: relation for relation in self.provides.relations}
+        wave = state["pending"][: self.wave_size]
+        state["pending"] = state["pending"][self.wave_size :]
+        for relation_id in wave:
+            if relation := active.get(relation_id):
+                logger.info("Rotating credentials for relation %s", relation_id)
+                self.on.credentials_rotation_requested.emit(relation, app=relation.app)
+
+        state["last-wave"] = now
+        self._save_state(state)
+        logger.info("Credentials rotation: %s relations remaining", len(state["pending"]))
+
+    def _on_update_status(self, _) -> None:
+        if not self._context.is_leader:
+            return
+        self._run_wave(self._load_state())
+
+    def _on_secret_rotate(self, event: SecretRotateEvent) -> None:
+        """Schedule the rotation of the relation that the credentials secret belongs to."""
+        if not self._context.is_leader or not event.secret.id:
+            return
+
+        secret_id = event.secret.id.split("/")[-1].split(":")[-1]
+        label = SECRET_LABEL_MAP["password"]
+        for relation in self.provides.relations:
+            relation_secret = relation.data[self.charm.app].get(f"secret-{label}", "")
+            if relation_secret.split("/")[-1].split(":")[-1] == secret_id:
+                self.start([relation.id])
+                return
+
+
 # Database related events and fields
 
 
@@ -1130,13 +2388,19 @@ class DatabaseProvides(DataProvides):
 
     on = DatabaseProvidesEvents()  # pyright: ignore [reportGeneralTypeIssues]
 
-    def __init__(self, charm: CharmBase, relation_name: str) -> None:
-        super().__init__(charm, relation_name)
+    def __init__(
+        self,
+        charm: CharmBase,
+        relation_name: str,
+        shared_secret_labels: Optional[List[str]] = None,
+        peer_relation_name: Optional[str] = None,
+    ) -> None:
+        super().__init__(charm, relation_name, shared_secret_labels, peer_relation_name)
 
     def _on_relation_changed_event(self, event: RelationChangedEvent) -> None:
         """Event emitted when the relation has changed."""
         # Leader only
-        if not self.local_unit.is_leader():
+        if not self._context.is_leader:
             return
         # Check which data has changed to emit customs events.
         diff = self._diff(event)
@@ -1225,6 +2489,30 @@ class DatabaseRequires(DataRequires):
 
     on = DatabaseRequiresEvents()  # pyright: ignore [reportGeneralTypeIssues]
 
+    EVENT_TRIGGERS = [
+        # Database created: the database charm shared the credentials
+        EventTrigger(
+            "database_created",
+            0,
+            added=["secret-user"],
+            added_all=["username", "password"],
+            final=True,
+        ),
+        EventTrigger(
+            "endpoints_changed",
+            1,
+            added=["endpoints", "secret-endpoints"],
+            changed=["endpoints", "secret-endpoints-revision"],
+            final=True,
+        ),
+        EventTrigger(
+            "read_only_endpoints_changed",
+            2,
+            added=["read-only-endpoints"],
+            changed=["read-only-endpoints"],
+        ),
+    ]
+
     def __init__(
         self,
         charm,
@@ -1237,6 +2525,10 @@ class DatabaseRequires(DataRequires):
         super().__init__(charm, relation_name, extra_user_roles)
         self.database = database_name
         self.relations_aliases = relations_aliases
+        self._relation_aliases_index = None
+        self._postgresql_connections = {}
+        self._postgresql_plugins = {}
+        self.framework.observe(self.framework.on.commit, self._on_commit)
 
         # Define custom event names for each alias.
         if relations_aliases:
@@ -1273,22 +2565,26 @@ class DatabaseRequires(DataRequires):
 
         # Return if an alias was already assigned to this relation
         # (like when there are more than one unit joining the relation).
-        relation = self.charm.model.get_relation(self.relation_name, relation_id)
-        if relation and relation.data[self.local_unit].get("alias"):
+        if relation_id in self._relation_aliases:
             return
 
         # Retrieve the available aliases (the ones that weren't assigned to any relation).
-        available_aliases = self.relations_aliases[:]
-        for relation in self.charm.model.relations[self.relation_name]:
-            alias = relation.data[self.local_unit].get("alias")
-            if alias:
-                logger.debug("Alias %s was already assigned to relation %d", alias, relation.id)
-                available_aliases.remove(alias)
+        assigned_aliases = set(self._relation_aliases.values())
+        logger.debug("Aliases already assigned to relations: %s", self._relation_aliases)
+        available_aliases = [
+            alias for alias in self.relations_aliases if alias not in assigned_aliases
+        ]
 
         # Set the alias in the unit relation databag of the specific relation.
         relation = self.charm.model.get_relation(self.relation_name, relation_id)
         if relation:
             relation.data[self.local_unit].update({"alias": available_aliases[0]})
+            self._relation_aliases[relation_id] = available_aliases[0]
+
+    def _emit_diff_event(self, event: RelationChangedEvent, event_name: str) -> None:
+        """Emit both the default event and the aliased event (if any)."""
+        super()._emit_diff_event(event, event_name)
+        self._emit_aliased_event(event, event_name)
 
     def _emit_aliased_event(self, event: RelationChangedEvent, event_name: str) -> None:
         """Emit an aliased event to a particular relation if it has an alias.
@@ -1312,57 +2608,126 @@ class DatabaseRequires(DataRequires):
         Returns:
             the relation alias or None if the relation was not found.
         """
-        for relation in self.charm.model.relations[self.relation_name]:
-            if relation.id == relation_id:
-                return relation.data[self.local_unit].get("alias")
-        return None
+        if not self.relations_aliases:
+            return None
+        return self._relation_aliases.get(relation_id)
 
-    def is_postgresql_plugin_enabled(self, plugin: str, relation_index: int = 0) -> bool:
-        """Returns whether a plugin is enabled in the database.
+    @property
+    def _relation_aliases(self) -> Dict[int, str]:
+        """Aliases assigned to the relations, indexed by relation ID.
+
+        The index is built on first use in a single pass over the relations,
+        and kept up to date (by alias assignment) for the rest of the dispatch.
+        """
+        if self._relation_aliases_index is None:
+            self._relation_aliases_index = {}
+            for relation in self.charm.model.relations[self.relation_name]:
+                if alias := relation.data[self.local_unit].get("alias"):
+                    self._relation_aliases_index[relation.id] = alias
+        return self._relation_aliases_index
+
+    def _credentials_revision(self, relation: Relation) -> Optional[str]:
+        """Identify the current credentials of a relation, to be used as a cache key."""
+        if revision := relation.data[relation.app].get("secret-user-revision"):
+            return revision
+
+        content = self.get_relation_fields(relation.id, ["username", "password"])
+        return hashlib.sha256(
+            f"{content.get('username')}:{content.get('password')}".encode()
+        ).hexdigest()
+
+    def _get_postgresql_connection(self, key: tuple, relation_id: int, host: str):
+        """Connect to the database, the connection being kept open for the rest of the dispatch."""
+        # Psycopg 3 is imported locally to avoid the need of its package installation
+        # when relating to a database charm other than PostgreSQL.
+        import psycopg
+
+        if key not in self._postgresql_connections:
+            content = self.get_relation_fields(relation_id, ["username", "password"])
+            connection_string = (
+                f"host='{host}' dbname='{self.database}' "
+                f"user='{content.get('username')}' password='{content.get('password')}'"
+            )
+            self._postgresql_connections[key] = psycopg.connect(
+                connection_string, autocommit=True
+            )
+        return self._postgresql_connections[key]
+
+    def _on_commit(self, _) -> None:
+        """Close the connections opened during the dispatch."""
+        for connection in self._postgresql_connections.values():
+            connection.close()
+        self._postgresql_connections.clear()
+
+    def get_enabled_plugins(self, plugins: List[str], relation_index: int = 0) -> Dict[str, bool]:
+        """Return which of the plugins are enabled in the database.
+
+        All plugins are checked with a single query, on a connection reused until the end of
+        the dispatch. Results are cached for the relation, endpoint and credentials revision,
+        thus checking the same plugin again in the same dispatch doesn't hit the database.
 
         Args:
-            plugin: name of the plugin to check.
+            plugins: names of the plugins to check.
             relation_index: optional relation index to check the database
                 (default: 0 - first relation).
 
+        Returns:
+            whether each plugin is enabled, indexed by plugin name.
+
         PostgreSQL only.
         """
-        # Psycopg 3 is imported locally to avoid the need of its package installation
-        # when relating to a database charm other than PostgreSQL.
         import psycopg
 
+        result = dict.fromkeys(plugins, False)
+
         # Return False if no relation is established.
         if len(self.relations) == 0:
-            return False
+            return result
 
-        relation_id = self.relations[relation_index].id
-        host = self.get_relation_field(relation_id, "endpoints")
+        relation = self.relations[relation_index]
+        host = self.get_relation_field(relation.id, "endpoints")
 
         # Return False if there is no endpoint available.
         if host is None:
-            return False
+            return result
 
         host = host.split(":")[0]
+        key = (relation.id, host, self._credentials_revision(relation))
+        cached = self._postgresql_plugins.setdefault(key, {})
 
-        content = self.get_relation_fields(relation_id, ["username", "password"])
-        user = content.get("username")
-        password = content.get("password")
-
-        connection_string = (
-            f"host='{host}' dbname='{self.database}' user='{user}' password='{password}'"
-        )
-        try:
-            with psycopg.connect(connection_string) as connection:
+        if missing := [plugin for plugin in plugins if plugin not in cached]:
+            try:
+                connection = self._get_postgresql_connection(key, relation.id, host)
                 with connection.cursor() as cursor:
                     cursor.execute(
-                        "SELECT TRUE FROM pg_extension WHERE extname=%s::text;", (plugin,)
+                        "SELECT extname FROM pg_extension WHERE extname = ANY(%s::text[]);",
+                        (missing,),
                     )
-                    return cursor.fetchone() is not None
-        except psycopg.Error as e:
-            logger.exception(
-                f"failed to check whether {plugin} plugin is enabled in the database: %s", str(e)
-            )
-            return False
+                    enabled = {row[0] for row in cursor.fetchall()}
+            except psycopg.Error as e:
+                logger.exception(
+                    f"failed to check whether {missing} plugins are enabled in the database: %s",
+                    str(e),
+                )
+                if connection := self._postgresql_connections.pop(key, None):
+                    connection.close()
+                return result
+            cached.update({plugin: plugin in enabled for plugin in missing})
+
+        result.update({plugin: cached[plugin] for plugin in plugins})
+        return result
+
+    def is_postgresql_plugin_enabled(self, plugin: str, relation_index: int = 0) -> bool:
+        """Returns whether a plugin is enabled in the database.
+
+        Args:
+            plugin: name of the plugin to check.
+            relation_index: optional relation index to check the database
+                (default: 0 - first relation).
+
+        PostgreSQL only.
+        """
+        return self.get_enabled_plugins([plugin], relation_index)[plugin]
 
     def _on_relation_created_event(self, event: RelationCreatedEvent) -> None:
         """Event emitted when the database relation is created."""
@@ -1384,61 +2749,6 @@ class DatabaseRequires(DataRequires):
         else:
             self._update_relation_data(event.relation.id, {"database": self.database})
 
-    def _on_relation_changed_event(self, event: RelationChangedEvent) -> None:
-        """Event emitted when the database relation has changed."""
-        # Check which data has changed to emit customs events.
-        diff = self._diff(event)
-
-        # Check if the database is created
-        # (the database charm shared the credentials).
-
-        if ("username" in diff.added and "password" in diff.added) or "secret-user" in diff.added:
-            # Emit the default event (the one without an alias).
-            logger.info("database created at %s", datetime.now())
-            getattr(self.on, "database_created").emit(
-                event.relation, app=event.app, unit=event.unit
-            )
-
-            # Emit the aliased event (if any).
-            self._emit_aliased_event(event, "database_created")
-
-            # To avoid unnecessary application restarts do not trigger
-            # “endpoints_changed“ event if “database_created“ is triggered.
-            return
-
-        # Emit an endpoints changed event if the database
-        # added or changed this info in the relation databag.
-        if (
-            "endpoints" in diff.added
-            or "endpoints" in diff.changed
-            or "secret-endpoints" in diff.added
-            or "secret-endpoints-revision" in diff.changed
-        ):
-            # Emit the default event (the one without an alias).
-            logger.info("endpoints changed on %s", datetime.now())
-            getattr(self.on, "endpoints_changed").emit(
-                event.relation, app=event.app, unit=event.unit
-            )
-
-            # Emit the aliased event (if any).
-            self._emit_aliased_event(event, "endpoints_changed")
-
-            # To avoid unnecessary application restarts do not trigger
-            # “read_only_endpoints_changed“ event if “endpoints_changed“ is triggered.
-            return
-
-        # Emit a read only endpoints changed event if the database
-        # added or changed this info in the relation databag.
-        if "read-only-endpoints" in diff.added or "read-only-endpoints" in diff.changed:
-            # Emit the default event (the one without an alias).
-            logger.info("read-only-endpoints changed on %s", datetime.now())
-            getattr(self.on, "read_only_endpoints_changed").emit(
-                event.relation, app=event.app, unit=event.unit
-            )
-
-            # Emit the aliased event (if any).
-            self._emit_aliased_event(event, "read_only_endpoints_changed")
-
 
 # Kafka related events
 
@@ -1538,13 +2848,19 @@ class KafkaProvides(DataProvides):
 
     on = KafkaProvidesEvents()  # pyright: ignore [reportGeneralTypeIssues]
 
-    def __init__(self, charm: CharmBase, relation_name: str) -> None:
-        super().__init__(charm, relation_name)
+    def __init__(
+        self,
+        charm: CharmBase,
+        relation_name: str,
+        shared_secret_labels: Optional[List[str]] = None,
+        peer_relation_name: Optional[str] = None,
+    ) -> None:
+        super().__init__(charm, relation_name, shared_secret_labels, peer_relation_name)
 
     def _on_relation_changed_event(self, event: RelationChangedEvent) -> None:
         """Event emitted when the relation has changed."""
         # Leader only
-        if not self.local_unit.is_leader():
+        if not self._context.is_leader:
             return
 
         # Check which data has changed to emit customs events.
@@ -1599,6 +2915,24 @@ class KafkaRequires(DataRequires):
 
     on = KafkaRequiresEvents()  # pyright: ignore [reportGeneralTypeIssues]
 
+    EVENT_TRIGGERS = [
+        # Topic created: the Kafka charm shared the credentials
+        EventTrigger(
+            "topic_created",
+            0,
+            added=["secret-user"],
+            added_all=["username", "password"],
+            final=True,
+        ),
+        EventTrigger(
+            "bootstrap_server_changed",
+            1,
+            added=["endpoints", "secret-endpoints"],
+            changed=["endpoints", "secret-endpoints-revision"],
+            final=True,
+        ),
+    ]
+
     def __init__(
         self,
         charm,
@@ -1638,38 +2972,6 @@ class KafkaRequires(DataRequires):
 
         self._update_relation_data(event.relation.id, relation_data)
 
-    def _on_relation_changed_event(self, event: RelationChangedEvent) -> None:
-        """Event emitted when the Kafka relation has changed."""
-        # Check which data has changed to emit customs events.
-        diff = self._diff(event)
-
-        # Check if the topic is created
-        # (the Kafka charm shared the credentials).
-
-        if ("username" in diff.added and "password" in diff.added) or "secret-user" in diff.added:
-            # Emit the default event (the one without an alias).
-            logger.info("topic created at %s", datetime.now())
-            getattr(self.on, "topic_created").emit(event.relation, app=event.app, unit=event.unit)
-
-            # To avoid unnecessary application restarts do not trigger
-            # “endpoints_changed“ event if “topic_created“ is triggered.
-            return
-
-        # Emit an endpoints (bootstrap-server) changed event if the Kafka endpoints
-        # added or changed this info in the relation databag.
-        if (
-            "endpoints" in diff.added
-            or "endpoints" in diff.changed
-            or "secret-endpoints" in diff.added
-            or "secret-endpoints-revision" in diff.changed
-        ):
-            # Emit the default event (the one without an alias).
-            logger.info("endpoints changed on %s", datetime.now())
-            getattr(self.on, "bootstrap_server_changed").emit(
-                event.relation, app=event.app, unit=event.unit
-            )  # here check if this is the right design
-            return
-
 
 # Opensearch related events
 
@@ -1726,13 +3028,19 @@ class OpenSearchProvides(DataProvides):
 
     on = OpenSearchProvidesEvents()  # pyright: ignore[reportGeneralTypeIssues]
 
-    def __init__(self, charm: CharmBase, relation_name: str) -> None:
-        super().__init__(charm, relation_name)
+    def __init__(
+        self,
+        charm: CharmBase,
+        relation_name: str,
+        shared_secret_labels: Optional[List[str]] = None,
+        peer_relation_name: Optional[str] = None,
+    ) -> None:
+        super().__init__(charm, relation_name, shared_secret_labels, peer_relation_name)
 
     def _on_relation_changed_event(self, event: RelationChangedEvent) -> None:
         """Event emitted when the relation has changed."""
         # Leader only
-        if not self.local_unit.is_leader():
+        if not self._context.is_leader:
             return
         # Check which data has changed to emit customs events.
         diff = self._diff(event)
@@ -1779,6 +3087,37 @@ class OpenSearchRequires(DataRequires):
 
     on = OpenSearchRequiresEvents()  # pyright: ignore[reportGeneralTypeIssues]
 
+    EVENT_TRIGGERS = [
+        EventTrigger(
+            "authentication_updated",
+            0,
+            added=["username", "password", "tls", "tls-ca", "secret-user", "secret-tls"],
+            changed=[
+                "username",
+                "password",
+                "tls",
+                "tls-ca",
+                "secret-user-revision",
+                "secret-tls-revision",
+            ],
+        ),
+        # Index created: the OpenSearch charm shared the credentials
+        EventTrigger(
+            "index_created",
+            1,
+            added=["secret-user"],
+            added_all=["username", "password"],
+            final=True,
+        ),
+        EventTrigger(
+            "endpoints_changed",
+            2,
+            added=["endpoints", "secret-endpoints"],
+            changed=["endpoints", "secret-endpoints-revision"],
+            final=True,
+        ),
+    ]
+
     def __init__(
         self, charm, relation_name: str, index: str, extra_user_roles: Optional[str] = None
     ):
@@ -1798,45 +3137,3 @@ class OpenSearchRequires(DataRequires):
             data["extra-user-roles"] = self.extra_user_roles
 
         self._update_relation_data(event.relation.id, data)
-
-    def _on_relation_changed_event(self, event: RelationChangedEvent) -> None:
-        """Event emitted when the OpenSearch relation has changed.
-
-        This event triggers individual custom events depending on the changing relation.
-        """
-        # Check which data has changed to emit customs events.
-        diff = self._diff(event)
-
-        # Check if authentication has updated, emit event if so
-        updates = {"username", "password", "tls", "tls-ca", "secret-user", "secret-tls"}
-        if len(set(diff._asdict().keys()) - updates) < len(diff):
-            logger.info("authentication updated at: %s", datetime.now())
-            getattr(self.on, "authentication_updated").emit(
-                event.relation, app=event.app, unit=event.unit
-            )
-
-        # Check if the index is created
-        # (the OpenSearch charm shares the credentials).
-        if ("username" in diff.added and "password" in diff.added) or "secret-user" in diff.added:
-            # Emit the default event (the one without an alias).
-            logger.info("index created at: %s", datetime.now())
-            getattr(self.on, "index_created").emit(event.relation, app=event.app, unit=event.unit)
-
-            # To avoid unnecessary application restarts do not trigger
-            # “endpoints_changed“ event if “index_created“ is triggered.
-            return
-
-        # Emit a endpoints changed event if the OpenSearch application added or changed this info
-        # in the relation databag.
-        if (
-            "endpoints" in diff.added
-            or "endpoints" in diff.changed
-            or "secret-endpoints" in diff.added
-            or "secret-endpoints-revision" in diff.changed
-        ):
-            # Emit the default event (the one without an alias).
-            logger.info("endpoints changed on %s", datetime.now())
-            getattr(self.on, "endpoints_changed").emit(
-                event.relation, app=event.app, unit=event.unit
-            )  # here check if this is the right design
-            return
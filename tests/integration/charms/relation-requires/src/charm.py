@@ -10,7 +10,7 @@ of the libraries in this repository.
 
 import logging
 
-from ops.charm import CharmBase
+from ops.charm import ActionEvent, CharmBase
 from ops.main import main
 from ops.model import ActiveStatus
 
@@ -19,8 +19,11 @@ from charms.data_platform_libs.v0.data_interfaces import (
     DatabaseEndpointsChangedEvent,
     DatabaseRequires,
 )
+from hook_stats import HookToolStats
+from secret_log import SecretLogger
 
 logger = logging.getLogger(__name__)
+secret_log = SecretLogger(logger)
 
 # Extra roles that this application needs when interacting with the database.
 EXTRA_USER_ROLES = "SUPERUSER"
@@ -34,6 +37,7 @@ class ApplicationCharm(CharmBase):
 
     def __init__(self, *args):
         super().__init__(*args)
+        self.hook_stats = HookToolStats(self)
 
         # Default charm events.
         self.framework.observe(self.on.start, self._on_start)
@@ -50,6 +54,9 @@ class ApplicationCharm(CharmBase):
         self.framework.observe(
             self.database.on.endpoints_changed, self._on_database_endpoints_changed
         )
+        self.framework.observe(
+            self.on.get_plugin_status_action, self._on_get_plugin_status_action
+        )
 
     def _on_start(self, _) -> None:
         """Only sets an Active status."""
@@ -58,12 +65,29 @@ class ApplicationCharm(CharmBase):
     def _on_database_created(self, event: DatabaseCreatedEvent) -> None:
         """Event triggered when a database was created for this application."""
         # Retrieve the credentials using the charm library.
-        logger.info(f"Database credentials: {event.username} {event.password}")
+        secret_log.secret(
+            "received",
+            f"credentials of relation {event.relation.id}",
+            {"username": event.username, "password": event.password},
+        )
         self.unit.status = ActiveStatus("received database credentials of the database")
 
     def _on_database_endpoints_changed(self, event: DatabaseEndpointsChangedEvent) -> None:
         """Event triggered when the read/write endpoints of the database change."""
-        logger.info(f"Database endpoints have been changed to: {event.endpoints}")
+        secret_log.secret(
+            "changed", f"endpoints of relation {event.relation.id}", {"endpoints": event.endpoints}
+        )
+
+    def _on_get_plugin_status_action(self, event: ActionEvent) -> None:
+        """Check whether the requested (comma separated) plugins are enabled."""
+        plugins = [plugin for plugin in event.params.get("plugin", "").split(",") if plugin]
+        status = self.database.get_enabled_plugins(plugins)
+        event.set_results(
+            {
+                "enabled": ",".join(plugin for plugin in plugins if status[plugin]),
+                "disabled": ",".join(plugin for plugin in plugins if not status[plugin]),
+            }
+        )
 
 
 if __name__ == "__main__":
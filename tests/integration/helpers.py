@@ -0,0 +1,109 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Driving actions concurrently across the units of an application."""
+
+import asyncio
+import json
+import math
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pytest_operator.plugin import OpsTest
+
+
+def percentile(latencies: List[float], percent: int) -> float:
+    """Nearest-rank percentile of sorted latencies."""
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies) - 1, math.ceil(len(latencies) * percent / 100) - 1)]
+
+
+class ActionDriver:
+    """Running actions on the units of an application, with a bounded concurrency.
+
+    The latency of each action executed is recorded (per action name).
+    """
+
+    def __init__(self, ops_test: OpsTest, app_name: str, concurrency: int = 10):
+        self.ops_test = ops_test
+        self.app_name = app_name
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+
+    @property
+    def units(self) -> List[str]:
+        """Names of the units of the application."""
+        return sorted(unit.name for unit in self.ops_test.model.applications[self.app_name].units)
+
+    async def leader(self) -> Optional[str]:
+        """Name of the leader unit."""
+        for unit in self.ops_test.model.applications[self.app_name].units:
+            if await unit.is_leader_from_status():
+                return unit.name
+
+    async def run(self, unit_name: str, action: str, params: Optional[dict] = None) -> Dict:
+        """Execute an action on a unit, once a concurrency slot is available."""
+        async with self._semaphore:
+            start = time.monotonic()
+            unit = self.ops_test.model.units.get(unit_name)
+            execution = await unit.run_action(action, **(params or {}))
+            execution = await execution.wait()
+            self.latencies[action].append(time.monotonic() - start)
+        return execution.results
+
+    async def run_all(self, calls: Iterable[Tuple[str, str, Optional[dict]]]) -> List[Dict]:
+        """Execute (unit, action, params) calls concurrently."""
+        return await asyncio.gather(*(self.run(*call) for call in calls))
+
+    async def run_on_units(
+        self, action: str, params: Optional[dict] = None, units: Optional[List[str]] = None
+    ) -> Dict[str, Dict]:
+        """Execute an action on all (or the listed) units concurrently."""
+        units = units or self.units
+        results = await self.run_all((unit, action, params) for unit in units)
+        return dict(zip(units, results))
+
+    async def converge(
+        self,
+        action: str,
+        expected: Callable[[Dict], bool],
+        params: Optional[dict] = None,
+        timeout: float = 120,
+        interval: float = 1,
+    ) -> float:
+        """Seconds until the results of an action are as expected on all units."""
+        start = time.monotonic()
+        pending = self.units
+        while True:
+            results = await self.run_on_units(action, params, pending)
+            pending = [unit for unit, result in results.items() if not expected(result)]
+            elapsed = time.monotonic() - start
+            if not pending:
+                return elapsed
+            if elapsed > timeout:
+                raise TimeoutError(f"{action} results not converged on {pending}")
+            await asyncio.sleep(interval)
+
+    def latency_report(self) -> Dict[str, Dict[str, float]]:
+        """Compute the number and latency percentiles (seconds) of the actions executed, per action."""
+        report = {}
+        for action, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            report[action] = {
+                "count": len(latencies),
+                **{f"p{percent}": percentile(latencies, percent) for percent in (50, 90, 99)},
+                "max": latencies[-1],
+            }
+        return report
+
+
+async def secret_revisions(ops_test: OpsTest, app_name: str) -> Dict[str, int]:
+    """Latest revision of the secrets owned by an application, according to the controller."""
+    _, stdout, _ = await ops_test.juju("secrets", "--format", "json")
+    return {
+        secret_id: secret["revision"]
+        for secret_id, secret in json.loads(stdout or "{}").items()
+        if secret.get("owner") == app_name
+    }
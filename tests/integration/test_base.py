@@ -3,12 +3,15 @@
 # See LICENSE file for licensing details.
 
 import asyncio
+import hashlib
+import json
 import logging
 from pathlib import Path
 from typing import Optional
 
 import pytest
 import yaml
+from helpers import secret_revisions
 from pytest_operator.plugin import OpsTest
 
 logger = logging.getLogger(__name__)
@@ -117,3 +120,106 @@ async def test_delete_secret(ops_test: OpsTest):
 
     # NOTE: event.set_results() removes keys with empty values
     assert "secrets" not in secrets_data
+
+
+async def test_stress(ops_test: OpsTest):
+    """Churning the secret with a read/write/delete mix."""
+    await helper_execute_action(ops_test, "forget-all-secrets")
+
+    results = await helper_execute_action(
+        ops_test, "stress", {"keys": 5, "count": 100, "seed": 1}
+    )
+    assert results["operations"] == "100"
+    assert float(results["throughput"]) > 0
+    assert int(results["latency"]["create"]["count"]) == 5
+
+    await helper_execute_action(ops_test, "forget-all-secrets")
+
+
+async def test_unit_secret(ops_test: OpsTest):
+    """Unit secrets are kept apart from the app secret."""
+    await helper_execute_action(ops_test, "forget-all-secrets")
+
+    await helper_execute_action(ops_test, "set-secret", {"key": "app"})
+    await helper_execute_action(ops_test, "set-secret", {"key": "unit", "scope": "unit"})
+
+    secrets_data = await helper_execute_action(ops_test, "get-secrets")
+    assert secrets_data["secrets"] == {"key": "app"}
+    secrets_data = await helper_execute_action(ops_test, "get-secrets", {"scope": "unit"})
+    assert secrets_data["secrets"] == {"key": "unit"}
+
+    await helper_execute_action(ops_test, "delete-secrets", {"keys": ["key"], "scope": "unit"})
+    secrets_data = await helper_execute_action(ops_test, "get-secrets", {"scope": "unit"})
+    assert "secrets" not in secrets_data
+    secrets_data = await helper_execute_action(ops_test, "get-secrets")
+    assert secrets_data["secrets"] == {"key": "app"}
+
+    await helper_execute_action(ops_test, "forget-all-secrets")
+
+
+async def test_large_secret(ops_test: OpsTest):
+    """Large values are stored compressed and split in chunks, read back as they were."""
+    await helper_execute_action(ops_test, "forget-all-secrets")
+    endpoints = ",".join(f"host-{i}.example.internal:5432" for i in range(1000))
+    await helper_execute_action(ops_test, "set-secret", {"endpoints": endpoints})
+
+    secrets_data = await helper_execute_action(ops_test, "get-secrets")
+    assert secrets_data["secrets"] == {"endpoints": endpoints}
+
+    sizes = (await helper_execute_action(ops_test, "secret-sizes"))["sizes"]
+    assert sizes["keys"]["endpoints"]["codec"] == "zlib"
+    assert int(sizes["keys"]["endpoints"]["size"]) == len(endpoints)
+    assert int(sizes["stored"]) < len(endpoints)
+
+    await helper_execute_action(ops_test, "forget-all-secrets")
+
+
+async def test_get_secret_pages(ops_test: OpsTest):
+    """Large secrets can be read some keys at a time, or pulled from a file on the unit."""
+    await helper_execute_action(ops_test, "forget-all-secrets")
+    content = {f"key{index:03}": f"value{index}" for index in range(25)}
+    await helper_execute_action(ops_test, "set-secret", content)
+
+    secrets_data = await helper_execute_action(
+        ops_test, "get-secrets", {"keys": ["key001", "key002"]}
+    )
+    assert secrets_data["secrets"] == {"key001": "value1", "key002": "value2"}
+
+    pages = []
+    params = {"limit": 10}
+    while True:
+        secrets_data = await helper_execute_action(ops_test, "get-secrets", params)
+        pages.append(secrets_data["secrets"])
+        if not (cursor := secrets_data.get("next-cursor")):
+            break
+        params["cursor"] = cursor
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert {key: value for page in pages for key, value in page.items()} == content
+
+    file = (await helper_execute_action(ops_test, "get-secrets", {"to-file": True}))["file"]
+    _, stdout, _ = await ops_test.juju("ssh", UNIT0_NAME, "sudo", "cat", file["path"])
+    assert json.loads(stdout) == content
+    assert hashlib.sha256(stdout.strip().encode()).hexdigest() == file["sha256"]
+
+    await helper_execute_action(ops_test, "forget-all-secrets")
+
+
+async def test_secret_scheme_migration(ops_test: OpsTest):
+    """Secrets move between the peer-id and label schemes in place, no new revision created."""
+    await helper_execute_action(ops_test, "forget-all-secrets")
+    await helper_execute_action(ops_test, "set-secret", {"key": "value"})
+    await helper_execute_action(ops_test, "set-secret", {"key": "unit", "scope": "unit"})
+    revisions = await secret_revisions(ops_test, APP_NAME)
+
+    for scheme in ("label", "peer-id"):
+        await ops_test.model.applications[APP_NAME].set_config({"secret-scheme": scheme})
+        await ops_test.model.wait_for_idle(apps=[APP_NAME], status="active", timeout=1000)
+
+        secrets_data = await helper_execute_action(ops_test, "get-secrets")
+        assert secrets_data["secrets"] == {"key": "value"}
+        secrets_data = await helper_execute_action(ops_test, "get-secrets", {"scope": "unit"})
+        assert secrets_data["secrets"] == {"key": "unit"}
+        assert await secret_revisions(ops_test, APP_NAME) == revisions
+
+    await helper_execute_action(ops_test, "forget-all-secrets", {"scope": "unit"})
+    await helper_execute_action(ops_test, "forget-all-secrets")
@@ -3,6 +3,8 @@
 # See LICENSE file for licensing details.
 
 import asyncio
+import hashlib
+import json
 import logging
 from pathlib import Path
 from typing import Optional
@@ -113,3 +115,104 @@ async def test_delete_secret(ops_test: OpsTest):
 
     # NOTE: event.set_results() removes keys with empty values
     assert "secret" not in secrets_data
+
+
+async def test_stress(ops_test: OpsTest):
+    """Churning secrets with a read/write/delete mix."""
+    results = await helper_execute_action(
+        ops_test, "stress", {"secrets": 2, "keys": 5, "count": 100, "seed": 1}
+    )
+    assert results["operations"] == "100"
+    assert float(results["throughput"]) > 0
+    assert int(results["latency"]["create"]["count"]) == 10
+
+
+async def test_unit_secret(ops_test: OpsTest):
+    """Unit secrets are kept apart from the app secrets."""
+    await helper_execute_action(ops_test, "set-secret", {"content": {"key": "app"}})
+    await helper_execute_action(
+        ops_test, "set-secret", {"content": {"key": "unit"}, "scope": "unit"}
+    )
+
+    secrets_data = await helper_execute_action(ops_test, "get-secret")
+    assert secrets_data["secret"] == {"key": "app"}
+    secrets_data = await helper_execute_action(ops_test, "get-secret", {"scope": "unit"})
+    assert secrets_data["secret"] == {"key": "unit"}
+
+    await helper_execute_action(ops_test, "forget-default-secret", {"scope": "unit"})
+    secrets_data = await helper_execute_action(ops_test, "get-secret", {"scope": "unit"})
+    assert "secret" not in secrets_data
+    secrets_data = await helper_execute_action(ops_test, "get-secret")
+    assert secrets_data["secret"] == {"key": "app"}
+
+    await helper_execute_action(ops_test, "forget-default-secret")
+
+
+async def test_large_secret(ops_test: OpsTest):
+    """Large values are stored compressed and split in chunks, read back as they were."""
+    endpoints = ",".join(f"host-{i}.example.internal:5432" for i in range(1000))
+    await helper_execute_action(
+        ops_test, "set-secret", {"content": {"endpoints": endpoints, "key": "value"}}
+    )
+
+    secrets_data = await helper_execute_action(ops_test, "get-secret")
+    assert secrets_data["secret"] == {"endpoints": endpoints, "key": "value"}
+
+    sizes = (await helper_execute_action(ops_test, "secret-sizes"))["sizes"]
+    assert sizes["keys"]["endpoints"]["codec"] == "zlib"
+    assert int(sizes["keys"]["endpoints"]["size"]) == len(endpoints)
+    assert int(sizes["stored"]) < len(endpoints)
+
+    await helper_execute_action(ops_test, "forget-default-secret")
+
+
+async def test_get_secret_pages(ops_test: OpsTest):
+    """Large secrets can be read some keys at a time, or pulled from a file on the unit."""
+    content = {f"key{index:03}": f"value{index}" for index in range(25)}
+    await helper_execute_action(ops_test, "set-secret", {"content": content})
+
+    secrets_data = await helper_execute_action(
+        ops_test, "get-secret", {"keys": ["key001", "key002"]}
+    )
+    assert secrets_data["secret"] == {"key001": "value1", "key002": "value2"}
+
+    pages = []
+    params = {"limit": 10}
+    while True:
+        secrets_data = await helper_execute_action(ops_test, "get-secret", params)
+        pages.append(secrets_data["secret"])
+        if not (cursor := secrets_data.get("next-cursor")):
+            break
+        params["cursor"] = cursor
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert {key: value for page in pages for key, value in page.items()} == content
+
+    file = (await helper_execute_action(ops_test, "get-secret", {"to-file": True}))["file"]
+    _, stdout, _ = await ops_test.juju("ssh", UNIT0_NAME, "sudo", "cat", file["path"])
+    assert json.loads(stdout) == content
+    assert hashlib.sha256(stdout.strip().encode()).hexdigest() == file["sha256"]
+
+    await helper_execute_action(ops_test, "forget-default-secret")
+
+
+async def test_export_import(ops_test: OpsTest):
+    """Secrets are restored from an archive, those unchanged since the export left as they are."""
+    for index in range(3):
+        await helper_execute_action(
+            ops_test, "set-secret", {"content": {"key": f"value{index}"}, "label": f"db{index}"}
+        )
+
+    archive = await helper_execute_action(
+        ops_test, "export-secrets", {"labels": ["db0", "db1", "db2", "db3"]}
+    )
+    assert archive["secrets"] == "3"
+
+    await helper_execute_action(ops_test, "set-secret", {"content": {"key": "x"}, "label": "db1"})
+    await helper_execute_action(ops_test, "forget-default-secret", {"label": "db2"})
+
+    results = await helper_execute_action(ops_test, "import-secrets", {"path": archive["path"]})
+    assert (results["written"], results["unchanged"]) == ("2", "1")
+    for index in range(3):
+        secrets_data = await helper_execute_action(ops_test, "get-secret", {"label": f"db{index}"})
+        assert secrets_data["secret"] == {"key": f"value{index}"}
+        await helper_execute_action(ops_test, "forget-default-secret", {"label": f"db{index}"})
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+import pytest
+import yaml
+from helpers import ActionDriver, secret_revisions
+from pytest_operator.plugin import OpsTest
+
+logger = logging.getLogger(__name__)
+
+CHARMS = {
+    "labels": "./tests/integration/charms/labels-charm",
+    "cache": "./tests/integration/charms/cache-charm",
+}
+APP_NAMES = {
+    name: yaml.safe_load(Path(f"{path}/metadata.yaml").read_text())["name"]
+    for name, path in CHARMS.items()
+}
+
+UNITS = int(os.environ.get("CONCURRENCY_UNITS", "3"))
+CONCURRENCY = int(os.environ.get("CONCURRENCY_LEVEL", "10"))
+ROUNDS = int(os.environ.get("CONCURRENCY_ROUNDS", "5"))
+
+
+@pytest.mark.abort_on_fail
+async def test_build_and_deploy(ops_test: OpsTest):
+    """Deploy the charms-under-test with multiple units each."""
+    charms = {name: await ops_test.build_charm(path) for name, path in CHARMS.items()}
+
+    await asyncio.gather(
+        *(
+            ops_test.model.deploy(charm, application_name=APP_NAMES[name], num_units=UNITS)
+            for name, charm in charms.items()
+        )
+    )
+    await ops_test.model.wait_for_idle(
+        apps=list(APP_NAMES.values()),
+        status="active",
+        raise_on_blocked=True,
+        timeout=1000,
+        wait_for_exact_units=UNITS,
+    )
+
+
+@pytest.mark.parametrize("name", CHARMS)
+async def test_concurrent_writes_and_reads(ops_test: OpsTest, name):
+    """The leader updates the secret while all units read it.
+
+    Each update is expected to converge (the same content read by all units), the secret
+    revision to grow with updates.
+    """
+    driver = ActionDriver(ops_test, APP_NAMES[name], CONCURRENCY)
+    leader = await driver.leader()
+
+    convergence = []
+    revisions = []
+    for index in range(ROUNDS):
+        value = f"value{index}"
+        await asyncio.gather(
+            driver.run(leader, "set-secret", {"content": {"key": value}}),
+            driver.run_on_units("get-secret"),
+        )
+        convergence.append(
+            await driver.converge(
+                "get-secret", lambda results: results.get("secret", {}).get("key") == value
+            )
+        )
+        revisions.append(max((await secret_revisions(ops_test, APP_NAMES[name])).values()))
+
+    logger.info("Action latencies (s): %s", driver.latency_report())
+    logger.info("Convergence (s): %s, secret revisions: %s", convergence, revisions)
+    assert revisions == sorted(revisions)
+    assert revisions[-1] > revisions[0]
+
+
+@pytest.mark.parametrize("name", CHARMS)
+async def test_concurrent_unit_secrets(ops_test: OpsTest, name):
+    """All units write their own secrets at the same time, none through the leader."""
+    driver = ActionDriver(ops_test, APP_NAMES[name], CONCURRENCY)
+
+    for index in range(ROUNDS):
+        await driver.run_all(
+            (unit, "set-secret", {"content": {"key": f"{unit}-{index}"}, "scope": "unit"})
+            for unit in driver.units
+        )
+        results = await driver.run_on_units("get-secret", {"scope": "unit"})
+        assert {unit: result["secret"]["key"] for unit, result in results.items()} == {
+            unit: f"{unit}-{index}" for unit in driver.units
+        }
+
+    logger.info("Action latencies (s): %s", driver.latency_report())
+    await driver.run_on_units("forget-default-secret", {"scope": "unit"})
+
+
+@pytest.mark.parametrize("name", CHARMS)
+async def test_write_requests(ops_test: OpsTest, name):
+    """Non-leader units pass their writes on to the leader, which applies them in batches."""
+    driver = ActionDriver(ops_test, APP_NAMES[name], CONCURRENCY)
+    leader = await driver.leader()
+    followers = [unit for unit in driver.units if unit != leader]
+
+    results = await driver.run_all(
+        (unit, "set-secret", {"content": {f"key{index}": unit}, "label": "requested"})
+        for index, unit in enumerate(followers)
+    )
+    tickets = [result["ticket"] for result in results]
+
+    async def applied(ticket: str) -> bool:
+        result = await driver.run(leader, "write-status", {"ticket": ticket})
+        return result["status"] == "applied"
+
+    for ticket in tickets:
+        for _ in range(60):
+            if await applied(ticket):
+                break
+            await asyncio.sleep(1)
+        else:
+            raise TimeoutError(f"Write request {ticket} not applied")
+
+    expected = {f"key{index}": unit for index, unit in enumerate(followers)}
+    await driver.converge(
+        "get-secret",
+        lambda results: results.get("secret") == expected,
+        {"label": "requested"},
+    )
+    await driver.run(leader, "forget-default-secret", {"label": "requested"})
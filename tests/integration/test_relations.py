@@ -2,6 +2,7 @@
 # Copyright 2022 Canonical Ltd.
 # See LICENSE file for licensing details.
 import asyncio
+import json
 import logging
 from pathlib import Path
 
@@ -14,6 +15,7 @@ from pytest_operator.plugin import OpsTest
 logger = logging.getLogger(__name__)
 
 REQUIRES = "relation-requires"
+SECOND_REQUIRES = "second-relation-requires"
 PROVIDES = "relation-provides"
 PROVIDES_METADATA = yaml.safe_load(
     Path("./tests/integration/charms/relation-provides/metadata.yaml").read_text()
@@ -69,3 +71,59 @@ async def test_database_relation_with_charm_libraries(ops_test: OpsTest):
     data_requires = yaml.safe_load(raw_data)
 
     assert 'secret-tls' in data_requires[unit_requires_name]['relation-info'][0]['application-data']
+
+    # Only digests of the secret fields are published, not their values
+    digests = json.loads(
+        data_requires[unit_requires_name]['relation-info'][0]['application-data']['secret-tls-digests']
+    )
+    assert set(digests) == {'tls'}
+    assert digests['tls'] != 'False'
+
+
+async def test_shared_secret_across_relations(ops_test: OpsTest):
+    """Identical TLS data is shared as a single secret across multiple relations."""
+    charm_path = "./tests/integration/charms/relation-requires"
+    application_charm = await ops_test.build_charm(charm_path)
+    await ops_test.model.deploy(
+        application_charm, application_name=SECOND_REQUIRES, num_units=1, series="jammy"
+    )
+    await ops_test.model.add_relation(
+        f"{SECOND_REQUIRES}:{DATABASE_RELATION_NAME}", PROVIDES
+    )
+    await ops_test.model.wait_for_idle(
+        apps=[REQUIRES, SECOND_REQUIRES, PROVIDES], status="active"
+    )
+
+    secret_ids = set()
+    for app in [REQUIRES, SECOND_REQUIRES]:
+        unit_requires_name = f"{app}/0"
+        raw_data = (await ops_test.juju("show-unit", unit_requires_name))[1]
+        data_requires = yaml.safe_load(raw_data)
+        secret_ids.add(
+            data_requires[unit_requires_name]['relation-info'][0]['application-data']['secret-tls']
+        )
+
+    assert len(secret_ids) == 1
+
+
+async def test_credentials_rotation(ops_test: OpsTest):
+    """Credentials of all relations are rotated."""
+    revisions = {}
+    for app in [REQUIRES, SECOND_REQUIRES]:
+        unit_requires_name = f"{app}/0"
+        raw_data = (await ops_test.juju("show-unit", unit_requires_name))[1]
+        data_requires = yaml.safe_load(raw_data)
+        app_data = data_requires[unit_requires_name]['relation-info'][0]['application-data']
+        revisions[app] = int(app_data['secret-user-revision'])
+
+    action = await ops_test.model.units.get(f"{PROVIDES}/0").run_action("rotate-credentials")
+    action = await action.wait()
+    assert action.results["pending"] == "0"
+    await ops_test.model.wait_for_idle(apps=[REQUIRES, SECOND_REQUIRES, PROVIDES], status="active")
+
+    for app in [REQUIRES, SECOND_REQUIRES]:
+        unit_requires_name = f"{app}/0"
+        raw_data = (await ops_test.juju("show-unit", unit_requires_name))[1]
+        data_requires = yaml.safe_load(raw_data)
+        app_data = data_requires[unit_requires_name]['relation-info'][0]['application-data']
+        assert int(app_data['secret-user-revision']) > revisions[app]
@@ -0,0 +1,22 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Fixtures shared by the unit tests of the data_interfaces library."""
+
+import pytest
+from fake_juju import FakeJuju
+from ops.testing import Harness
+from relation_charms import SHARED_SECRETS_PROVIDER_META, SharedSecretsProviderCharm
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Leader of a provider sharing the TLS secret group, its secrets served by FakeJuju."""
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    fake = FakeJuju()
+    harness = Harness(SharedSecretsProviderCharm, meta=SHARED_SECRETS_PROVIDER_META)
+    fake.attach(harness)
+    harness.set_leader(True)
+    harness.add_relation("database-peers", "provider")
+    harness.begin()
+    return fake, harness
@@ -0,0 +1,469 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""In-process stand-in for the Juju secret store and relation data, for local load testing.
+
+`FakeJuju` holds the state of a model: secrets (owners, labels, revisions, grants, and the
+revision each consumer tracks) and relation data, with Juju's access rules. It can serve
+ - charms executed under Harness: `attach()` replaces the secret hook tools of the Harness
+   backend (relation data is kept by Harness)
+ - hook tool invocations: `hook_tools.py` emulates the hook tool executables (to be put on
+   the `PATH`), on a `FakeJuju` state persisted as JSON
+
+Any hook tool call can be slowed down (`latency`) or made fail (`failures`), per tool.
+
+    fake = FakeJuju(latency={"secret-get": 0.01}, failures={"secret-set": 0.05}, seed=42)
+    provider = fake.attach(provider_harness)
+    requirer = fake.attach(requirer_harness)
+    ...
+    requirer.emit_secret_changed()
+"""
+
+import random
+import secrets
+import time
+from collections import Counter
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from ops import model
+from ops.testing import Harness
+
+# Hook tools of which FakeJuju holds the state, indexed by the ops model backend method
+SECRET_TOOLS = {
+    "secret_get": "secret-get",
+    "secret_set": "secret-set",
+    "secret_add": "secret-add",
+    "secret_info_get": "secret-info-get",
+    "secret_grant": "secret-grant",
+    "secret_revoke": "secret-revoke",
+    "secret_remove": "secret-remove",
+    "secret_ids": "secret-ids",
+}
+
+# Hook tools left to Harness, only slowed down/made fail when attached
+# (Harness writes relation data with `update_relation_data`, not `relation_set`)
+RELATION_TOOLS = {
+    "relation_get": "relation-get",
+    "update_relation_data": "relation-set",
+    "relation_ids": "relation-ids",
+    "relation_list": "relation-list",
+    "is_leader": "is-leader",
+}
+
+
+def harness_writing(harness: Harness) -> bool:
+    """Whether the backend is called by the Harness writing relation data (not by the charm).
+
+    `Harness.update_relation_data()` writes with the same backend method as the charm does,
+    outside of any hook (then emits `relation-changed`, to which the charm reacts in a hook).
+    """
+    return getattr(harness, "writing", False) and not harness._backend._hook_is_running
+
+
+def track_harness_writes(harness: Harness) -> None:
+    """Flag (`harness.writing`) the relation data the test writes through the Harness."""
+    if hasattr(harness, "writing"):
+        return
+    harness.writing = False
+    update_relation_data = harness.update_relation_data
+
+    @wraps(update_relation_data)
+    def wrapper(*args, **kwargs):
+        harness.writing = True
+        try:
+            return update_relation_data(*args, **kwargs)
+        finally:
+            harness.writing = False
+
+    harness.update_relation_data = wrapper
+
+
+def canonical_id(secret_id: str) -> str:
+    """Secret ID, whatever the form of the secret URI it is given."""
+    return f"secret:{secret_id.split('/')[-1].split(':')[-1]}"
+
+
+class FakeJuju:
+    """State of a Juju model, as far as secrets and relation data are concerned.
+
+    Secrets are owned by an application or by a unit. The leader of the owning application
+    (or the owning unit) manages them, the other units of the owning application can read
+    them. Consumers (units of the applications or units the secret was granted to) track a
+    revision, and are notified (`secret-changed`) once a newer revision was published.
+
+    NOTE: owners are always served the latest revision, as in Juju 3.1.7+, unless
+    `owner_sees_latest` is unset.
+    """
+
+    def __init__(
+        self,
+        latency: Union[float, Dict[str, float]] = 0.0,
+        failures: Optional[Dict[str, float]] = None,
+        seed: Optional[int] = None,
+        owner_sees_latest: bool = True,
+    ):
+        self.latency = latency
+        self.failures = failures or {}
+        self.owner_sees_latest = owner_sees_latest
+        self.calls = Counter()
+        self._random = random.Random(seed)
+
+        self.secrets: Dict[str, Dict] = {}
+        self.relations: Dict[str, Dict] = {}
+        self.leaders: Dict[str, str] = {}
+        # Units to be notified of secret changes: {unit: [secret id, ...]}
+        self.pending: Dict[str, List[str]] = {}
+        self._labels: Dict[Tuple[str, str], str] = {}
+
+    # State (de)serialization
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable state."""
+        return {
+            "secrets": self.secrets,
+            "relations": self.relations,
+            "leaders": self.leaders,
+            "pending": self.pending,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict, **kwargs) -> "FakeJuju":
+        """Restore a state saved by `to_dict()`."""
+        fake = cls(**kwargs)
+        fake.secrets = state.get("secrets", {})
+        fake.relations = state.get("relations", {})
+        fake.leaders = state.get("leaders", {})
+        fake.pending = state.get("pending", {})
+        for secret_id, secret in fake.secrets.items():
+            for entity, label in secret["labels"].items():
+                fake._labels[(entity, label)] = secret_id
+        return fake
+
+    # Latency and failure injection
+
+    def call(self, tool: str) -> None:
+        """Account for a hook tool call, with the latency and failure rate configured."""
+        self.calls[tool] += 1
+        latency = self.latency.get(tool, 0.0) if isinstance(self.latency, dict) else self.latency
+        if latency:
+            time.sleep(latency)
+        if self._random.random() < self.failures.get(tool, 0.0):
+            raise model.ModelError(f"ERROR injected failure of {tool}")
+
+    # Secrets
+
+    def _secret(self, unit: str, id: Optional[str] = None, label: Optional[str] = None) -> Dict:
+        """Secret referred to by a unit, by ID or by the label the unit (or its app) knows."""
+        if id:
+            secret_id = canonical_id(id)
+        else:
+            app = unit.split("/")[0]
+            secret_id = self._labels.get((unit, label)) or self._labels.get((app, label))
+        if secret_id not in self.secrets:
+            raise model.SecretNotFoundError(f"ERROR secret {id or label!r} not found")
+        return self.secrets[secret_id]
+
+    def _is_owner(self, unit: str, secret: Dict) -> bool:
+        return secret["owner"] in (unit, unit.split("/")[0])
+
+    def _check_manage(self, unit: str, secret: Dict) -> None:
+        owner = secret["owner"]
+        if owner != unit and not (owner == unit.split("/")[0] and self.leaders.get(owner) == unit):
+            raise model.ModelError(f"ERROR permission denied ({unit} managing {secret['id']})")
+
+    def _set_label(self, entity: str, secret: Dict, label: Optional[str]) -> None:
+        if not label or secret["labels"].get(entity) == label:
+            return
+        self._labels.pop((entity, secret["labels"].get(entity)), None)
+        secret["labels"][entity] = label
+        self._labels[(entity, label)] = secret["id"]
+
+    def secret_add(
+        self,
+        unit: str,
+        content: Dict[str, str],
+        label: Optional[str] = None,
+        description: Optional[str] = None,
+        expire: Optional[str] = None,
+        rotate: Optional[str] = None,
+        owner: str = "application",
+    ) -> str:
+        app = unit.split("/")[0]
+        if owner != "unit" and self.leaders.get(app) != unit:
+            raise model.ModelError("ERROR permission denied (only the leader adds app secrets)")
+
+        owner = unit if owner == "unit" else app
+        if label and (owner, label) in self._labels:
+            raise model.ModelError(f"ERROR secret with label {label!r} already exists")
+
+        secret_id = f"secret:{secrets.token_hex(10)}"
+        self.secrets[secret_id] = {
+            "id": secret_id,
+            "owner": owner,
+            "labels": {},
+            "revisions": {"1": dict(content)},
+            "latest": 1,
+            "tracked": {},
+            "grants": {},
+            "description": description,
+            "expire": expire,
+            "rotate": rotate,
+        }
+        self._set_label(owner, self.secrets[secret_id], label)
+        return secret_id
+
+    def secret_get(
+        self,
+        unit: str,
+        id: Optional[str] = None,
+        label: Optional[str] = None,
+        refresh: bool = False,
+        peek: bool = False,
+    ) -> Dict[str, str]:
+        secret = self._secret(unit, id, label if not id else None)
+        owner = self._is_owner(unit, secret)
+        if not owner and not {unit, unit.split("/")[0]} & secret["grants"].keys():
+            raise model.SecretNotFoundError(f"ERROR secret {secret['id']!r} not found")
+
+        if id and label:
+            self._set_label(secret["owner"] if owner else unit, secret, label)
+
+        latest = secret["latest"]
+        if (owner and self.owner_sees_latest) or peek:
+            revision = latest
+        else:
+            if refresh or unit not in secret["tracked"]:
+                secret["tracked"][unit] = latest
+                if secret["id"] in self.pending.get(unit, []):
+                    self.pending[unit].remove(secret["id"])
+            revision = secret["tracked"][unit]
+        return dict(secret["revisions"][str(revision)])
+
+    def secret_info_get(
+        self, unit: str, id: Optional[str] = None, label: Optional[str] = None
+    ) -> Dict:
+        secret = self._secret(unit, id, label)
+        if not self._is_owner(unit, secret):
+            raise model.SecretNotFoundError(f"ERROR secret {secret['id']!r} not found")
+        return {
+            secret["id"]: {
+                "label": secret["labels"].get(secret["owner"]),
+                "revision": secret["latest"],
+                "expiry": secret["expire"],
+                "rotation": secret["rotate"],
+                "description": secret["description"],
+            }
+        }
+
+    def secret_set(
+        self,
+        unit: str,
+        id: str,
+        content: Optional[Dict[str, str]] = None,
+        label: Optional[str] = None,
+        description: Optional[str] = None,
+        expire: Optional[str] = None,
+        rotate: Optional[str] = None,
+    ) -> None:
+        secret = self._secret(unit, id)
+        self._check_manage(unit, secret)
+
+        self._set_label(secret["owner"], secret, label)
+        for field, value in (("description", description), ("expire", expire), ("rotate", rotate)):
+            if value is not None:
+                secret[field] = value
+
+        if content is None or content == secret["revisions"][str(secret["latest"])]:
+            return
+        secret["latest"] += 1
+        secret["revisions"][str(secret["latest"])] = dict(content)
+        for consumer, revision in secret["tracked"].items():
+            if revision < secret["latest"] and secret["id"] not in self.pending.get(consumer, []):
+                self.pending.setdefault(consumer, []).append(secret["id"])
+
+    def secret_grant(self, unit: str, id: str, grantee: str, relation_id: int) -> None:
+        secret = self._secret(unit, id)
+        self._check_manage(unit, secret)
+        secret["grants"][grantee] = relation_id
+
+    def secret_revoke(self, unit: str, id: str, grantee: str) -> None:
+        secret = self._secret(unit, id)
+        self._check_manage(unit, secret)
+        secret["grants"].pop(grantee, None)
+        for consumer in list(secret["tracked"]):
+            if grantee in (consumer, consumer.split("/")[0]):
+                del secret["tracked"][consumer]
+
+    def secret_remove(self, unit: str, id: str, revision: Optional[int] = None) -> None:
+        secret = self._secret(unit, id)
+        self._check_manage(unit, secret)
+        if revision is not None and len(secret["revisions"]) > 1:
+            secret["revisions"].pop(str(revision), None)
+            return
+
+        del self.secrets[secret["id"]]
+        for entity, label in secret["labels"].items():
+            self._labels.pop((entity, label), None)
+        for consumer in self.pending:
+            if secret["id"] in self.pending[consumer]:
+                self.pending[consumer].remove(secret["id"])
+
+    def secret_ids(self, unit: str) -> List[str]:
+        """IDs of the secrets the unit owns, and its application on the leader."""
+        app = unit.split("/")[0]
+        owners = {unit, app} if self.leaders.get(app) == unit else {unit}
+        return [secret_id for secret_id, secret in self.secrets.items() if secret["owner"] in owners]
+
+    def secret_changed(self, unit: str) -> List[Tuple[str, Optional[str]]]:
+        """Pop the `secret-changed` events due to a unit: (secret ID, label) pairs."""
+        events = []
+        for secret_id in self.pending.pop(unit, []):
+            if secret := self.secrets.get(secret_id):
+                events.append((secret_id, secret["labels"].get(unit)))
+        return events
+
+    # Relations (for the hook tools; under Harness, relation data is kept by Harness)
+
+    def add_relation(
+        self, app: str, endpoint: str, remote_app: str, remote_endpoint: str, units: List[str]
+    ) -> int:
+        """Relate two applications, `units` being the units of both."""
+        relation_id = len(self.relations)
+        self.relations[str(relation_id)] = {
+            "endpoints": {app: endpoint, remote_app: remote_endpoint},
+            "units": list(units),
+            "data": {name: {} for name in [app, remote_app, *units]},
+        }
+        return relation_id
+
+    def _relation(self, relation_id: Union[int, str]) -> Dict:
+        relation_id = str(relation_id).split(":")[-1]
+        if relation_id not in self.relations:
+            raise model.RelationNotFoundError()
+        return self.relations[relation_id]
+
+    def relation_ids(self, unit: str, name: str) -> List[str]:
+        app = unit.split("/")[0]
+        return [
+            f"{name}:{relation_id}"
+            for relation_id, relation in self.relations.items()
+            if relation["endpoints"].get(app) == name
+        ]
+
+    def relation_list(self, unit: str, relation_id: int, app: bool = False) -> Union[List, str]:
+        relation = self._relation(relation_id)
+        local = unit.split("/")[0]
+        remote = next(name for name in relation["endpoints"] if name != local)
+        if app:
+            return remote
+        return [name for name in relation["units"] if name.split("/")[0] == remote]
+
+    def relation_get(self, relation_id: int, member: str) -> Dict[str, str]:
+        return dict(self._relation(relation_id)["data"].get(member, {}))
+
+    def relation_set(self, unit: str, relation_id: int, data: Dict[str, str], app: bool) -> None:
+        member = unit.split("/")[0] if app else unit
+        if app and self.leaders.get(member) != unit:
+            raise model.ModelError("ERROR cannot write relation settings (not the leader)")
+        databag = self._relation(relation_id)["data"].setdefault(member, {})
+        for key, value in data.items():
+            if value:
+                databag[key] = value
+            else:
+                databag.pop(key, None)
+
+    # Harness integration
+
+    def attach(self, harness: Harness) -> "HarnessBackend":
+        """Serve the secrets (and slow down the relation hook tools) of a charm under Harness.
+
+        To be called before `harness.begin()`.
+        """
+        return HarnessBackend(self, harness)
+
+
+class HarnessBackend:
+    """The secret hook tools of a unit under Harness, served by FakeJuju."""
+
+    def __init__(self, fake: FakeJuju, harness: Harness):
+        self.fake = fake
+        self.harness = harness
+        self.backend = backend = harness._backend
+        self.unit = backend.unit_name
+
+        is_leader = backend.is_leader
+        if is_leader():
+            fake.leaders[backend.app_name] = self.unit
+        # Leadership changes go through the Harness
+        set_leader = harness.set_leader
+
+        @wraps(set_leader)
+        def _set_leader(is_leader: bool = True):
+            if is_leader:
+                fake.leaders[backend.app_name] = self.unit
+            elif fake.leaders.get(backend.app_name) == self.unit:
+                del fake.leaders[backend.app_name]
+            set_leader(is_leader)
+
+        harness.set_leader = _set_leader
+
+        for method, tool in SECRET_TOOLS.items():
+            setattr(backend, method, self._called(tool, getattr(self, method)))
+        for method, tool in RELATION_TOOLS.items():
+            setattr(backend, method, self._called(tool, getattr(backend, method)))
+        track_harness_writes(harness)
+
+    def _called(self, tool: str, call: Callable) -> Callable:
+        @wraps(call)
+        def wrapper(*args, **kwargs):
+            if not harness_writing(self.harness):
+                self.fake.call(tool)
+            return call(*args, **kwargs)
+
+        return wrapper
+
+    def _grantee(self, relation_id: int, unit: Optional[str]) -> str:
+        return unit or self.backend.relation_remote_app_name(relation_id)
+
+    def secret_get(self, *, id=None, label=None, refresh=False, peek=False) -> Dict[str, str]:
+        return self.fake.secret_get(self.unit, id, label, refresh, peek)
+
+    def secret_info_get(self, *, id=None, label=None) -> model.SecretInfo:
+        ((secret_id, info),) = self.fake.secret_info_get(self.unit, id, label).items()
+        return model.SecretInfo.from_dict(secret_id, info)
+
+    def secret_set(
+        self, id, *, content=None, label=None, description=None, expire=None, rotate=None
+    ) -> None:
+        rotate = rotate.value if rotate else None
+        expire = expire.isoformat() if expire else None
+        self.fake.secret_set(self.unit, id, content, label, description, expire, rotate)
+
+    def secret_add(
+        self, content, *, label=None, description=None, expire=None, rotate=None, owner=None
+    ) -> str:
+        rotate = rotate.value if rotate else None
+        expire = expire.isoformat() if expire else None
+        return self.fake.secret_add(
+            self.unit, content, label, description, expire, rotate, owner or "application"
+        )
+
+    def secret_grant(self, id, relation_id, *, unit=None) -> None:
+        self.fake.secret_grant(self.unit, id, self._grantee(relation_id, unit), relation_id)
+
+    def secret_revoke(self, id, relation_id, *, unit=None) -> None:
+        self.fake.secret_revoke(self.unit, id, self._grantee(relation_id, unit))
+
+    def secret_remove(self, id, *, revision=None) -> None:
+        self.fake.secret_remove(self.unit, id, revision)
+
+    def secret_ids(self) -> List[str]:
+        return self.fake.secret_ids(self.unit)
+
+    def emit_secret_changed(self) -> int:
+        """Emit the `secret-changed` events due to the unit, return how many there were."""
+        events = self.fake.secret_changed(self.unit)
+        for secret_id, label in events:
+            self.harness.charm.on.secret_changed.emit(secret_id, label)
+        return len(events)
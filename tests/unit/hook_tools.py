@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Hook tool executables served by a FakeJuju state, kept in a JSON file.
+
+Charm code (or anything invoking hook tools) can be executed without a Juju controller:
+
+    python tests/unit/hook_tools.py install <dir>
+    export PATH=<dir>:$PATH FAKE_JUJU_STATE=<state.json> JUJU_UNIT_NAME=<app>/<n>
+
+Relations and leadership can be set up from Python (`FakeJuju.add_relation()`, `leaders`)
+and saved with `save_state()`. Latency and failures are injected according to
+ - FAKE_JUJU_LATENCY: seconds per call, or a JSON object of seconds per tool
+ - FAKE_JUJU_FAILURES: JSON object of failure rates (0 to 1) per tool
+ - FAKE_JUJU_SEED: seed of the failure injection
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import yaml
+from fake_juju import FakeJuju
+from ops import model
+
+
+def install(bin_dir: str) -> None:
+    """Create the hook tool executables, calling back this script."""
+    path = Path(bin_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    for tool in TOOLS:
+        executable = path / tool
+        executable.write_text(
+            f'#!/bin/sh\nexec "{sys.executable}" "{Path(__file__).resolve()}" {tool} "$@"\n'
+        )
+        executable.chmod(0o755)
+
+
+def load_state(path: str) -> FakeJuju:
+    """FakeJuju, from its state file (if any) and the environment."""
+    latency = json.loads(os.environ.get("FAKE_JUJU_LATENCY", "0"))
+    failures = json.loads(os.environ.get("FAKE_JUJU_FAILURES", "{}"))
+    seed = os.environ.get("FAKE_JUJU_SEED")
+    state = json.loads(Path(path).read_text()) if os.path.exists(path) else {}
+    return FakeJuju.from_dict(
+        state, latency=latency, failures=failures, seed=int(seed) if seed else None
+    )
+
+
+def save_state(fake: FakeJuju, path: str) -> None:
+    Path(path).write_text(json.dumps(fake.to_dict()))
+
+
+def _content(items: List[str]) -> Dict[str, str]:
+    """Secret content from `key=value` and `key#file=path` arguments."""
+    content = {}
+    for item in items:
+        key, value = item.split("=", 1)
+        if key.endswith("#file"):
+            key, value = key[: -len("#file")], Path(value).read_text()
+        content[key] = value
+    return content
+
+
+def _relation_id(reference: str) -> int:
+    """Relation ID from a `-r` argument (`<id>` or `<endpoint>:<id>`) or the environment."""
+    reference = reference or os.environ.get("JUJU_RELATION_ID", "")
+    return int(reference.split(":")[-1])
+
+
+# Arguments of the hook tools, as (names, options) of `ArgumentParser.add_argument()`
+_ID = (("id",), {"nargs": "?"})
+_LABEL = (("--label",), {})
+_RELATION = (("-r", "--relation"), {"default": ""})
+_APP = (("--app",), {"action": "store_true"})
+_UNIT = (("--unit",), {})
+_SECRET_FIELDS = [
+    _LABEL,
+    (("--description",), {}),
+    (("--expire",), {}),
+    (("--rotate",), {}),
+    (("--owner",), {"default": "application"}),
+    (("content",), {"nargs": "*"}),
+]
+
+
+def _flag(name: str) -> tuple:
+    return (name,), {"action": "store_true"}
+
+
+def _secret_get(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    return fake.secret_get(unit, args.id, args.label, args.refresh, args.peek)
+
+
+def _secret_info_get(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    return fake.secret_info_get(unit, args.id, args.label)
+
+
+def _secret_add(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    return fake.secret_add(
+        unit,
+        _content(args.content),
+        args.label,
+        args.description,
+        args.expire,
+        args.rotate,
+        args.owner,
+    )
+
+
+def _secret_set(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    content = _content(args.content) if args.content else None
+    fake.secret_set(unit, args.id, content, args.label, args.description, args.expire, args.rotate)
+
+
+def _secret_grant(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    relation_id = _relation_id(args.relation)
+    grantee = args.unit or fake.relation_list(unit, relation_id, app=True)
+    fake.secret_grant(unit, args.id, grantee, relation_id)
+
+
+def _secret_revoke(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    grantee = args.unit or fake.relation_list(unit, _relation_id(args.relation), app=True)
+    fake.secret_revoke(unit, args.id, grantee)
+
+
+def _secret_remove(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    fake.secret_remove(unit, args.id, args.revision)
+
+
+def _secret_ids(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    return fake.secret_ids(unit)
+
+
+def _relation_ids(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    return fake.relation_ids(unit, args.name)
+
+
+def _relation_list(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    return fake.relation_list(unit, _relation_id(args.relation), args.app)
+
+
+def _relation_get(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    member = args.member or os.environ.get("JUJU_REMOTE_UNIT", unit)
+    if args.app:
+        member = member.split("/")[0]
+    data = fake.relation_get(_relation_id(args.relation), member)
+    return data if args.key == "-" else data.get(args.key)
+
+
+def _relation_set(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    settings = dict(item.split("=", 1) for item in args.settings)
+    if args.file:
+        stream = sys.stdin if args.file == "-" else open(args.file)
+        # Newer ops send JSON, older ones YAML: both are loaded as YAML
+        settings.update(yaml.safe_load(stream.read()) or {})
+    fake.relation_set(unit, _relation_id(args.relation), settings, args.app)
+
+
+def _is_leader(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    return fake.leaders.get(unit.split("/")[0]) == unit
+
+
+def _juju_log(fake: FakeJuju, unit: str, args: argparse.Namespace):
+    print(f"{unit} {args.log_level} {' '.join(args.message)}", file=sys.stderr)
+
+
+# Hook tools served: their arguments, and the handler returning their (JSON-serializable) output
+TOOLS: Dict[str, Tuple[List[tuple], Callable]] = {
+    "secret-get": ([_ID, _LABEL, _flag("--refresh"), _flag("--peek")], _secret_get),
+    "secret-info-get": ([_ID, _LABEL], _secret_info_get),
+    "secret-add": (_SECRET_FIELDS, _secret_add),
+    "secret-set": ([_ID, *_SECRET_FIELDS], _secret_set),
+    "secret-grant": ([_ID, _RELATION, _UNIT], _secret_grant),
+    "secret-revoke": ([_ID, _RELATION, _UNIT, _APP], _secret_revoke),
+    "secret-remove": ([_ID, (("--revision",), {"type": int})], _secret_remove),
+    "secret-ids": ([], _secret_ids),
+    "relation-ids": ([(("name",), {})], _relation_ids),
+    "relation-list": ([_RELATION, _APP], _relation_list),
+    "relation-get": (
+        [
+            _RELATION,
+            _APP,
+            (("key",), {"nargs": "?", "default": "-"}),
+            (("member",), {"nargs": "?"}),
+        ],
+        _relation_get,
+    ),
+    "relation-set": (
+        [_RELATION, _APP, (("--file",), {}), (("settings",), {"nargs": "*"})],
+        _relation_set,
+    ),
+    "is-leader": ([], _is_leader),
+    "juju-log": (
+        [(("--log-level", "-l"), {"default": "INFO"}), (("message",), {"nargs": "*"})],
+        _juju_log,
+    ),
+}
+
+
+def _parser(tool: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=tool)
+    parser.add_argument("--format")
+    arguments, _ = TOOLS[tool]
+    for names, options in arguments:
+        parser.add_argument(*names, **options)
+    return parser
+
+
+def run(fake: FakeJuju, unit: str, tool: str, args: argparse.Namespace):
+    """Execute a hook tool, return its (JSON-serializable) output."""
+    fake.call(tool)
+    _, handler = TOOLS[tool]
+    return handler(fake, unit, args)
+
+
+def main(argv: List[str]) -> int:
+    if argv[0] == "install":
+        install(argv[1])
+        return 0
+
+    tool, args = argv[0], _parser(argv[0]).parse_args(argv[1:])
+    unit = os.environ["JUJU_UNIT_NAME"]
+    state = os.environ["FAKE_JUJU_STATE"]
+    with open(f"{state}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        fake = load_state(state)
+        try:
+            output = run(fake, unit, tool, args)
+        except model.RelationNotFoundError:
+            print(f"ERROR {args.relation!r}: relation not found", file=sys.stderr)
+            return 2
+        except model.ModelError as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        save_state(fake, state)
+
+    if output is not None:
+        # Like Juju, secret-add only ever outputs the secret ID
+        print(output if tool == "secret-add" else json.dumps(output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Charms of both sides of a `database_client` relation, served by FakeJuju under Harness."""
+
+from typing import Dict
+
+from fake_juju import FakeJuju
+from ops.charm import CharmBase
+from ops.testing import Harness
+from utils import dispatch_scoped, load_data_interfaces
+
+data_interfaces = load_data_interfaces()
+
+PROVIDER_META = """
+name: provider
+provides:
+  database:
+    interface: database_client
+"""
+
+SHARED_SECRETS_PROVIDER_META = """
+name: provider
+provides:
+  database:
+    interface: database_client
+peers:
+  database-peers:
+    interface: database-peers
+"""
+
+REQUIRER_META = """
+name: {name}
+requires:
+  database:
+    interface: database_client
+"""
+
+
+class ProviderCharm(CharmBase):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.provides = data_interfaces.DatabaseProvides(self, relation_name="database")
+
+
+class SharedSecretsProviderCharm(CharmBase):
+    """Provider sharing the TLS secret group among relations (registry in its peer relation)."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.provides = data_interfaces.DatabaseProvides(
+            self,
+            relation_name="database",
+            shared_secret_labels=["tls"],
+            peer_relation_name="database-peers",
+        )
+
+
+class RequirerCharm(CharmBase):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.requires = data_interfaces.DatabaseRequires(
+            self, relation_name="database", database_name="data"
+        )
+        self.events = []
+        self.framework.observe(self.requires.on.database_created, self._on_event)
+        self.framework.observe(self.requires.on.endpoints_changed, self._on_event)
+
+    def _on_event(self, event):
+        self.events.append(event)
+
+
+class Client:
+    """A requirer application, related to the provider."""
+
+    def __init__(self, fake: FakeJuju, index: int, provider: Harness):
+        self.name = f"client{index}"
+        self.harness = Harness(RequirerCharm, meta=REQUIRER_META.format(name=self.name))
+        fake.attach(self.harness)
+        self.harness.set_leader(True)
+        self.harness.begin()
+        self.relation_id = self.harness.add_relation("database", "provider")
+        self.harness.add_relation_unit(self.relation_id, "provider/0")
+        self.new_dispatch = dispatch_scoped(self.harness.charm.requires)
+
+        # The provider side of the relation, with the request of the client
+        self.provider = provider
+        self.provider_relation_id = provider.add_relation("database", self.name)
+        provider.add_relation_unit(self.provider_relation_id, f"{self.name}/0")
+        request = self.harness.get_relation_data(self.relation_id, self.name)
+        provider.update_relation_data(
+            self.provider_relation_id, self.name, {**request, "database": "data"}
+        )
+
+    @property
+    def published(self) -> Dict[str, str]:
+        """What the provider published for the client."""
+        return self.provider.get_relation_data(self.provider_relation_id, "provider")
+
+    def receive(self) -> None:
+        """Give the client the provider's data (relation-changed)."""
+        self.harness.update_relation_data(self.relation_id, "provider", self.published)
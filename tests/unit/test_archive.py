@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Export of the secrets of the labels and cache charms to an archive, and their import."""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fake_juju import FakeJuju
+from hook_tools import install, save_state
+from ops import model
+from utils import PeerUnit, load_charm
+
+pytest.importorskip("cryptography")
+
+CHARMS = ["labels-charm", "cache-charm"]
+
+
+@pytest.fixture(params=CHARMS)
+def leader(request, monkeypatch, tmp_path):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    return PeerUnit(load_charm(request.param), FakeJuju(), leader=True), tmp_path
+
+
+def test_export_import(leader):
+    leader, tmp_path = leader
+    leader.run("set-secret", {"content": {"key": "default"}})
+    for index in range(3):
+        leader.run("set-secret", {"content": {"key": f"value{index}"}, "label": f"db{index}"})
+    leader.run("set-secret", {"content": {"key": "unit"}, "label": "db0", "scope": "unit"})
+    # No index of the labels is kept in the peer databags
+    assert not any("labels" in key for key in leader.peer_data)
+
+    # Every secret of the scope owned (not the key of the archives), the ones under a prefix,
+    # or the ones of the labels given (those without a secret are skipped)
+    everything = leader.run("export-secrets", {"path": str(tmp_path / "all")})
+    assert int(everything["secrets"]) == 4
+    path = str(tmp_path / "db")
+    assert int(leader.run("export-secrets", {"prefix": "db", "path": path})["secrets"]) == 3
+    labels = {"labels": ["db0", "db3"], "path": str(tmp_path / "labels")}
+    assert int(leader.run("export-secrets", labels)["secrets"]) == 1
+    unit = leader.run("export-secrets", {"scope": "unit", "path": str(tmp_path / "unit")})
+    assert int(unit["secrets"]) == 1
+
+    leader.run("set-secret", {"content": {"key": "x"}, "label": "db1"})
+    leader.run("forget-default-secret", {"label": "db2"})
+    leader.run("forget-default-secret", {})
+
+    results = leader.run("import-secrets", {"path": path, "prefix": "db1"})
+    assert (int(results["written"]), int(results["unchanged"])) == (1, 0)
+    results = leader.run("import-secrets", {"path": path})
+    assert (int(results["written"]), int(results["unchanged"])) == (1, 2)
+    results = leader.run("import-secrets", {"path": everything["path"]})
+    assert (int(results["written"]), int(results["unchanged"])) == (1, 3)
+    for index in range(3):
+        secret = leader.run("get-secret", {"label": f"db{index}"})["secret"]
+        assert secret == {"key": f"value{index}"}
+    assert leader.run("get-secret", {})["secret"] == {"key": "default"}
+
+
+@pytest.mark.parametrize("charm", CHARMS)
+def test_secret_ids_hook_tool(charm, tmp_path, monkeypatch):
+    """Outside of the unit tests, the `secret-ids` hook tool is run by the charm itself."""
+    fake = FakeJuju()
+    fake.leaders["owner"] = "owner/0"
+    state = str(tmp_path / "state.json")
+    save_state(fake, state)
+    install(str(tmp_path / "bin"))
+    monkeypatch.setenv("PATH", f"{tmp_path / 'bin'}:{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_JUJU_STATE", state)
+    monkeypatch.setenv("JUJU_VERSION", "3.6.0")
+    monkeypatch.setenv("JUJU_UNIT_NAME", "owner/0")
+    backend = model._ModelBackend()
+    backend.secret_add({"key": "app"}, label="owner.db0", owner="application")
+    backend.secret_add({"key": "unit"}, label="owner-0.db0", owner="unit")
+    owned_secret_labels = sys.modules[load_charm(charm).__module__].owned_secret_labels
+
+    # The secrets of the app are listed on the leader only
+    leader = SimpleNamespace(_backend=backend)
+    assert sorted(owned_secret_labels(leader)) == ["owner-0.db0", "owner.db0"]
+    monkeypatch.setenv("JUJU_UNIT_NAME", "owner/1")
+    other = SimpleNamespace(_backend=model._ModelBackend())
+    assert list(owned_secret_labels(other)) == []
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Batches of the secret cache of the cache charm, and their rollback."""
+
+import pytest
+from fake_juju import FakeJuju
+from ops.model import ModelError
+from utils import PeerUnit, load_charm, new_dispatch
+
+CHARM = load_charm("cache-charm")
+REVISIONS_KEY = "secret-revisions"
+
+
+@pytest.fixture
+def leader(monkeypatch):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    fake = FakeJuju()
+    leader = PeerUnit(CHARM, fake, leader=True)
+    for label in ("label0", "label1"):
+        leader.run("set-secret", {"content": {"key": "old"}, "label": label})
+    new_dispatch(leader.harness.charm)
+    return fake, leader
+
+
+def test_batch(leader):
+    fake, leader = leader
+    charm = leader.harness.charm
+    writes = ("secret-add", "secret-set", "secret-remove")
+    calls_before = dict(fake.calls)
+    with charm.secret_cache.batch():
+        for value in ("new", "newer"):
+            charm.set_secret({"key": value}, "label0")
+        charm.set_secret({"key": "new"}, "label2")
+        charm.delete_full_secret("label1")
+        # Nothing is written before the end of the block
+        assert all(fake.calls[tool] == calls_before.get(tool, 0) for tool in writes)
+
+    # Only the final content of each secret is written
+    assert fake.calls["secret-set"] - calls_before.get("secret-set", 0) == 1
+    assert fake.calls["secret-add"] - calls_before.get("secret-add", 0) == 1
+    assert fake.calls["secret-remove"] - calls_before.get("secret-remove", 0) == 1
+
+    new_dispatch(charm)
+    assert charm.get_secret("label0") == {"key": "newer"}
+    assert charm.get_secret("label1") == {}
+    assert charm.get_secret("label2") == {"key": "new"}
+
+
+def test_batch_rollback(leader):
+    fake, leader = leader
+    charm = leader.harness.charm
+    revisions = leader.peer_data[REVISIONS_KEY]
+    secrets = set(fake.secrets)
+
+    # The creation fails, once the update was applied
+    secret_add = leader.harness._backend.secret_add
+
+    def failing(*args, **kwargs):
+        raise ModelError("ERROR injected failure of secret-add")
+
+    leader.harness._backend.secret_add = failing
+    with pytest.raises(ModelError):
+        with charm.secret_cache.batch():
+            charm.set_secret({"key": "new"}, "label0")
+            charm.set_secret({"key": "new"}, "label2")
+            charm.delete_full_secret("label1")
+    leader.harness._backend.secret_add = secret_add
+
+    # The update is undone, removals never happened, the revisions published are unchanged
+    new_dispatch(charm)
+    assert set(fake.secrets) == secrets
+    assert charm.get_secret("label0") == {"key": "old"}
+    assert charm.get_secret("label1") == {"key": "old"}
+    assert leader.peer_data[REVISIONS_KEY] == revisions
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Non-leader units of the cache charm only read again the secrets the leader updated."""
+
+from fake_juju import FakeJuju
+from utils import BackendCalls, PeerUnit, load_charm, new_dispatch
+
+CHARM = load_charm("cache-charm")
+LABELS = 3
+ROUNDS = 6
+
+
+def test_follower_refresh():
+    fake = FakeJuju()
+    leader = PeerUnit(CHARM, fake, leader=True)
+    # NOTE: both units are named unit/0 (Harness), only the leader is known to FakeJuju as such
+    follower = PeerUnit(CHARM, fake, leader=False)
+
+    def peer_relation_changed():
+        new_dispatch(leader.harness.charm)
+        new_dispatch(follower.harness.charm)
+        follower.harness.update_relation_data(
+            follower.relation_id, follower.app, dict(leader.peer_data)
+        )
+
+    for label in range(LABELS):
+        leader.run("set-secret", {"content": {"key": "value"}, "label": f"label{label}"})
+    peer_relation_changed()
+    for label in range(LABELS):
+        assert follower.harness.charm.get_secret(f"label{label}") == {"key": "value"}
+
+    calls = BackendCalls(follower.harness)
+    for i in range(ROUNDS):
+        label = f"label{i % LABELS}"
+        leader.run("set-secret", {"content": {"key": f"value{i}"}, "label": label})
+        peer_relation_changed()
+        assert follower.harness.charm.get_secret(label) == {"key": f"value{i}"}
+
+    # Only the secret updated was read again, the others are not read until needed
+    assert calls["secret-get"] == ROUNDS
+    for label in range(LABELS):
+        last = max(i for i in range(ROUNDS) if i % LABELS == label)
+        assert follower.harness.charm.get_secret(f"label{label}") == {"key": f"value{last}"}
+
+    # Only the revisions read are stored, the content of secrets is never kept on disk
+    stored = follower.harness.charm._stored
+    assert set(stored.revisions) == {f"secrets-cache-charm.label{label}" for label in range(LABELS)}
+    assert not hasattr(stored, "contents")
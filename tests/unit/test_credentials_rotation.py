@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Rolling rotation of the credentials of all relations with `CredentialsRotation`."""
+
+from datetime import datetime
+
+import pytest
+from fake_juju import FakeJuju
+from ops import SecretRotate
+from ops.charm import CharmBase
+from ops.testing import Harness
+from relation_charms import SHARED_SECRETS_PROVIDER_META, Client, data_interfaces
+from utils import dispatch_scoped
+
+WAVE_SIZE = 2
+WAVE_INTERVAL = 60
+
+
+class RotatingProviderCharm(CharmBase):
+    """Provider rotating the credentials of its relations in waves, monthly."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.provides = data_interfaces.DatabaseProvides(
+            self, relation_name="database", peer_relation_name="database-peers"
+        )
+        self.rotation = data_interfaces.CredentialsRotation(
+            self,
+            self.provides,
+            "database-peers",
+            wave_size=WAVE_SIZE,
+            wave_interval=WAVE_INTERVAL,
+            rotation_policy=SecretRotate.MONTHLY,
+        )
+        self.framework.observe(
+            self.rotation.on.credentials_rotation_requested, self._on_rotation_requested
+        )
+        self.rotated = []
+        self.failing = None
+
+    def _on_rotation_requested(self, event) -> None:
+        if event.relation.id == self.failing:
+            raise RuntimeError("injected failure of the rotation")
+        self.rotated.append(event.relation.id)
+        self.provides.set_credentials(event.relation.id, "user", f"pass{len(self.rotated)}")
+
+
+class Clock:
+    """Stand-in for `datetime` in the library, at a time set by the tests."""
+
+    def __init__(self):
+        self.time = datetime(2023, 1, 1).timestamp()
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.time)
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    clock = Clock()
+    monkeypatch.setattr(data_interfaces, "datetime", clock)
+    fake = FakeJuju()
+    harness = Harness(RotatingProviderCharm, meta=SHARED_SECRETS_PROVIDER_META)
+    fake.attach(harness)
+    harness.set_leader(True)
+    harness.add_relation("database-peers", "provider")
+    harness.begin()
+
+    provides = harness.charm.provides
+    clients = [Client(fake, index, harness) for index in range(5)]
+    for client in clients:
+        provides.set_credentials(client.provider_relation_id, "user", "pass")
+    return harness, [client.provider_relation_id for client in clients], clock
+
+
+def update_status(harness: Harness) -> None:
+    dispatch_scoped(harness.charm.provides)()
+    harness.charm.on.update_status.emit()
+
+
+def test_waves(provider):
+    harness, relation_ids, clock = provider
+    charm = harness.charm
+
+    # The first wave is run right away, the next ones on update-status
+    charm.rotation.start()
+    assert charm.rotated == relation_ids[:2]
+    assert charm.rotation.pending == relation_ids[2:]
+    for wave in (relation_ids[2:4], relation_ids[4:]):
+        clock.time += WAVE_INTERVAL
+        update_status(harness)
+        assert charm.rotated[-len(wave) :] == wave
+    assert charm.rotated == relation_ids
+    assert not charm.rotation.in_progress
+    peer_relation = harness.model.get_relation("database-peers")
+    assert "database-credentials-rotation" not in peer_relation.data[charm.app]
+
+
+def test_wave_interval(provider):
+    harness, relation_ids, clock = provider
+    charm = harness.charm
+    charm.rotation.start()
+
+    # update-status runs less than wave_interval after the last wave are skipped
+    clock.time += WAVE_INTERVAL - 1
+    update_status(harness)
+    assert charm.rotated == relation_ids[:2]
+    clock.time += 1
+    update_status(harness)
+    assert charm.rotated == relation_ids[:4]
+
+    # Relations scheduled meanwhile wait for the next wave too
+    charm.rotation.start(relation_ids[:1])
+    assert charm.rotated == relation_ids[:4]
+    assert charm.rotation.pending == [relation_ids[4], relation_ids[0]]
+
+
+def test_resume(provider):
+    harness, relation_ids, clock = provider
+    charm = harness.charm
+    charm.rotation.start()
+
+    # The hook fails half-way through the second wave: none of it is recorded as done
+    charm.failing = relation_ids[3]
+    clock.time += WAVE_INTERVAL
+    with pytest.raises(RuntimeError):
+        update_status(harness)
+    assert charm.rotated == relation_ids[:3]
+    assert charm.rotation.pending == relation_ids[2:]
+
+    # The next hook runs the interrupted wave again, then the rotation goes on
+    charm.failing = None
+    update_status(harness)
+    assert charm.rotated[3:] == relation_ids[2:4]
+    assert charm.rotation.pending == relation_ids[4:]
+
+
+def test_secret_rotate(provider):
+    harness, relation_ids, clock = provider
+    charm = harness.charm
+    secret = charm.provides._get_relation_secret(relation_ids[3], "user")
+    assert secret.get_info().rotation == SecretRotate.MONTHLY
+
+    # Juju rotating a credentials secret rotates the relation it belongs to
+    dispatch_scoped(charm.provides)()
+    charm.on.secret_rotate.emit(secret.meta.id, None)
+    assert charm.rotated == relation_ids[3:4]
+    assert not charm.rotation.in_progress
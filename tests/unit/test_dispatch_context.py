@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Dispatch contexts of the example charms and of the library: memoized, reset, kept apart."""
+
+import pytest
+from ops.charm import CharmBase
+from ops.testing import Harness
+from relation_charms import Client, data_interfaces
+from utils import load_helpers, new_dispatch, reset_dispatch_context
+
+helpers = load_helpers()
+
+# The context of the example charms, and the one of the library
+CONTEXTS = {"helpers": helpers.DispatchContext, "library": data_interfaces.DispatchContext}
+
+META = """
+name: peer
+peers:
+  peers:
+    interface: peers
+"""
+
+
+@pytest.fixture
+def harness(monkeypatch):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    harness = Harness(CharmBase, meta=META)
+    harness.begin()
+    yield harness
+    harness.cleanup()
+
+
+@pytest.fixture(params=list(CONTEXTS))
+def context_cls(request):
+    return CONTEXTS[request.param]
+
+
+def test_contexts_apart(harness):
+    model = harness.model
+    contexts = {name: cls.of(model) for name, cls in CONTEXTS.items()}
+    assert contexts["helpers"] is not contexts["library"]
+    assert all(cls.of(model) is contexts[name] for name, cls in CONTEXTS.items())
+
+
+def test_memoized(harness, monkeypatch, context_cls):
+    context = context_cls.of(harness.model)
+    # Not there yet: looked up again until it is
+    assert context.relation("peers") is None
+    relation_id = harness.add_relation("peers", "peer")
+    assert context.relation("peers").id == relation_id
+
+    get_relation = harness.model.get_relation
+    looked_up = []
+    monkeypatch.setattr(
+        harness.model, "get_relation", lambda *args: looked_up.append(args) or get_relation(*args)
+    )
+    assert context.juju_version == "3.1.6"
+    monkeypatch.setenv("JUJU_VERSION", "2.9.44")
+    for _ in range(3):
+        assert context.relation("peers").id == relation_id
+        assert context.juju_version == "3.1.6"
+    assert not looked_up
+
+
+def test_reset(harness, monkeypatch, context_cls):
+    context = context_cls.of(harness.model)
+    first = harness.add_relation("peers", "peer")
+    assert context.relation("peers").id == first
+    assert context.juju_version == "3.1.6"
+
+    # A new dispatch sees the relation and Juju version of its own (both contexts reset)
+    harness.remove_relation(first)
+    second = harness.add_relation("peers", "peer")
+    monkeypatch.setenv("JUJU_VERSION", "2.9.44")
+    reset_dispatch_context(harness.model)
+    assert context_cls.of(harness.model) is context
+    assert context.relation("peers").id == second
+    assert context.juju_version == "2.9.44"
+
+
+def test_leadership(harness, context_cls):
+    context = context_cls.of(harness.model)
+    assert not context.is_leader
+    # Leadership changes within a dispatch are seen
+    harness.set_leader(True)
+    assert context.is_leader
+    harness.set_leader(False)
+    assert not context.is_leader
+
+
+def test_leadership_lost(provider):
+    fake, harness = provider
+    client = Client(fake, 0, harness)
+    provides = harness.charm.provides
+    new_dispatch(harness.charm)
+    provides.set_version(client.provider_relation_id, "14.9")
+    assert client.published["version"] == "14.9"
+
+    # Within the same dispatch, a unit no longer leader leaves the app databag alone
+    harness.set_leader(False)
+    provides.set_version(client.provider_relation_id, "15.4")
+    assert client.published["version"] == "14.9"
+    harness.set_leader(True)
+    provides.set_version(client.provider_relation_id, "15.4")
+    assert client.published["version"] == "15.4"
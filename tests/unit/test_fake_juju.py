@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import os
+import time
+
+import pytest
+from fake_juju import FakeJuju
+from hook_tools import install, save_state
+from ops import model
+from ops.charm import CharmBase
+from ops.testing import Harness
+
+OWNER_META = """
+name: owner
+provides:
+  secrets:
+    interface: secrets
+"""
+
+CONSUMER_META = """
+name: consumer
+requires:
+  secrets:
+    interface: secrets
+"""
+
+
+class RecordingCharm(CharmBase):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.changed = []
+        self.framework.observe(self.on.secret_changed, self._on_secret_changed)
+
+    def _on_secret_changed(self, event):
+        self.changed.append(event.secret.id)
+
+
+@pytest.fixture
+def fake():
+    return FakeJuju()
+
+
+def harness(fake: FakeJuju, meta: str, remote_app: str, leader: bool = True):
+    harness = Harness(RecordingCharm, meta=meta)
+    backend = fake.attach(harness)
+    harness.set_leader(leader)
+    harness.add_relation("secrets", remote_app)
+    harness.begin()
+    return harness, backend
+
+
+def test_owner_and_consumer(fake):
+    owner, _ = harness(fake, OWNER_META, "consumer")
+    consumer, consumer_backend = harness(fake, CONSUMER_META, "owner")
+
+    secret = owner.charm.app.add_secret({"password": "one"}, label="mine")
+    with pytest.raises(model.SecretNotFoundError):
+        consumer.charm.model.get_secret(id=secret.id).get_content()
+
+    secret.grant(owner.model.get_relation("secrets"))
+    consumer_secret = consumer.charm.model.get_secret(id=secret.id, label="theirs")
+    assert consumer_secret.get_content() == {"password": "one"}
+
+    # The owner is served the latest revision, the consumer what it tracks
+    owner.charm.model.get_secret(label="mine").set_content({"password": "two"})
+    assert owner.charm.model.get_secret(label="mine").get_content() == {"password": "two"}
+    assert consumer.charm.model.get_secret(label="theirs").get_content() == {"password": "one"}
+    assert consumer_secret.peek_content() == {"password": "two"}
+
+    assert consumer_backend.emit_secret_changed() == 1
+    assert consumer.charm.changed == [secret.id]
+    assert consumer_secret.get_content(refresh=True) == {"password": "two"}
+    assert consumer_backend.emit_secret_changed() == 0
+
+    secret.revoke(owner.model.get_relation("secrets"))
+    with pytest.raises(model.SecretNotFoundError):
+        consumer.charm.model.get_secret(id=secret.id).get_content()
+
+
+def test_only_leader_manages(fake):
+    owner, _ = harness(fake, OWNER_META, "consumer")
+    secret = owner.charm.app.add_secret({"password": "one"}, label="mine")
+
+    owner.set_leader(False)
+    assert owner.charm.model.get_secret(label="mine").get_content() == {"password": "one"}
+    with pytest.raises(model.ModelError):
+        fake.secret_set(owner.charm.unit.name, secret.id, {"password": "two"})
+
+
+def test_latency_and_failures():
+    fake = FakeJuju(latency={"secret-get": 0.01}, failures={"secret-add": 1.0})
+    owner, _ = harness(fake, OWNER_META, "consumer")
+    with pytest.raises(model.ModelError):
+        owner.charm.app.add_secret({"password": "one"})
+
+    fake.failures = {}
+    secret = owner.charm.app.add_secret({"password": "one"})
+    start = time.monotonic()
+    for _ in range(5):
+        secret.get_content(refresh=True)
+    assert time.monotonic() - start >= 0.05
+    assert fake.calls["secret-add"] == 2
+
+
+def test_hook_tools(tmp_path, monkeypatch):
+    fake = FakeJuju()
+    fake.leaders["owner"] = "owner/0"
+    relation_id = fake.add_relation(
+        "owner", "secrets", "consumer", "secrets", ["owner/0", "consumer/0"]
+    )
+    state = str(tmp_path / "state.json")
+    save_state(fake, state)
+    install(str(tmp_path / "bin"))
+
+    monkeypatch.setenv("PATH", f"{tmp_path / 'bin'}:{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_JUJU_STATE", state)
+    monkeypatch.setenv("JUJU_VERSION", "3.6.0")
+    monkeypatch.setenv("JUJU_UNIT_NAME", "owner/0")
+    owner = model._ModelBackend()
+    secret_id = owner.secret_add({"password": "one"}, label="mine", owner="application")
+    owner.secret_grant(secret_id, relation_id)
+    owner.relation_set(relation_id, {"secret": secret_id}, is_app=True)
+    assert owner.is_leader()
+
+    monkeypatch.setenv("JUJU_UNIT_NAME", "consumer/0")
+    consumer = model._ModelBackend()
+    assert consumer.relation_ids("secrets") == [relation_id]
+    published = consumer.relation_get(relation_id, "owner", is_app=True)["secret"]
+    assert consumer.secret_get(id=published) == {"password": "one"}
+    with pytest.raises(model.SecretNotFoundError):
+        consumer.secret_get(label="mine")
+    with pytest.raises(model.ModelError):
+        consumer.secret_set(secret_id, content={"password": "two"})
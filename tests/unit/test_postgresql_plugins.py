@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Plugins enabled in PostgreSQL, checked by `DatabaseRequires.get_enabled_plugins()`.
+
+The connection is a stand-in for psycopg's, serving `pg_extension` and recording the queries.
+"""
+
+from typing import List
+
+import pytest
+from fake_juju import FakeJuju
+from ops.testing import Harness
+from relation_charms import PROVIDER_META, Client, ProviderCharm
+
+psycopg = pytest.importorskip("psycopg")
+
+ENABLED = {"citext", "pg_trgm"}
+
+
+class Connection:
+    """Connection to a database with the extensions `ENABLED`."""
+
+    def __init__(self, conninfo: str):
+        self.conninfo = conninfo
+        self.queries: List[List[str]] = []
+        self.closed = False
+        self.fail = False
+
+    def cursor(self) -> "Connection":
+        return self
+
+    def __enter__(self) -> "Connection":
+        """Cursor context: the connection serves as its own cursor."""
+        return self
+
+    def __exit__(self, *_) -> None:
+        """Nothing to release."""
+
+    def execute(self, query: str, params: tuple) -> None:
+        if self.fail:
+            raise psycopg.OperationalError("connection lost")
+        self.queries.append(list(params[0]))
+
+    def fetchall(self) -> List[tuple]:
+        return [(name,) for name in self.queries[-1] if name in ENABLED]
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    fake = FakeJuju()
+    provider = Harness(ProviderCharm, meta=PROVIDER_META)
+    fake.attach(provider)
+    provider.set_leader(True)
+    provider.begin()
+    client = Client(fake, 0, provider)
+    provides = provider.charm.provides
+    provides.set_credentials(client.provider_relation_id, "user", "pass")
+    provides.set_relation_fields(client.provider_relation_id, {"endpoints": "10.0.0.1:5432"})
+    client.receive()
+
+    connections = []
+
+    def connect(conninfo: str, autocommit: bool = False) -> Connection:
+        connections.append(Connection(conninfo))
+        return connections[-1]
+
+    monkeypatch.setattr(psycopg, "connect", connect)
+    return client, connections
+
+
+def test_enabled_plugins(client):
+    client, connections = client
+    requires = client.harness.charm.requires
+
+    plugins = requires.get_enabled_plugins(["citext", "postgis"])
+    assert plugins == {"citext": True, "postgis": False}
+    assert len(connections) == 1
+    assert "host='10.0.0.1'" in connections[0].conninfo
+    assert "user='user' password='pass'" in connections[0].conninfo
+    assert connections[0].queries == [["citext", "postgis"]]
+
+    # Plugins checked already are served from the cache, the others share a query
+    assert requires.is_postgresql_plugin_enabled("postgis") is False
+    assert requires.get_enabled_plugins(["citext", "pg_trgm", "hstore"]) == {
+        "citext": True,
+        "pg_trgm": True,
+        "hstore": False,
+    }
+    assert len(connections) == 1
+    assert connections[0].queries == [["citext", "postgis"], ["pg_trgm", "hstore"]]
+
+    # The connection is closed at the end of the dispatch
+    client.harness.framework.on.commit.emit()
+    assert connections[0].closed
+
+
+def test_enabled_plugins_new_credentials(client):
+    client, connections = client
+    requires = client.harness.charm.requires
+    provides = client.provider.charm.provides
+    assert requires.is_postgresql_plugin_enabled("citext")
+
+    # New revision of the credentials: the cached results don't apply anymore
+    provides.set_credentials(client.provider_relation_id, "user", "new-pass")
+    client.receive()
+    assert requires.is_postgresql_plugin_enabled("citext")
+    assert len(connections) == 2
+    assert connections[1].queries == [["citext"]]
+
+
+def test_enabled_plugins_error(client):
+    client, connections = client
+    requires = client.harness.charm.requires
+    assert requires.is_postgresql_plugin_enabled("citext")
+
+    # A failing query reports the plugins missing as disabled, and drops the connection
+    connections[0].fail = True
+    assert requires.get_enabled_plugins(["citext", "pg_trgm"]) == {
+        "citext": False,
+        "pg_trgm": False,
+    }
+    assert connections[0].closed
+
+    # Nothing failed is cached: checked again on a new connection
+    assert requires.is_postgresql_plugin_enabled("pg_trgm")
+    assert len(connections) == 2
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Setting fields on many relations at once with `DataProvides.batch()`."""
+
+import pytest
+from ops.model import ModelError
+from relation_charms import Client
+from utils import dispatch_scoped
+
+
+def set_fields(provides, clients, value: str) -> None:
+    for client in clients:
+        provides.set_credentials(client.provider_relation_id, f"user-{client.name}", value)
+        provides.set_relation_fields(client.provider_relation_id, {"endpoints": value})
+
+
+def test_batch(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+    clients = [Client(fake, index, harness) for index in range(3)]
+    set_fields(provides, clients, "initial")
+
+    new_dispatch()
+    writes = ("secret-add", "secret-set", "relation-set")
+    calls_before = fake.calls.copy()
+    with provides.batch():
+        set_fields(provides, clients, "updated")
+        # Nothing is written before the end of the block
+        assert all(fake.calls[tool] == calls_before[tool] for tool in writes)
+
+    new_dispatch()
+    for client in clients:
+        secret = provides._get_relation_secret(client.provider_relation_id, "user")
+        assert secret.get_content() == {"username": f"user-{client.name}", "password": "updated"}
+        assert client.published.get("secret-endpoints")
+
+
+def test_batch_rollback(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+    clients = [Client(fake, index, harness) for index in range(3)]
+
+    set_fields(provides, clients[:2], "old")
+    published = [dict(client.published) for client in clients]
+    secrets = set(fake.secrets)
+
+    # A databag write fails half-way through the batch
+    new_dispatch()
+    update_relation_data = harness._backend.update_relation_data
+    writes = []
+
+    def failing(relation_id, *args, **kwargs):
+        writes.append(relation_id)
+        if len(writes) == 5:
+            raise ModelError("ERROR injected failure of relation-set")
+        return update_relation_data(relation_id, *args, **kwargs)
+
+    harness._backend.update_relation_data = failing
+    with pytest.raises(ModelError):
+        with provides.batch():
+            set_fields(provides, clients, "new")
+    harness._backend.update_relation_data = update_relation_data
+
+    new_dispatch()
+    assert [client.published for client in clients] == published
+    assert set(fake.secrets) == secrets
+    for client in clients[:2]:
+        secret = provides._get_relation_secret(client.provider_relation_id, "user")
+        assert secret.get_content() == {"username": f"user-{client.name}", "password": "old"}
+
+    # Nothing is applied if the block raises
+    with pytest.raises(RuntimeError):
+        with provides.batch():
+            set_fields(provides, clients, "new")
+            raise RuntimeError()
+    assert [client.published for client in clients] == published
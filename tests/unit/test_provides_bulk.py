@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Setting fields on many relations at once with `DataProvides.set_relation_fields_bulk()`."""
+
+from relation_charms import Client
+from utils import dispatch_scoped
+
+
+def test_bulk(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+    clients = [Client(fake, index, harness) for index in range(3)]
+
+    provides.set_relation_fields_bulk(
+        {
+            client.provider_relation_id: {
+                "username": f"user-{client.name}",
+                "password": "pass",
+                "version": "14",
+                "tls": "True",
+                "tls-ca": "CA",
+            }
+            for client in clients
+        }
+    )
+
+    new_dispatch()
+    # A secret per relation for the credentials, a single one shared for TLS
+    assert len({client.published["secret-tls"] for client in clients}) == 1
+    for client in clients:
+        assert client.published["version"] == "14"
+        secret = provides._get_relation_secret(client.provider_relation_id, "user")
+        assert secret.get_content() == {"username": f"user-{client.name}", "password": "pass"}
+        secret = provides._get_relation_secret(client.provider_relation_id, "tls")
+        assert secret.get_content() == {"tls": "True", "tls-ca": "CA"}
+
+    # All relations move together: the shared secret is updated in place, once
+    new_dispatch()
+    shared_id = clients[0].published["secret-tls"]
+    calls_before = dict(fake.calls)
+    provides.set_relation_fields_bulk(
+        {
+            client.provider_relation_id: {"version": "14", "tls": "True", "tls-ca": "CA2"}
+            for client in clients
+        }
+    )
+    calls = {tool: fake.calls[tool] - calls_before.get(tool, 0) for tool in fake.calls}
+    assert calls.get("secret-set") == 1
+    for tool in ("secret-add", "secret-grant", "secret-revoke", "secret-remove"):
+        assert not calls.get(tool)
+    assert {client.published["secret-tls"] for client in clients} == {shared_id}
+    assert len(provides._load_shared_secrets()) == 1
+
+    new_dispatch()
+    for client in clients:
+        assert client.published["version"] == "14"
+        secret = provides._get_relation_secret(client.provider_relation_id, "tls")
+        assert secret.get_content() == {"tls": "True", "tls-ca": "CA2"}
+
+
+def test_bulk_partial_move(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+    clients = [Client(fake, index, harness) for index in range(3)]
+    provides.set_relation_fields_bulk(
+        {client.provider_relation_id: {"tls": "True", "tls-ca": "CA"} for client in clients}
+    )
+    shared_id = clients[0].published["secret-tls"]
+
+    # Some relations only: they move to a new shared secret, the others keep theirs
+    new_dispatch()
+    calls_before = dict(fake.calls)
+    provides.set_relation_fields_bulk(
+        {client.provider_relation_id: {"tls": "True", "tls-ca": "CA2"} for client in clients[:2]}
+    )
+    assert fake.calls["secret-add"] - calls_before["secret-add"] == 1
+    assert not fake.calls["secret-remove"]
+    assert clients[2].published["secret-tls"] == shared_id
+    moved = {client.published["secret-tls"] for client in clients[:2]}
+    assert len(moved) == 1 and shared_id not in moved
+    assert len(provides._load_shared_secrets()) == 2
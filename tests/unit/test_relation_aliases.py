@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Aliases of the relations of `DatabaseRequires`: assignment, lookup and aliased events."""
+
+import pytest
+from ops.charm import CharmBase
+from ops.testing import Harness
+from relation_charms import data_interfaces
+from utils import dispatch_scoped
+
+ALIASES = ["cluster1", "cluster2"]
+
+META = """
+name: requirer
+requires:
+  database:
+    interface: database_client
+    limit: 2
+"""
+
+
+class AliasedRequirerCharm(CharmBase):
+    """Requirer of two database clusters, recording the aliased events."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        # Aliased events are defined on the class of `on`: a class of its own per charm
+        events = type("Events", (data_interfaces.DatabaseRequiresEvents,), {})
+        requires = type("Requires", (data_interfaces.DatabaseRequires,), {"on": events()})
+        self.requires = requires(
+            self, relation_name="database", database_name="data", relations_aliases=ALIASES
+        )
+        self.emitted = []
+        for alias in ALIASES:
+            self.framework.observe(
+                getattr(self.requires.on, f"{alias}_database_created"), self._on_event
+            )
+
+    def _on_event(self, event) -> None:
+        self.emitted.append((event.handle.kind, event.relation.id))
+
+
+@pytest.fixture
+def harness(monkeypatch):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    harness = Harness(AliasedRequirerCharm, meta=META)
+    harness.set_leader(True)
+    harness.begin()
+    yield harness
+    harness.cleanup()
+
+
+def add_relation(harness: Harness, app: str) -> int:
+    relation_id = harness.add_relation("database", app)
+    harness.add_relation_unit(relation_id, f"{app}/0")
+    return relation_id
+
+
+def test_aliases(harness):
+    requires = harness.charm.requires
+    new_dispatch = dispatch_scoped(requires)
+
+    # A relation added in a later dispatch gets the next alias, as recorded in the databags
+    first = add_relation(harness, "db1")
+    assert requires._get_relation_alias(first) == "cluster1"
+    new_dispatch()
+    second = add_relation(harness, "db2")
+    assert requires._get_relation_alias(second) == "cluster2"
+    for relation_id, alias in ((first, "cluster1"), (second, "cluster2")):
+        assert harness.get_relation_data(relation_id, "requirer/0")["alias"] == alias
+
+    # Later dispatches index the aliases from the databags, in a single pass on first use
+    new_dispatch()
+    assert requires._relation_aliases_index is None
+    assert requires._get_relation_alias(second) == "cluster2"
+    assert requires._relation_aliases_index == {first: "cluster1", second: "cluster2"}
+
+    # Each relation gets the events of its alias
+    harness.update_relation_data(second, "db2", {"username": "user", "password": "pass"})
+    assert harness.charm.emitted == [("cluster2_database_created", second)]
+
+
+def test_alias_of_broken_relation(harness):
+    requires = harness.charm.requires
+    new_dispatch = dispatch_scoped(requires)
+    # Relations added in the same dispatch: the index is kept up to date
+    first = add_relation(harness, "db1")
+    second = add_relation(harness, "db2")
+    assert requires._relation_aliases_index == {first: "cluster1", second: "cluster2"}
+
+    # The alias of a relation gone is available again to the relations added afterwards
+    new_dispatch()
+    harness.remove_relation(first)
+    new_dispatch()
+    third = add_relation(harness, "db3")
+    assert requires._get_relation_alias(third) == "cluster1"
+    assert requires._get_relation_alias(second) == "cluster2"
+
+    harness.update_relation_data(third, "db3", {"username": "user", "password": "pass"})
+    assert harness.charm.emitted == [("cluster1_database_created", third)]
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Secrets of the relations gone: removed on relation-broken, or swept in batches.
+
+Clients get credentials (a secret per relation) and the TLS CA (a secret shared by all
+relations), then leave. Their secrets are expected to be removed on relation-broken, the
+shared secret once no relation refers to it. Relations broken without their secrets being
+removed (relation-broken missed) are reconciled by `sweep_orphaned_secrets()`, a batch at
+a time.
+"""
+
+from ops.model import ModelError
+from relation_charms import Client
+from utils import dispatch_scoped
+
+
+def add_clients(fake, harness, count: int):
+    provides = harness.charm.provides
+    clients = [Client(fake, index, harness) for index in range(count)]
+    for client in clients:
+        provides.set_credentials(client.provider_relation_id, f"user-{client.name}", "pass")
+        provides.set_tls_ca(client.provider_relation_id, "CA")
+    harness.framework.commit()
+    return clients
+
+
+def test_relation_broken(provider):
+    fake, harness = provider
+    new_dispatch = dispatch_scoped(harness.charm.provides)
+    clients = add_clients(fake, harness, 5)
+    assert len(fake.secrets) == 5 + 2  # + TLS CA, digest key
+
+    for client in clients[:-1]:
+        new_dispatch()
+        harness.remove_relation(client.provider_relation_id)
+        harness.framework.commit()
+    # The shared secret is left to the last relation
+    assert len(fake.secrets) == 3
+
+    new_dispatch()
+    harness.remove_relation(clients[-1].provider_relation_id)
+    harness.framework.commit()
+    assert len(fake.secrets) == 1
+    assert clients[-1].provider_relation_id not in harness.charm.provides.secrets
+
+
+def test_sweep_orphaned_secrets(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+    clients = add_clients(fake, harness, 8)
+
+    # relation-broken missed by 7 of them
+    new_dispatch()
+    provides._remove_relation_secrets = lambda relation: 0
+    for client in clients[1:]:
+        harness.remove_relation(client.provider_relation_id)
+    del provides._remove_relation_secrets
+    harness.framework.commit()
+    assert len(fake.secrets) == 10
+
+    removed = []
+    while True:
+        new_dispatch()
+        removed.append(provides.sweep_orphaned_secrets(batch_size=3))
+        harness.framework.commit()
+        if not removed[-1]:
+            break
+    assert removed == [3, 3, 1, 0]
+    assert len(fake.secrets) == 3
+    assert provides._get_relation_secret(clients[0].provider_relation_id, "user").get_content()
+
+
+def test_sweep_failing_removal(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+    clients = add_clients(fake, harness, 3)
+
+    failing = clients[1].published["secret-user"]
+
+    new_dispatch()
+    provides._remove_relation_secrets = lambda relation: 0
+    for client in clients:
+        harness.remove_relation(client.provider_relation_id)
+    del provides._remove_relation_secrets
+    harness.framework.commit()
+
+    # One of the removals fails: logged, the others go on, the failing one is kept for later
+    new_dispatch()
+    secret_remove = harness._backend.secret_remove
+
+    def flaky(id, *args, **kwargs):
+        if id == failing:
+            raise ModelError("ERROR injected failure of secret-remove")
+        return secret_remove(id, *args, **kwargs)
+
+    harness._backend.secret_remove = flaky
+    harness.charm.on.update_status.emit()
+    harness._backend.secret_remove = secret_remove
+    harness.framework.commit()
+    assert len(fake.secrets) == 2  # + digest key
+
+    new_dispatch()
+    assert provides.sweep_orphaned_secrets() == 1
+    harness.framework.commit()
+    assert len(fake.secrets) == 1
+    assert not provides._relation_secrets()
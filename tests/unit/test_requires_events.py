@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Events the Requires classes emit for each change of the provider's data (`EVENT_TRIGGERS`)."""
+
+from typing import Callable, Dict, List, Tuple
+
+import pytest
+from ops.charm import CharmBase
+from ops.testing import Harness
+from relation_charms import data_interfaces
+
+REQUIRER_META = """
+name: requirer
+requires:
+  {endpoint}:
+    interface: {endpoint}_client
+"""
+
+# Changes of the provider's application databag, one after the other, and the events
+# each of them is expected to emit
+Steps = List[Tuple[Dict[str, str], List[str]]]
+
+
+class RequirerCharm(CharmBase):
+    """Requirer recording the custom events of its `requires` object."""
+
+    def __init__(self, *args, requires: Callable[[CharmBase], data_interfaces.DataRequires]):
+        super().__init__(*args)
+        self.requires = requires(self)
+        self.emitted = []
+        for event in self.requires.on.events().values():
+            self.framework.observe(event, self._on_event)
+
+    def _on_event(self, event) -> None:
+        self.emitted.append(event.handle.kind)
+
+
+def run_steps(monkeypatch, endpoint: str, requires: Callable, steps: Steps) -> None:
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+
+    class Charm(RequirerCharm):
+        def __init__(self, *args):
+            super().__init__(*args, requires=requires)
+
+    harness = Harness(Charm, meta=REQUIRER_META.format(endpoint=endpoint))
+    harness.set_leader(True)
+    harness.begin()
+    relation_id = harness.add_relation(endpoint, "provider")
+    harness.add_relation_unit(relation_id, "provider/0")
+    for index, (change, expected) in enumerate(steps):
+        harness.charm.emitted.clear()
+        harness.update_relation_data(relation_id, "provider", change)
+        assert harness.charm.emitted == expected, f"step {index}: {change}"
+    harness.cleanup()
+
+
+def test_database_requires(monkeypatch):
+    steps = [
+        ({"version": "14"}, []),
+        # Credentials shared: nothing else is emitted along with database_created
+        ({"username": "user", "password": "pass", "endpoints": "h:5432"}, ["database_created"]),
+        ({"endpoints": "h2:5432", "read-only-endpoints": "r:5432"}, ["endpoints_changed"]),
+        ({"read-only-endpoints": "r2:5432"}, ["read_only_endpoints_changed"]),
+        ({"secret-endpoints": "secret:e"}, ["endpoints_changed"]),
+        ({"secret-endpoints-revision": "2"}, []),
+        ({"secret-endpoints-revision": "3"}, ["endpoints_changed"]),
+    ]
+    run_steps(
+        monkeypatch,
+        "database",
+        lambda charm: data_interfaces.DatabaseRequires(charm, "database", database_name="data"),
+        steps,
+    )
+
+
+def test_database_requires_secrets(monkeypatch):
+    steps = [
+        ({"secret-user": "secret:u", "secret-user-revision": "1"}, ["database_created"]),
+        ({"secret-user-revision": "2"}, []),
+    ]
+    run_steps(
+        monkeypatch,
+        "database",
+        lambda charm: data_interfaces.DatabaseRequires(charm, "database", database_name="data"),
+        steps,
+    )
+
+
+def test_kafka_requires(monkeypatch):
+    steps = [
+        ({"zookeeper-uris": "z:2181"}, []),
+        ({"username": "user", "password": "pass", "endpoints": "b:9092"}, ["topic_created"]),
+        ({"endpoints": "b2:9092"}, ["bootstrap_server_changed"]),
+        ({"secret-endpoints-revision": "2"}, []),
+        ({"secret-endpoints-revision": "3"}, ["bootstrap_server_changed"]),
+    ]
+    run_steps(
+        monkeypatch,
+        "kafka",
+        lambda charm: data_interfaces.KafkaRequires(
+            charm, "kafka", topic="topic", extra_user_roles="", consumer_group_prefix=""
+        ),
+        steps,
+    )
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        {"tls": "True"},
+        {"tls-ca": "CA2"},
+        {"password": "pass2"},
+        {"secret-user-revision": "2"},
+        {"secret-tls-revision": "2"},
+    ],
+)
+def test_opensearch_requires(monkeypatch, change):
+    steps = [
+        (
+            {"username": "user", "password": "pass", "tls": "False", "tls-ca": "CA"},
+            ["authentication_updated", "index_created"],
+        ),
+        ({"secret-user-revision": "1", "secret-tls-revision": "1"}, []),
+        ({"endpoints": "o:9200"}, ["endpoints_changed"]),
+        # Authentication data changing is reported, whether in the databag or in a secret
+        (change, ["authentication_updated"]),
+    ]
+    run_steps(
+        monkeypatch,
+        "opensearch",
+        lambda charm: data_interfaces.OpenSearchRequires(charm, "opensearch", index="index"),
+        steps,
+    )
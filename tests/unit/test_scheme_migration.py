@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Secrets of the base charm moved between the peer databag ID scheme and labels."""
+
+import pytest
+from fake_juju import FakeJuju
+from utils import PeerUnit, load_charm, new_dispatch
+
+CHARM = load_charm("base-charm")
+
+
+@pytest.fixture
+def leader(monkeypatch):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    fake = FakeJuju()
+    leader = PeerUnit(CHARM, fake, leader=True)
+    leader.run("set-secret", {"key": "app"})
+    leader.run("set-secret", {"key": "unit", "scope": "unit"})
+    return fake, leader
+
+
+def configure(leader: PeerUnit, scheme: str) -> None:
+    new_dispatch(leader.harness.charm)
+    leader.harness.update_config({"secret-scheme": scheme})
+
+
+def databags(leader: PeerUnit):
+    charm = leader.harness.charm
+    return {"app": dict(charm.app_peer_data), "unit": dict(charm.unit_peer_data)}
+
+
+def test_migration(leader):
+    fake, leader = leader
+    charm = leader.harness.charm
+    ids = {scope: databag["secret-id"] for scope, databag in databags(leader).items()}
+    labels = {
+        "app": f"{charm.app.name}.mysecret",
+        "unit": f"{charm.unit.name.replace('/', '-')}.mysecret",
+    }
+
+    # Each secret gets its label in place (no new revision), its pointer is dropped
+    configure(leader, "label")
+    for scope, databag in databags(leader).items():
+        assert databag == {"secret-scheme": "label"}
+        secret = fake.secrets[ids[scope]]
+        assert secret["labels"][secret["owner"]] == labels[scope]
+        assert secret["latest"] == 1
+    assert leader.run("get-secrets", {})["secrets"] == {"key": "app"}
+    assert leader.run("get-secrets", {"scope": "unit"})["secrets"] == {"key": "unit"}
+
+    # Running it again (a hook of each kind) writes nothing
+    fake.calls.clear()
+    configure(leader, "label")
+    new_dispatch(charm)
+    charm.on.update_status.emit()
+    assert not {"secret-add", "secret-set", "secret-remove"} & set(fake.calls)
+    assert all(databag == {"secret-scheme": "label"} for databag in databags(leader).values())
+
+    # Back to the peer databag: the pointers are restored, labels left as they are
+    configure(leader, "peer-id")
+    assert databags(leader) == {scope: {"secret-id": ids[scope]} for scope in ids}
+    assert all(fake.secrets[secret_id]["latest"] == 1 for secret_id in ids.values())
+    configure(leader, "peer-id")
+    assert databags(leader) == {scope: {"secret-id": ids[scope]} for scope in ids}
+    assert leader.run("get-secrets", {})["secrets"] == {"key": "app"}
+
+
+def test_invalid_scheme(leader):
+    _, leader = leader
+    before = databags(leader)
+    configure(leader, "database")
+    assert leader.harness.charm.unit.status.name == "blocked"
+    assert databags(leader) == before
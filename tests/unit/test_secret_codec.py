@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Codec of secret contents (large values compressed and chunked): helpers and library."""
+
+import base64
+import random
+
+import pytest
+from fake_juju import FakeJuju
+from ops.testing import ActionFailed
+from relation_charms import Client, data_interfaces
+from utils import PeerUnit, load_charm, load_helpers
+
+helpers = load_helpers()
+
+# encode(), the mapping decoding it, and the error of reserved keys
+CODECS = {
+    "helpers": (helpers.encode_content, helpers.SecretContent, ValueError),
+    "library": (
+        data_interfaces.encode_secret_content,
+        data_interfaces.SecretContent,
+        data_interfaces.SecretKeyReservedError,
+    ),
+}
+
+# Compressed to a single chunk, and stored raw in 3 chunks (random data doesn't compress)
+COMPRESSIBLE = "a" * 10000
+INCOMPRESSIBLE = base64.b64encode(random.Random(0).randbytes(7500)).decode()
+
+
+@pytest.fixture(params=list(CODECS))
+def codec(request):
+    return CODECS[request.param]
+
+
+def test_round_trip(codec):
+    encode, content_cls, _ = codec
+    content = {"small": "value", "compressible": COMPRESSIBLE, "incompressible": INCOMPRESSIBLE}
+    stored = encode(content)
+    assert stored["compressible-codec"] == "zlib:1:10000"
+    assert stored["incompressible-codec"] == "raw:3:10000"
+    assert dict(content_cls(stored)) == content
+
+
+@pytest.mark.parametrize("key", ["foo-codec", "abc-chunk-0", "abc-chunk-12"])
+def test_reserved_keys(codec, key):
+    encode, _, error = codec
+    # e.g. `abc-chunk-0` would be overwritten by the first chunk of a large `abc`
+    with pytest.raises(error):
+        encode({key: "raw:hello", "abc": INCOMPRESSIBLE})
+
+
+@pytest.mark.parametrize("charm", ["base-charm", "labels-charm", "cache-charm"])
+def test_set_reserved_key(monkeypatch, charm):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    leader = PeerUnit(load_charm(charm), FakeJuju(), leader=True)
+    params = {"content": {"foo-codec": "raw:hello"}}
+    with pytest.raises(ActionFailed, match="Reserved secret keys"):
+        leader.run("set-secret", params if charm != "base-charm" else params["content"])
+
+
+@pytest.mark.parametrize("key", ["codec", "foo-codec-1", "abc-chunk-", "abc-chunk-x", "chunk-0"])
+def test_keys_alike(codec, key):
+    encode, content_cls, _ = codec
+    content = {key: "raw:hello", "abc": INCOMPRESSIBLE}
+    assert dict(content_cls(encode(content))) == content
+
+
+@pytest.mark.parametrize(
+    "stored",
+    [
+        {"foo-codec": "raw:hello"},
+        {"tls-codec": "zlib:1:10"},
+        {"abc-codec": "zlib:0:10"},
+        {"abc-codec": "gzip:1:10", "abc-chunk-0": "data"},
+        {"abc-codec": "raw:2:8", "abc-chunk-0": "data"},
+    ],
+)
+def test_invalid_headers(codec, stored):
+    """Keys alike codec keys without a valid header or chunks are plain keys (never decoded)."""
+    _, content_cls, _ = codec
+    assert dict(content_cls(stored)) == stored
+
+
+def test_codecs_advertised(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    current, previous = Client(fake, 0, harness), Client(fake, 1, harness)
+    # A requirer of an earlier version of the library advertises no codec
+    harness.update_relation_data(
+        previous.provider_relation_id, previous.name, {data_interfaces.SECRET_CODECS_FIELD: ""}
+    )
+    for client in (current, previous):
+        provides.set_credentials(client.provider_relation_id, "user", INCOMPRESSIBLE)
+        provides.set_tls_ca(client.provider_relation_id, COMPRESSIBLE)
+
+    def stored(client, label):
+        return fake.secret_get("provider/0", id=client.published[f"secret-{label}"])
+
+    # Secrets are only encoded for the requirers able to decode them
+    assert stored(current, "user")["password-codec"] == "raw:3:10000"
+    assert stored(current, "tls")["tls-ca-codec"] == "zlib:1:10000"
+    assert stored(previous, "user")["password"] == INCOMPRESSIBLE
+    assert stored(previous, "tls")["tls-ca"] == COMPRESSIBLE
+    # Requirers of both kinds don't share secrets
+    assert current.published["secret-tls"] != previous.published["secret-tls"]
+
+    current.receive()
+    fields = current.harness.charm.requires.get_relation_fields(
+        current.relation_id, ["password", "tls-ca"]
+    )
+    assert fields == {"password": INCOMPRESSIBLE, "tls-ca": COMPRESSIBLE}
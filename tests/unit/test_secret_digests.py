@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Digests of secret fields published by providers, and their expansion by `diff()`."""
+
+import json
+import os
+from types import SimpleNamespace
+from typing import Dict
+
+from relation_charms import Client, data_interfaces
+from utils import dispatch_scoped
+
+DIGEST_KEY_LABEL = "database.digest-key"
+
+
+def diff(old: Dict[str, str], new: Dict[str, str]):
+    """Diff the requirer computes on receiving `new`, having seen `old` last."""
+    # As saved by the requirer: without the provider's own record of the diff
+    old = {key: value for key, value in old.items() if key != "data"}
+    relation = SimpleNamespace(data={"requirer": {"data": json.dumps(old)}, "provider": new})
+    return data_interfaces.diff(SimpleNamespace(relation=relation, app="provider"), "requirer")
+
+
+def test_digest_mismatch(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    client = Client(fake, 0, harness)
+    provides.set_credentials(client.provider_relation_id, "user", "s3cr3t")
+    published = dict(client.published)
+    assert "s3cr3t" not in json.dumps(published)
+
+    # Only the field whose digest changed is reported, no secret is read
+    dispatch_scoped(provides)()
+    provides.set_credentials(client.provider_relation_id, "user", "new-pass")
+    result = diff(published, client.published)
+    assert "password" in result.changed and "username" not in result.changed
+    assert not result.added and not result.deleted
+
+
+def test_digests_missing(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    client = Client(fake, 0, harness)
+    provides.set_credentials(client.provider_relation_id, "user", "pass")
+    published = dict(client.published)
+    without_digests = {k: v for k, v in published.items() if k != "secret-user-digests"}
+
+    # Fields of a manifest appearing are added, of a manifest gone deleted
+    assert {"username", "password"} <= diff({}, published).added
+    assert {"username", "password"} <= diff(without_digests, published).added
+    assert {"username", "password"} <= diff(published, without_digests).deleted
+    # Nothing is reported for secrets without manifest (e.g. older providers)
+    result = diff({}, without_digests)
+    assert "secret-user" in result.added and "password" not in result.added
+
+
+def test_digest_key(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+    content = {"password": "pass"}
+
+    # The key is created once, then read back by the next dispatches
+    digests = provides._secret_digests(content)
+    new_dispatch()
+    assert provides._secret_digests(content) == digests
+    secrets = len(fake.secrets)
+
+    # A key gone missing is created anew: digests don't match the previous ones
+    harness.model.get_secret(label=DIGEST_KEY_LABEL).remove_all_revisions()
+    new_dispatch()
+    missing = provides._secret_digests(content)
+    assert missing != digests
+    assert len(fake.secrets) == secrets
+
+
+def test_digest_key_rotation(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    new_dispatch = dispatch_scoped(provides)
+    client = Client(fake, 0, harness)
+    provides.set_credentials(client.provider_relation_id, "user", "pass")
+    published = dict(client.published)
+
+    # With a new key, all fields of the next update are reported as changed: no change is
+    # ever missed, unchanged fields may be reported too
+    harness.model.get_secret(label=DIGEST_KEY_LABEL).set_content({"key": os.urandom(32).hex()})
+    new_dispatch()
+    provides.set_credentials(client.provider_relation_id, "user", "new-pass")
+    assert {"username", "password"} <= diff(published, client.published).changed
+
+    # Later updates are digested with the new key only
+    published = dict(client.published)
+    new_dispatch()
+    provides.set_credentials(client.provider_relation_id, "user", "newer-pass")
+    result = diff(published, client.published)
+    assert "password" in result.changed and "username" not in result.changed
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Secret operations of the example charms log keys and digests only, sampled under stress."""
+
+import logging
+
+import pytest
+from ops.testing import Harness
+from utils import load_charm, new_dispatch, owners_see_latest
+
+CHARMS = ["base", "labels", "cache"]
+
+
+def run(harness: Harness, action: str, params: dict) -> dict:
+    new_dispatch(harness.charm)
+    return harness.run_action(action, params).results
+
+
+@pytest.mark.parametrize("name", CHARMS)
+def test_secret_logs(name, caplog):
+    harness = Harness(load_charm(f"{name}-charm"))
+    harness.add_relation("charm-peer", harness.model.app.name)
+    owners_see_latest(harness)
+    harness.set_leader(True)
+    harness.begin()
+    content = {"password": "s3cr3t-password", "username": "s3cr3t-user"}
+
+    caplog.set_level(logging.INFO)
+    run(harness, "set-secret", content if name == "base" else {"content": content})
+    results = run(harness, "get-secrets" if name == "base" else "get-secret", {})
+    assert "s3cr3t-password" in str(results)
+    run(harness, "delete-secrets", {"keys": ["password"]})
+    assert "s3cr3t" not in caplog.text
+    assert "password=<" in caplog.text and "removed=['password']" in caplog.text
+
+    caplog.clear()
+    run(harness, "stress", {"count": 1000, "write-weight": 0, "delete-weight": 0})
+    reads = [r for r in caplog.records if getattr(r, "secret_operation", None) == "retrieved"]
+    assert len(reads) == 10
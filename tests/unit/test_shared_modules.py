@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Copies of the modules shared by the example charms, and of the vendored library."""
+
+from pathlib import Path
+
+import pytest
+from utils import CHARMS_DIR
+
+# Modules each example charm ships a copy of, to be kept identical
+SHARED_MODULES = ("archive.py", "helpers.py", "hook_stats.py", "secret_log.py")
+LIBRARY = Path("lib", "charms", "data_platform_libs", "v0", "data_interfaces.py")
+
+
+def copies(path: Path):
+    return {
+        charm_dir.name: (charm_dir / path).read_text()
+        for charm_dir in sorted(CHARMS_DIR.iterdir())
+        if (charm_dir / path).is_file()
+    }
+
+
+@pytest.mark.parametrize("module", SHARED_MODULES)
+def test_shared_modules(module):
+    contents = copies(Path("src", module))
+    assert len(contents) >= 2
+    reference, content = next(iter(contents.items()))
+    differing = [charm for charm, other in contents.items() if other != content]
+    assert not differing, f"{module} of {differing} differs from the copy of {reference}"
+
+
+def test_vendored_library():
+    contents = copies(LIBRARY)
+    assert set(contents) == {"relation-provides", "relation-requires"}
+    assert len(set(contents.values())) == 1
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Relations receiving the same content for a shared secret group share a single secret."""
+
+from relation_charms import Client
+
+
+def test_shared_secret_updated_then_shared(provider):
+    fake, harness = provider
+    provides = harness.charm.provides
+    clients = [Client(fake, index, harness) for index in range(3)]
+
+    # Each relation's secret is updated in place before the next one gets the same content
+    for client in clients:
+        provides.set_tls(client.provider_relation_id, "True")
+        provides.set_tls_ca(client.provider_relation_id, "CA")
+
+    secret_ids = {client.published["secret-tls"] for client in clients}
+    assert len(secret_ids) == 1
+    for client in clients:
+        secret = provides._get_relation_secret(client.provider_relation_id, "tls")
+        assert secret.get_content() == {"tls": "True", "tls-ca": "CA"}
+
+    # Moving apart, then back to the same content
+    provides.set_tls_ca(clients[0].provider_relation_id, "CA2")
+    provides.set_tls_ca(clients[0].provider_relation_id, "CA")
+    provides.set_tls_ca(clients[1].provider_relation_id, "CA2")
+    assert clients[0].published["secret-tls"] == clients[2].published["secret-tls"]
+    assert clients[1].published["secret-tls"] != clients[0].published["secret-tls"]
+    assert len(provides._load_shared_secrets()) == 2
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""The stress action of the example charms, and the validation of its parameters."""
+
+import pytest
+from fake_juju import FakeJuju
+from ops.testing import ActionFailed
+from utils import PeerUnit, load_charm
+
+CHARMS = ["base-charm", "labels-charm", "cache-charm"]
+
+
+@pytest.fixture(params=CHARMS)
+def unit(request, monkeypatch):
+    monkeypatch.setenv("JUJU_VERSION", "3.1.6")
+    return PeerUnit(load_charm(request.param), FakeJuju(), leader=True)
+
+
+def test_stress(unit):
+    results = unit.run("stress", {"keys": 2, "count": 20, "seed": 1})
+    assert results["operations"] == "20"
+
+
+@pytest.mark.parametrize(
+    "weights",
+    [
+        {"read-weight": 0, "write-weight": 0, "delete-weight": 0},
+        {"read-weight": -1, "write-weight": 1},
+    ],
+)
+def test_stress_invalid_weights(unit, weights):
+    with pytest.raises(ActionFailed, match="Invalid weights"):
+        unit.run("stress", {"count": 20, **weights})
@@ -0,0 +1,242 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Running the example charms offline (under Harness), for unit tests and benchmarks."""
+
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from copy import copy
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from fake_juju import FakeJuju, harness_writing, track_harness_writes
+from ops.charm import CharmBase
+from ops.testing import Harness
+
+CHARMS_DIR = Path(__file__).parents[1] / "integration" / "charms"
+
+# Modules shipped (under the same name) by several example charms
+SHARED_CHARM_MODULES = ("archive", "charm", "helpers", "hook_stats", "secret_log")
+
+# Model backend methods accounted for, and the hook tool each corresponds to
+# (under Harness, relation data is written with `update_relation_data`)
+COUNTED_CALLS = {
+    "secret_get": "secret-get",
+    "secret_set": "secret-set",
+    "secret_add": "secret-add",
+    "secret_info_get": "secret-info-get",
+    "secret_grant": "secret-grant",
+    "secret_revoke": "secret-revoke",
+    "secret_remove": "secret-remove",
+    "secret_ids": "secret-ids",
+    "relation_get": "relation-get",
+    "update_relation_data": "relation-set",
+    "relation_ids": "relation-ids",
+    "relation_list": "relation-list",
+    "is_leader": "is-leader",
+}
+
+
+def env_sizes(name: str, default: str) -> List[int]:
+    """Comma-separated list of sizes to sweep, overridable from the environment."""
+    return [int(size) for size in os.environ.get(name, default).split(",") if size]
+
+
+def load_charm(name: str, class_name: str = "SecretsTestCharm") -> type:
+    """Import the charm class of an example charm.
+
+    Each example charm is imported as a distinct module, so charms with clashing module
+    names (`charm`, `helpers`, etc.) can be used side by side.
+    """
+    charm_dir = CHARMS_DIR / name
+    module_name = f"{name.replace('-', '_')}_charm"
+    if module_name in sys.modules:
+        return getattr(sys.modules[module_name], class_name)
+
+    paths = [str(charm_dir / "src"), str(charm_dir / "lib")]
+    sys.path[:0] = paths
+    for module in SHARED_CHARM_MODULES:
+        sys.modules.pop(module, None)
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, charm_dir / "src" / "charm.py")
+        module = importlib.util.module_from_spec(spec)
+        # Harness locates metadata.yaml/actions.yaml from the module of the charm class
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    finally:
+        del sys.path[: len(paths)]
+        for module in SHARED_CHARM_MODULES:
+            sys.modules.pop(module, None)
+
+    return getattr(sys.modules[module_name], class_name)
+
+
+def load_helpers():
+    """Load the helpers module of the example charms (identical in all of them)."""
+    path = CHARMS_DIR / "base-charm" / "src" / "helpers.py"
+    spec = importlib.util.spec_from_file_location("base_charm_helpers", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_data_interfaces():
+    """Import the data_interfaces charm library, as vendored by the relation charms."""
+    lib = str(CHARMS_DIR / "relation-provides" / "lib")
+    sys.path.insert(0, lib)
+    try:
+        return importlib.import_module("charms.data_platform_libs.v0.data_interfaces")
+    finally:
+        sys.path.remove(lib)
+
+
+def dispatch_scoped(*objects) -> Callable[[], None]:
+    """Return a function restoring the attributes of objects to what they are now.
+
+    Harness reuses the same objects across events, while a deployment creates them anew on
+    each hook dispatch: restoring them emulates a new dispatch (the dispatch context of their
+    model is reset too).
+    """
+    snapshots = [(obj, dict(vars(obj))) for obj in objects]
+
+    def restore():
+        for obj, attributes in snapshots:
+            vars(obj).clear()
+            for name, value in attributes.items():
+                setattr(obj, name, copy(value) if isinstance(value, (dict, list, set)) else value)
+            reset_dispatch_context(obj.model)
+
+    return restore
+
+
+class BackendCalls(Counter):
+    """Number of hook tool calls issued through the model backend of a Harness."""
+
+    def __init__(self, harness: Harness):
+        super().__init__()
+        self.harness = harness
+        backend = harness._backend
+        for method, tool in COUNTED_CALLS.items():
+            if hasattr(backend, method):
+                setattr(backend, method, self._counted(tool, getattr(backend, method)))
+        track_harness_writes(harness)
+
+    def _counted(self, tool: str, call: Callable) -> Callable:
+        @wraps(call)
+        def wrapper(*args, **kwargs):
+            if not harness_writing(self.harness):
+                self[tool] += 1
+            return call(*args, **kwargs)
+
+        return wrapper
+
+
+def owners_see_latest(harness: Harness) -> None:
+    """Serve the latest revision of a secret to its owner, as Juju does.
+
+    The Harness backend lets owners track revisions like observers do.
+    """
+    backend = harness._backend
+    secret_get = backend.secret_get
+
+    @wraps(secret_get)
+    def wrapper(*, id=None, label=None, refresh=False, peek=False):
+        secret = backend._ensure_secret_id_or_label(id, label)
+        owned = secret.owner_name in (backend.app_name, backend.unit_name)
+        return secret_get(id=id, label=label, refresh=refresh, peek=peek or owned)
+
+    backend.secret_get = wrapper
+
+
+def reset_dispatch_context(model) -> None:
+    """Drop what the `DispatchContext`s of a model (charm and library) memoized."""
+    # `DispatchContext.ATTRIBUTE` of helpers.py and of the library
+    for attribute in ("_dispatch_context", "_data_interfaces_dispatch_context"):
+        if context := getattr(model, attribute, None):
+            context.reset()
+
+
+def new_dispatch(charm: CharmBase) -> None:
+    """Drop what the charm object keeps, as a new hook dispatch starts a new charm process.
+
+    Harness reuses the same charm object across events, which would let caches live
+    longer than they do in a deployment. The previous dispatch is committed first, as it
+    would be on exit (`pre-commit`/`commit` observers run).
+    """
+    charm.framework.commit()
+    reset_dispatch_context(charm.model)
+    if cache := getattr(charm, "secret_cache", None):
+        charm.secret_cache = type(cache)(charm)
+    if registry := getattr(charm, "secret_registry", None):
+        registry.clear()
+
+
+class PeerUnit:
+    """A unit of an example charm with its peer relation, its secrets served by FakeJuju."""
+
+    def __init__(self, charm_cls: type, fake: FakeJuju, leader: bool):
+        self.harness = Harness(charm_cls)
+        fake.attach(self.harness)
+        self.app = self.harness.model.app.name
+        self.relation_id = self.harness.add_relation("charm-peer", self.app)
+        if leader:
+            self.harness.set_leader(True)
+        self.harness.begin()
+
+    def run(self, action: str, params: dict) -> dict:
+        new_dispatch(self.harness.charm)
+        return self.harness.run_action(action, params).results
+
+    @property
+    def peer_data(self) -> dict:
+        return self.harness.get_relation_data(self.relation_id, self.app)
+
+
+def run_scenario(
+    charm_cls: type,
+    scenario: Callable[[Harness], Optional[int]],
+    setup: Optional[Callable[[Harness], None]] = None,
+    fake_juju: Optional[Callable[[], FakeJuju]] = None,
+) -> Dict:
+    """Execute a scenario against a leader unit of the charm, and measure it.
+
+    The scenario is executed twice, on fresh Harness instances: once timed, once with memory
+    tracing (which would distort the timing). It returns the number of dispatches it did.
+
+    Secrets are kept by the Harness backend, or by the FakeJuju `fake_juju` returns.
+    """
+    results = {}
+    for traced in (False, True):
+        harness = Harness(charm_cls)
+        harness.add_relation("charm-peer", harness.model.app.name)
+        if fake_juju:
+            fake_juju().attach(harness)
+        else:
+            owners_see_latest(harness)
+        harness.set_leader(True)
+        harness.begin()
+        if setup:
+            setup(harness)
+
+        calls = BackendCalls(harness)
+        if traced:
+            tracemalloc.start()
+            scenario(harness)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results["peak-memory"] = peak
+        else:
+            start = time.perf_counter()
+            dispatches = scenario(harness) or 1
+            results["time"] = time.perf_counter() - start
+            results["dispatches"] = dispatches
+            results["time-per-dispatch"] = results["time"] / dispatches
+            results["calls"] = dict(sorted(calls.items()))
+        harness.cleanup()
+
+    return results